@@ -0,0 +1,104 @@
+import pytest_skippy.git as git
+import pytest_skippy.imp as imp
+
+# The prefix of change sets listed in a file
+FILE_PREFIX = 'file:'
+
+
+def get_change_set(spec, git_repo_dir=None):
+    """Get the files changed by a change set
+
+    A change set is one of:
+
+    - ``target..head``: the changes made on ``head`` since its merge base with
+      ``target`` (as for a branch merged into ``target``)
+    - ``target``: the same as ``target..HEAD``
+    - ``file:path``: the changed files listed in a file, one per line (not
+      ``@path``, which pytest expands into command line arguments)
+
+    :param spec: The description of the change set
+    :type spec: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: The changed files, relative to the repository root
+    :rtype: set
+    """
+    if spec.startswith(FILE_PREFIX):
+        with open(spec[len(FILE_PREFIX):], 'r') as f:
+            return set(_.strip() for _ in f if _.strip())
+
+    target, _, head = spec.partition('..')
+    return git.detect_changed_files(target, head or 'HEAD', git_repo_dir)
+
+
+def get_dependencies(skippy, root_module):
+    """Get the files a module depends on, including extension sources
+
+    :param skippy: The core skippy object used to build the import graph
+    :type skippy: pytest_skippy.core.Skippy
+    :param root_module: The module at the root of the import graph
+    :type root_module: str
+
+    :returns: The filenames in the import graph of the module and the
+              conventional sources of the extension modules it imports
+    :rtype: set
+    """
+    filenames = skippy.get_dependencies(root_module)
+    for filename in list(filenames):
+        filenames.update(imp.get_extension_sources(filename))
+
+    return filenames
+
+
+def _is_affected(filenames, changed_files):
+    # Unknown dependencies are affected by any change
+    if filenames is None:
+        return bool(changed_files)
+
+    return not filenames.isdisjoint(changed_files)
+
+
+def get_affected(dependencies, change_sets):
+    """Match several change sets against the dependencies of each root
+
+    The dependencies are computed once, so the cost of each additional change
+    set is a set intersection per root rather than an import graph traversal.
+
+    >>> dependencies = {
+    ...     'test_a': {'/r/a.py', '/r/test_a.py'},
+    ...     'test_b': {'/r/b.py', '/r/test_b.py'},
+    ...     'test_c': None,
+    ... }
+    >>> affected, union = get_affected(
+    ...     dependencies, {'first': {'/r/a.py'}, 'second': set()})
+    >>> sorted(affected['first']), sorted(affected['second'])
+    (['test_a', 'test_c'], [])
+    >>> sorted(union)
+    ['test_a', 'test_c']
+
+    :param dependencies: A mapping of root (such as a test module) to the set
+                         of files it depends on, or None if its dependencies
+                         are unknown (it is affected by any change)
+    :type dependencies: dict
+    :param change_sets: A mapping of change set name to the set of files it
+                        changed (in the same form as the dependencies)
+    :type change_sets: dict
+
+    :returns: (affected, union) where affected maps each change set name to
+              the set of roots it affects, and union is the set of roots
+              affected by any of the change sets
+    :rtype: tuple
+    """
+    affected = {}
+    for name, changed_files in change_sets.items():
+        affected[name] = set(
+                root for root, filenames in dependencies.items()
+                if _is_affected(filenames, changed_files))
+
+    union = set()
+    for roots in affected.values():
+        union |= roots
+
+    return affected, union
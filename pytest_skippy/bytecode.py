@@ -0,0 +1,187 @@
+import dis
+import inspect
+import marshal
+import os
+import struct
+import sys
+import types
+
+try:
+    import importlib.util as importlib_util
+except ImportError:  # pragma: no cover
+    importlib_util = None
+
+# Instructions that may load the level and fromlist of an import
+_LOAD_OPS = frozenset(('LOAD_CONST', 'LOAD_SMALL_INT'))
+
+# Instructions that may appear between loading the operands of an import and
+# the import itself
+_IGNORED_OPS = frozenset(('EXTENDED_ARG', 'NOP', 'CACHE'))
+
+if sys.version_info >= (3, 7):
+    # PEP 552: magic, flags, (mtime, size) or source hash
+    _HEADER_SIZE = 16
+else:
+    # magic, mtime, size
+    _HEADER_SIZE = 12
+
+
+def _is_supported():
+    return (importlib_util is not None and
+            hasattr(importlib_util, 'cache_from_source') and
+            hasattr(dis, 'get_instructions'))
+
+
+def _read(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _is_valid(header, filename):
+    """Determine if a bytecode header matches a source file"""
+    if header[:4] != importlib_util.MAGIC_NUMBER:
+        return False
+
+    stamp = header[4:]
+    if _HEADER_SIZE == 16:
+        flags = struct.unpack('<I', stamp[:4])[0]
+        stamp = stamp[4:]
+
+        # Hash based bytecode
+        if flags & 0x1:
+            source = _read(filename)
+            return (source is not None and
+                    stamp == importlib_util.source_hash(source))
+
+    try:
+        st = os.stat(filename)
+    except (IOError, OSError):
+        return False
+
+    expected = struct.pack('<II',
+                           int(st.st_mtime) & 0xFFFFFFFF,
+                           st.st_size & 0xFFFFFFFF)
+    return stamp == expected
+
+
+def load_cached_code(filename):
+    """Load the code object of a source file from its cached bytecode
+
+    The bytecode is only used if it was written by this interpreter and
+    matches the source file, either by modification time and size or by
+    source hash (see :pep:`552`).
+
+    :param filename: The path to a python source file
+    :type filename: str
+
+    :returns: The code object of the module or None if there is no valid
+              cached bytecode
+    :rtype: types.CodeType
+    """
+    if not _is_supported():  # pragma: no cover
+        return None
+
+    try:
+        cache = importlib_util.cache_from_source(filename)
+    except NotImplementedError:  # pragma: no cover
+        return None
+
+    data = _read(cache)
+    if not data or not _is_valid(data[:_HEADER_SIZE], filename):
+        return None
+
+    try:
+        code = marshal.loads(data[_HEADER_SIZE:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    if isinstance(code, types.CodeType):
+        return code
+
+
+def _iter_code(code):
+    """Iterate over a code object and its nested code objects"""
+    code_objects = [code]
+    while code_objects:
+        code = code_objects.pop()
+        yield code
+        code_objects.extend(
+                _ for _ in code.co_consts if isinstance(_, types.CodeType))
+
+
+def get_names(code):
+    """Return the global and attribute names used by a code object
+
+    Nested code objects (functions, classes, comprehensions) are included.
+
+    >>> code = compile('import os\\ndef f():\\n    return os.sep', '<string>',
+    ...                'exec')
+    >>> sorted(get_names(code))
+    ['f', 'os', 'sep']
+
+    :param code: A code object
+    :type code: types.CodeType
+
+    :rtype: set
+    """
+    names = set()
+    for code in _iter_code(code):
+        names.update(code.co_names)
+
+    return names
+
+
+def get_imports(code):
+    """Return the imports executed by a code object
+
+    Nested code objects (functions, classes, comprehensions) are included.
+    Imports in functions are of the ``'local'`` kind and any other import is
+    of the ``'runtime'`` kind (see :py:mod:`pytest_skippy.parse`). Other
+    kinds of imports can't be distinguished in bytecode.
+
+    >>> code = compile('import os\\ndef f():\\n    from re import escape',
+    ...                '<string>', 'exec')
+    >>> get_imports(code)
+    [('os', None, 0, 'runtime'), ('re', ('escape',), 0, 'local')]
+
+    :param code: A code object
+    :type code: types.CodeType
+
+    :returns: A list of (module, fromlist, level, kind) tuples, where the
+              first three items are the arguments of :py:func:`__import__`
+    :rtype: list
+
+    :raises ValueError: if the bytecode has an unexpected structure
+    """
+    imports = []
+    code_objects = [(code, 'runtime')]
+    while code_objects:
+        code, kind = code_objects.pop(0)
+        if code.co_flags & inspect.CO_OPTIMIZED:
+            kind = 'local'
+
+        operands = []
+        for instruction in dis.get_instructions(code):
+            if instruction.opname in _IGNORED_OPS:
+                continue
+
+            if instruction.opname == 'IMPORT_NAME':
+                if len(operands) != 2:
+                    raise ValueError('Unexpected bytecode for import of %s' %
+                                     instruction.argval)
+                level, fromlist = operands
+                imports.append((instruction.argval, fromlist, level, kind))
+
+            if instruction.opname in _LOAD_OPS:
+                operands = (operands + [instruction.argval])[-2:]
+            else:
+                operands = []
+
+        code_objects.extend(
+                (_, kind) for _ in code.co_consts
+                if isinstance(_, types.CodeType))
+
+    return imports
@@ -0,0 +1,273 @@
+import errno
+import hashlib
+import json
+import os
+import os.path
+import sys
+import tempfile
+
+
+class ContentStore(object):
+    """A content addressed store of JSON documents
+
+    Documents are stored in a directory as one file per key (using the first
+    two characters of the key as a subdirectory, like git objects). Writes are
+    atomic so a store may be shared between concurrent processes, for example
+    between CI jobs.
+
+    :param directory: The root directory of the store
+    :type directory: str
+    :param namespace: A subdirectory separating different kinds of documents
+                      (and versions of their format)
+    :type namespace: str
+    """
+
+    def __init__(self, directory, namespace):
+        self.directory = os.path.join(directory, namespace)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + '.json')
+
+    def is_empty(self):
+        """Determine if the store has no documents
+
+        :rtype: bool
+        """
+        try:
+            return not os.listdir(self.directory)
+        except (IOError, OSError):
+            return True
+
+    def get(self, key):
+        """Retrieve a document
+
+        :param key: The key of the document (usually a hex digest)
+        :type key: str
+
+        :returns: The document or None if the key is not in the store
+        """
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, value):
+        """Store a document
+
+        Failures to write to the store are ignored since the store is only a
+        cache.
+
+        :param key: The key of the document (usually a hex digest)
+        :type key: str
+        :param value: A JSON serializable document
+        """
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return
+
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.rename(temp_path, path)
+        except (IOError, OSError):
+            try:
+                os.unlink(temp_path)
+            except (IOError, OSError):  # pragma: no cover
+                pass
+
+
+def _is_within(path, root):
+    """Determine if a path is located in a directory"""
+    return not os.path.relpath(path, root).startswith(os.pardir)
+
+
+def _get_stat_key(filename, root):
+    """Key a file outside of a directory by its path, size and mtime"""
+    if _is_within(filename, root):
+        return None
+
+    try:
+        stat = os.stat(filename)
+    except (IOError, OSError):
+        return None
+
+    key = hashlib.sha1()
+    key.update(('%s\0%r\0%d' % (filename, stat.st_mtime,
+                                stat.st_size)).encode('utf-8'))
+    return key.hexdigest()
+
+
+def get_environment_key(root, path=None):
+    """Get a fingerprint of the interpreter and its module search path
+
+    The fingerprint changes when the interpreter changes, when the search
+    path changes, or when an entry is added to or removed from a directory
+    of the search path (as when a package is installed or uninstalled).
+    Directories located in the root directory are not part of the
+    fingerprint, since they change with every checkout.
+
+    :param root: The root directory of the first party files
+    :type root: str
+    :param path: The module search path (Default: :py:data:`sys.path`)
+    :type path: list
+
+    :returns: A hex digest
+    :rtype: str
+    """
+    root = os.path.realpath(root)
+    key = hashlib.sha1()
+    key.update(('%s\0%s\0' % (sys.version, sys.executable)).encode('utf-8'))
+    for entry in sys.path if path is None else path:
+        entry = os.path.realpath(entry)
+        if _is_within(entry, root):
+            continue
+
+        try:
+            mtime = os.stat(entry).st_mtime
+        except (IOError, OSError):
+            mtime = None
+
+        key.update(('%s\0%r\0' % (entry, mtime)).encode('utf-8'))
+
+    return key.hexdigest()
+
+
+class ParseCache(object):
+    """Cache of the import statements of files, keyed by git blob id
+
+    Since blob ids only depend on the contents of a file, entries can be
+    reused across branches, rebases and fresh checkouts. The cached import
+    statements do not depend on the location of the file (relative imports
+    are stored unresolved) or on the interpreter, so the cache can be shared
+    by several environments (for example tox environments).
+
+    Files outside of the root directory (such as installed packages) have no
+    blob id. Those are keyed by their path, size and modification time
+    instead, which separates the entries of each environment.
+
+    :param directory: The root directory of the cache
+    :type directory: str
+    :param blob_ids: A mapping of canonical file path to blob id (see
+                     :py:func:`pytest_skippy.git.get_blob_ids`). Files that
+                     are not in the mapping are never cached.
+    :type blob_ids: dict
+    :param variant: Distinguishes statements extracted with different
+                    settings (for example the names of module settings, see
+                    :py:class:`pytest_skippy.parse.ImportVisitor`)
+    :type variant: str
+    :param root: The root directory of the first party files. Files outside
+                 of it are cached by path, size and modification time.
+                 (Default: only files with a blob id are cached)
+    :type root: str
+    """
+
+    NAMESPACE = 'imports-v3'
+
+    def __init__(self, directory, blob_ids, variant='', root=None):
+        self.store = ContentStore(directory, self.NAMESPACE)
+        self.blob_ids = blob_ids
+        self.variant = variant
+        self.root = root and os.path.realpath(root)
+
+    def _key(self, filename):
+        file_key = self.blob_ids.get(filename)
+        if not file_key and self.root:
+            file_key = _get_stat_key(filename, self.root)
+
+        if not file_key or not self.variant:
+            return file_key
+
+        key = hashlib.sha1(self.variant.encode('utf-8'))
+        key.update(file_key.encode('utf-8'))
+        return key.hexdigest()
+
+    def get(self, filename):
+        """Retrieve the import statements of a file
+
+        :param filename: The canonical path of a file
+        :type filename: str
+
+        :returns: A list of (module, fromlist, level, kind) tuples or None if
+                  the file is not cached
+        :rtype: list
+        """
+        key = self._key(filename)
+        if not key:
+            return None
+
+        statements = self.store.get(key)
+        if statements is None:
+            return None
+
+        return [(module, tuple(fromlist) if fromlist is not None else None,
+                 level, kind) for module, fromlist, level, kind in statements]
+
+    def set(self, filename, statements):
+        """Store the import statements of a file
+
+        :param filename: The canonical path of a file
+        :type filename: str
+        :param statements: A list of (module, fromlist, level, kind) tuples
+        :type statements: list
+        """
+        key = self._key(filename)
+        if key:
+            self.store.set(key, [list(_) for _ in statements])
+
+
+class ResolutionCache(object):
+    """Cache of the modules located outside of the root directory
+
+    Where stdlib and third party modules are located depends on the
+    environment, so resolutions are stored per environment (see
+    :py:func:`get_environment_key`). Modules located in the root directory
+    are never stored, they are resolved again by every run.
+
+    :param directory: The root directory of the cache
+    :type directory: str
+    :param root: The root directory of the first party files
+    :type root: str
+    :param path: The module search path (Default: :py:data:`sys.path`)
+    :type path: list
+    """
+
+    NAMESPACE = 'resolution-v1'
+
+    def __init__(self, directory, root, path=None):
+        self.store = ContentStore(directory, self.NAMESPACE)
+        self.key = get_environment_key(root, path)
+        self.loaded = {}
+
+    def load(self):
+        """Retrieve the modules resolved by earlier runs
+
+        :returns: A mapping of module name to (filename,
+                  submodule_search_locations) (see
+                  :py:meth:`pytest_skippy.imp.ModuleIndex.get_resolutions`)
+        :rtype: dict
+        """
+        document = self.store.get(self.key) or {}
+        self.loaded = dict((name, (filename, locations))
+                           for name, (filename, locations) in document.items())
+        return dict(self.loaded)
+
+    def save(self, resolutions):
+        """Store resolved modules (unless they are unchanged since the load)
+
+        :param resolutions: A mapping of module name to (filename,
+                            submodule_search_locations)
+        :type resolutions: dict
+        """
+        if resolutions != self.loaded:
+            self.store.set(self.key, resolutions)
+            self.loaded = dict(resolutions)
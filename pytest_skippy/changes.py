@@ -0,0 +1,207 @@
+import fnmatch
+import os.path
+
+import pytest_skippy.git as git
+import pytest_skippy.parse as parse
+
+
+# Mapping target which causes every test to run
+RUN_ALL = '*'
+
+
+def _read_working_file(filename, git_repo_dir=None):
+    """Read a file from the working tree (None if it does not exist)"""
+    try:
+        with open(os.path.join(git_repo_dir or '', filename), 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def _iter_sources(changed_files, revision, git_repo_dir=None):
+    """Yield (filename, old_source, new_source) for changed python files
+
+    Files which do not exist at revision or in the working tree are not
+    yielded.
+    """
+    filenames = [_ for _ in changed_files if _.endswith('.py')]
+    old_sources = git.read_files(revision, filenames, git_repo_dir)
+
+    for filename in filenames:
+        old_source = old_sources[filename]
+        new_source = _read_working_file(filename, git_repo_dir)
+        if old_source is None or new_source is None:
+            continue
+
+        yield filename, old_source, new_source
+
+
+def detect_changed_symbols(changed_files, revision, git_repo_dir=None):
+    """Find the changed top level definitions of changed python files
+
+    Each changed python file is compared against its contents at revision.
+    Files that have only had some of their top level definitions changed are
+    returned along with the names of those definitions. Files whose module
+    level code has changed (or that were added / removed) are not returned
+    since the file as a whole has changed.
+
+    :param changed_files: Changed files relative to the repository root
+    :type changed_files: set
+    :param revision: The revision the files are compared against (usually the
+                     merge base)
+    :type revision: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: A mapping of filename to the set of changed top level names
+    :rtype: dict
+    """
+    changed_symbols = {}
+    sources = _iter_sources(changed_files, revision, git_repo_dir)
+    for filename, old_source, new_source in sources:
+        names = parse.get_changed_definitions(old_source, new_source)
+        if names is not None:
+            changed_symbols[filename] = names
+
+    return changed_symbols
+
+
+def detect_cosmetic_changes(changed_files, revision, git_repo_dir=None):
+    """Find changed python files whose changes are not semantic
+
+    A change is cosmetic when the file has the same normalized AST
+    fingerprint (see :py:func:`pytest_skippy.parse.get_fingerprint`) as its
+    contents at revision. Comment, docstring and formatting changes are
+    cosmetic, except for changes to docstrings containing doctests.
+
+    :param changed_files: Changed files relative to the repository root
+    :type changed_files: set
+    :param revision: The revision the files are compared against (usually the
+                     merge base)
+    :type revision: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: A set of files with only cosmetic changes
+    :rtype: set
+    """
+    cosmetic_files = set()
+    sources = _iter_sources(changed_files, revision, git_repo_dir)
+    for filename, old_source, new_source in sources:
+        try:
+            if (parse.get_fingerprint(old_source) ==
+                    parse.get_fingerprint(new_source)):
+                cosmetic_files.add(filename)
+        except (SyntaxError, ValueError, TypeError):
+            continue
+
+    return cosmetic_files
+
+
+def parse_mapping(lines):
+    """Parse mapping lines in the form ``pattern = target [target ...]``
+
+    Patterns are matched against changed files (relative to the repository
+    root) using :py:mod:`fnmatch`. Targets are test paths (files or
+    directories) or ``*`` to run every test.
+
+    >>> parse_mapping(['data/*.json = tests/test_data.py', 'setup.cfg = *'])
+    [('data/*.json', ['tests/test_data.py']), ('setup.cfg', ['*'])]
+
+    :param lines: The mapping lines. Blank lines are ignored.
+    :type lines: list
+
+    :returns: A list of (pattern, targets) tuples
+    :rtype: list
+
+    :raises ValueError: if a line is not a valid mapping
+    """
+    mapping = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        pattern, separator, targets = line.partition('=')
+        pattern = pattern.strip()
+        targets = targets.split()
+        if not (separator and pattern and targets):
+            raise ValueError('Invalid skippy mapping: %r' % line)
+
+        mapping.append((pattern, targets))
+
+    return mapping
+
+
+def map_changed_files(changed_files, mapping=()):
+    """Map changed files to the test paths which must run
+
+    A changed ``conftest.py`` file maps to the directory containing it, since
+    it may affect any test in that directory. Other files are mapped using
+    mapping (see :py:func:`parse_mapping`).
+
+    >>> run_all, test_paths = map_changed_files(
+    ...     {'tests/conftest.py', 'data/a.json'},
+    ...     [('data/*.json', ['tests/test_data.py'])])
+    >>> run_all, sorted(test_paths)
+    (False, ['tests', 'tests/test_data.py'])
+    >>> map_changed_files({'setup.cfg'}, [('setup.cfg', ['*'])])
+    (True, set())
+
+    :param changed_files: Changed files relative to the repository root
+    :type changed_files: set
+    :param mapping: A list of (pattern, targets) tuples
+    :type mapping: list
+
+    :returns: (run_all, test_paths) where run_all is True if every test must
+              run and test_paths is a set of paths of tests that must run
+    :rtype: tuple
+    """
+    run_all = False
+    test_paths = set()
+    for filename in changed_files:
+        if os.path.basename(filename) == 'conftest.py':
+            test_paths.add(os.path.dirname(filename))
+
+        for pattern, targets in mapping:
+            if not fnmatch.fnmatch(filename, pattern):
+                continue
+
+            run_all |= RUN_ALL in targets
+            test_paths.update(_ for _ in targets if _ != RUN_ALL)
+
+    return run_all, test_paths
+
+
+def map_extension_sources(changed_files, mapping=()):
+    """Map changed build sources to the extension modules built from them
+
+    Sources next to an extension module with the same base name are detected
+    by convention (see :py:func:`pytest_skippy.imp.get_extension_sources`).
+    Other sources (shared headers, sources in a separate directory, ...) are
+    mapped to module names using mapping.
+
+    >>> sorted(map_extension_sources(
+    ...     {'src/fast.c', 'src/common.h', 'README.rst'},
+    ...     [('src/*.h', ['pkg.fast', 'pkg.faster']),
+    ...      ('src/fast.c', ['pkg.fast'])]))
+    ['pkg.fast', 'pkg.faster']
+
+    :param changed_files: Changed files relative to the repository root
+    :type changed_files: set
+    :param mapping: A list of (pattern, module names) tuples (see
+                    :py:func:`parse_mapping`)
+    :type mapping: list
+
+    :returns: A set of module names
+    :rtype: set
+    """
+    modules = set()
+    for filename in changed_files:
+        for pattern, targets in mapping:
+            if fnmatch.fnmatch(filename, pattern):
+                modules.update(targets)
+
+    return modules
@@ -1,12 +1,146 @@
-from stdlib_list import stdlib_list
+import os.path
+import sys
+import time
 
 import pytest_skippy.util as util
 import pytest_skippy.imp as imp
 import pytest_skippy.parse as parse
 
 from collections import deque
+from itertools import chain
 
-IGNORED_MODULES = set(['pytest']) | set(stdlib_list())
+# Top level modules which never cause a test to run (computed on first use)
+_ignored_modules = None
+
+
+def get_ignored_modules():
+    """Return the top level modules which never cause a test to run
+
+    These are the standard library modules (from
+    :py:data:`sys.stdlib_module_names` when available) and pytest.
+
+    :rtype: frozenset
+    """
+    global _ignored_modules
+    if _ignored_modules is None:
+        names = getattr(sys, 'stdlib_module_names', None)
+        if names is None:
+            from stdlib_list import stdlib_list
+            names = stdlib_list()
+
+        _ignored_modules = frozenset(names) | frozenset(['pytest', '_pytest'])
+
+    return _ignored_modules
+
+
+def is_ignored(module_name):
+    """Determine if a module never causes a test to run
+
+    >>> is_ignored('os.path'), is_ignored('pytest_skippy')
+    (True, False)
+
+    :param module_name: Full path to a module.
+    :type module_name: str
+
+    :rtype: bool
+    """
+    return module_name.partition('.')[0] in get_ignored_modules()
+
+
+class BudgetExceeded(Exception):
+    """Raised when the analysis exceeds its :py:class:`Budget`"""
+
+
+class Budget(object):
+    """Limits on the amount of work done by the import graph analysis
+
+    Once any limit is exceeded, every further use of the budget raises
+    :py:class:`BudgetExceeded`.
+
+    :param max_modules: The maximum number of modules visited (None = no
+                        limit)
+    :type max_modules: int
+    :param max_files: The maximum number of files parsed (None = no limit)
+    :type max_files: int
+    :param time_limit: The maximum number of seconds, starting from the
+                       creation of the budget (None = no limit)
+    :type time_limit: float
+    """
+
+    def __init__(self, max_modules=None, max_files=None, time_limit=None):
+        self.max_modules = max_modules
+        self.max_files = max_files
+        self.time_limit = time_limit
+        self.deadline = None
+        if time_limit is not None:
+            self.deadline = time.time() + time_limit
+
+        self.modules_visited = 0
+        self.files_parsed = 0
+
+        # A description of the exceeded limit (None while within budget)
+        self.exceeded = None
+
+    def _exceed_time_limit(self):
+        self.exceeded = self.exceeded or 'time limit of %gs' % self.time_limit
+
+    def check(self):
+        """Check that the budget is not exceeded
+
+        :raises BudgetExceeded: if the budget is exceeded
+        """
+        if (self.exceeded is None and self.deadline is not None and
+                time.time() > self.deadline):
+            self._exceed_time_limit()
+
+        if self.exceeded is not None:
+            raise BudgetExceeded(self.exceeded)
+
+    def wait(self, task):
+        """Wait for a background task within the time limit
+
+        :param task: The task
+        :type task: pytest_skippy.util.BackgroundTask
+
+        :returns: The value returned by the task
+
+        :raises BudgetExceeded: if the budget is exceeded before the task
+                                completes
+        """
+        self.check()
+
+        timeout = None
+        if self.deadline is not None:
+            timeout = max(0, self.deadline - time.time())
+
+        try:
+            return task.result(timeout)
+        except util.TaskTimeout:
+            self._exceed_time_limit()
+            raise BudgetExceeded(self.exceeded)
+
+    def visit_module(self):
+        """Account for a visited module
+
+        :raises BudgetExceeded: if the budget is exceeded
+        """
+        self.modules_visited += 1
+        if (self.max_modules is not None and
+                self.modules_visited > self.max_modules):
+            self.exceeded = self.exceeded or (
+                    'limit of %d modules visited' % self.max_modules)
+        self.check()
+
+    def parse_file(self):
+        """Account for a parsed file
+
+        :raises BudgetExceeded: if the budget is exceeded
+        """
+        self.files_parsed += 1
+        if self.max_files is not None and self.files_parsed > self.max_files:
+            self.exceeded = self.exceeded or (
+                    'limit of %d files parsed' % self.max_files)
+        self.check()
 
 
 class Skippy(object):
@@ -23,16 +157,83 @@ class Skippy(object):
                       ``from module1 import module2`` syntax. This is not
                       necessary if your code only imports attributes with from
                       statements (example: ``from module import function``).
+                      Candidates which statically can't be submodules (see
+                      :py:meth:`is_attribute`) do not cause a run.
     :type safe_mode: bool
+    :param changed_symbols: Files for which only some top level definitions
+                            have changed, mapped to the set of changed names.
+                            An import of one of those files only causes a
+                            run if a changed name is imported from it (or the
+                            module is imported as a whole). These files should
+                            not be present in changed_files.
+    :type changed_symbols: dict
+    :param use_bytecode: Extract imports from up to date cached bytecode
+                         instead of parsing source files when possible.
+    :type use_bytecode: bool
+    :param parse_cache: A cache of the import statements of files
+    :type parse_cache: pytest_skippy.cache.ParseCache
+    :param budget: Limits on the analysis. Once the budget is exceeded, every
+                   test is conservatively marked as needing to run.
+                   (Default: unlimited)
+    :type budget: Budget
+    :param ignored_kinds: Kinds of imports which are not traversed (example:
+                          :py:data:`pytest_skippy.parse.TYPE_CHECKING`)
+    :type ignored_kinds: set
+    :param import_graph: An import graph recorded at runtime, used instead of
+                         parsing the files it covers
+    :type import_graph: pytest_skippy.graph.ImportGraph
+    :param reader: Reads source files. The files of the modules discovered
+                   by a traversal are read ahead while earlier modules are
+                   parsed.
+    :type reader: pytest_skippy.readahead.SourceReader
+    :param module_settings: The names of the variables holding the names of
+                            dynamically imported modules (see
+                            :py:class:`pytest_skippy.parse.ImportVisitor`)
+    :type module_settings: set
+    :param module_index: Resolves module names to files (Default: a new index
+                         for the current sys.path)
+    :type module_index: pytest_skippy.imp.ModuleIndex
+    :param resolver: Called with a module name before it is looked up in the
+                     module index. Returns the filename of the module, or
+                     None to look it up.
+    :type resolver: callable
+    :param parser: Called with a filename before it is parsed. Returns
+                   (submodules, confirmed_submodules), or None to parse it.
+    :type parser: callable
+
+    After a test is marked as needing to run, the number of import hops
+    between its root module and the nearest module that caused the run is
+    available in the ``distances`` attribute (a :py:class:`dict` keyed by
+    root module, or by file for :py:meth:`should_run_file`).
     """
 
-    def __init__(self, changed_files, safe_mode=False):
+    def __init__(self, changed_files, safe_mode=False, changed_symbols=None,
+                 use_bytecode=False, parse_cache=None, budget=None,
+                 ignored_kinds=(), import_graph=None, reader=None,
+                 module_settings=parse.MODULE_SETTINGS, module_index=None,
+                 resolver=None, parser=None):
         self.changed_files = changed_files
         self.safe_mode = safe_mode
+        self.changed_symbols = changed_symbols or {}
+        self.use_bytecode = use_bytecode
+        self.parse_cache = parse_cache
+        self.budget = budget or Budget()
+        self.ignored_kinds = ignored_kinds
+        self.import_graph = import_graph
+        self.reader = reader
+        self.module_settings = module_settings
+
+        # Module resolution is cached for the lifetime of this object
+        self.module_index = module_index or imp.ModuleIndex()
+        self.resolver = resolver
+        self.parser = parser
 
         # intermediate state (used only at the end of a non-skipped traversal)
         self.import_tree = dict()
 
+        # The submodules imported by each traversed module {module: imports}
+        self.imported_modules = dict()
+
         # Non-safe mode state only
         # Can cause early skipping when a confirmed module fails to load
         self.confirmed_modules = set()
@@ -41,17 +242,61 @@ class Skippy(object):
         # Any module in modules_to_run immediately returns True
         self.modules_to_run = set()
 
-    def mark_as_run(self, imported_module):
+        # Number of import hops between a module and the nearest module
+        # causing a run (recorded for every module in modules_to_run)
+        self.distances = dict()
+
+        # The modules imported by files which are not modules {filename:
+        # modules}
+        self.embedded_imports = dict()
+
+        # The packages implicitly imported with the modules they contain
+        # {package: ancestors}
+        self.ancestors = dict()
+
+        # The result of the traversal of each package, shared by the modules
+        # it contains {package: True if it causes a run, None while it is
+        # traversed}
+        self.package_closures = dict()
+
+        # The packages being traversed (innermost last) and those of them
+        # whose traversal reached a package being traversed
+        self._closure_stack = []
+        self._incomplete_closures = set()
+
+    def mark_as_run(self, imported_module, distance=0):
         """Mark a module as causing a test run
 
         This also implicitly marks any modules that import the
-        "imported_module" as needing to run.
+        "imported_module" as needing to run, and records the distance of each
+        of them to the nearest module that caused the run.
 
         :param imported_module: The module that should cause a test run
         :type imported_module: str
+        :param distance: The number of import hops between imported_module and
+                         the module that caused the run
+        :type distance: int
         """
-        flat_imports = util.flatten_imports(imported_module, self.import_tree)
-        self.modules_to_run |= flat_imports
+        hops = util.get_import_distances(imported_module, self.import_tree)
+        for module, hop in hops.items():
+            self.set_distance(module, distance + hop)
+
+        self.modules_to_run.update(hops)
+
+    def set_distance(self, module, distance):
+        """Record the distance of a module to the nearest change
+
+        The smallest distance is kept, so that it doesn't depend on the order
+        in which the modules are analyzed.
+
+        :param module: A module which must run
+        :type module: str
+        :param distance: The number of import hops between the module and a
+                         module that caused the run
+        :type distance: int
+        """
+        if distance < self.distances.get(module, distance + 1):
+            self.distances[module] = distance
 
     def record_imports(self, module, submodules):
         """Updates the import graph
@@ -64,12 +309,82 @@ class Skippy(object):
                            module.
         :type submodules: set or list
         """
+        self.imported_modules[module] = submodules
+
         for submodule in submodules:
             imported_by = self.import_tree.setdefault(submodule, set())
             imported_by.add(module)
 
-    @staticmethod
-    def convert_module_to_filename(module):
+    def get_dependencies(self, root_module):
+        """Get every file in the import graph of a module
+
+        Unlike :py:func:`should_run`, the traversal does not stop when a
+        changed file is found. Modules that cannot be located and ignored
+        (standard library) modules are not included.
+
+        :param root_module: The module at the root of the import graph
+        :type root_module: str
+
+        :returns: The filenames of the root module and all modules it imports
+                  (transitively)
+        :rtype: set
+
+        :raises BudgetExceeded: if the budget is exceeded during the traversal
+        """
+        filenames = set()
+        traversed = set()
+        imported_modules = deque((root_module,))
+
+        while imported_modules:
+            imported_module = imported_modules.popleft()
+            if is_ignored(imported_module) or imported_module in traversed:
+                continue
+
+            traversed.add(imported_module)
+            self.budget.visit_module()
+
+            imported_filename = self.convert_module_to_filename(
+                    imported_module)
+            if not imported_filename:
+                continue
+
+            filenames.add(imported_filename)
+
+            submodules = self.imported_modules.get(imported_module)
+            if submodules is None:
+                self.budget.parse_file()
+                submodules = self.prepare_traversal(imported_filename)
+                self.record_imports(imported_module, submodules)
+
+            imported_modules.extend(submodules)
+            imported_modules.extend(
+                    self.get_implicit_imports(imported_module, submodules))
+
+        return filenames
+
+    def is_changed(self, filename, whole=False):
+        """Determine if a file has been changed
+
+        :param filename: The file to check
+        :type filename: str
+        :param whole: True if the file is used as a whole, in which case a
+                      change to any of its definitions counts as a change
+        :type whole: bool
+
+        :returns: True if the file has changed
+        :rtype: bool
+        """
+        if filename in self.changed_files:
+            return True
+
+        # Extension modules change when the files they are built from change
+        if any(_ in self.changed_files
+               for _ in imp.get_extension_sources(filename)):
+            return True
+
+        return whole and bool(self.changed_symbols.get(filename))
+
+    def convert_module_to_filename(self, module):
         """Converts a module name to a filename
 
         This method is mainly used for test method injection. It should not be
@@ -81,7 +396,24 @@ class Skippy(object):
         :returns: A filename containing a definition for the module
         :rtype: str
         """
-        return imp.convert_module_to_filename(module)
+        if self.resolver is not None:
+            filename = self.resolver(module)
+            if filename is not None:
+                return filename
+
+        return imp.convert_module_to_filename(module, self.module_index)
+
+    def is_attribute(self, name):
+        """Determine if a from import candidate is an attribute of a module
+
+        :param name: A dotted name (example: ``foo.bar`` for
+                     ``from foo import bar``)
+        :type name: str
+
+        :returns: True if the name is statically known to not be a submodule
+        :rtype: bool
+        """
+        return self.module_index.is_attribute(name)
 
     def should_run(self, root_module):
         """Determine if a test should run for a given module
@@ -98,6 +430,188 @@ class Skippy(object):
         :returns: True if the test should run
         :rtype: bool
         """
+        try:
+            return self._traverse(root_module)
+        except BudgetExceeded:
+            # Stop the analysis and conservatively run the test
+            return True
+        finally:
+            # The files read ahead for the rest of an interrupted traversal
+            # would be left pending
+            if self.reader is not None:
+                self.reader.discard()
+
+    def should_run_file(self, filename):
+        """Determine if a test defined outside of a python module should run
+
+        Such a test (for example a doctest text file or a notebook cell, see
+        :py:func:`pytest_skippy.parse.get_embedded_imports`) must run if its
+        file changed or if any of the modules imported by its code must run.
+
+        :param filename: The file defining the test
+        :type filename: str
+
+        :returns: True if the test should run
+        :rtype: bool
+        """
+        if self.is_changed(filename, whole=True):
+            self.distances[filename] = 0
+            return True
+
+        try:
+            modules = self.get_embedded_imports(filename)
+        except BudgetExceeded:
+            return True
+        except (SyntaxError, ValueError, TypeError, IOError, OSError):
+            # The code of the file can't be analyzed
+            return True
+
+        running = [_ for _ in sorted(modules) if self.should_run(_)]
+        if not running:
+            return False
+
+        self.distances[filename] = 1 + min(
+                self.distances.get(_, 0) for _ in running)
+        return True
+
+    def get_embedded_imports(self, filename):
+        """Get the modules imported by the code embedded in a file
+
+        :param filename: A doctest text file or a notebook
+        :type filename: str
+
+        :returns: The set of imported modules
+        :rtype: set
+        """
+        modules = self.embedded_imports.get(filename)
+        if modules is None:
+            self.budget.parse_file()
+            modules, confirmed_modules = parse.get_embedded_imports(
+                    filename, self.ignored_kinds)
+            self.confirmed_modules.update(confirmed_modules)
+            self.embedded_imports[filename] = modules
+
+        return modules
+
+    def get_ancestors(self, module):
+        """Get the packages which are implicitly imported with a module
+
+        Importing ``a.b.c`` runs ``a/__init__.py`` and ``a/b/__init__.py``.
+        The ancestors of each package are computed once and shared by the
+        modules it contains. Packages without a file (namespace packages) and
+        ignored packages are not included.
+
+        :param module: The name of a module
+        :type module: str
+
+        :returns: The packages containing the module, outermost first
+        :rtype: tuple
+        """
+        parent = module.rpartition('.')[0]
+        if not parent or is_ignored(parent):
+            return ()
+
+        try:
+            return self.ancestors[parent]
+        except KeyError:
+            pass
+
+        ancestors = self.get_ancestors(parent)
+        filename = self.convert_module_to_filename(parent)
+
+        # The parent of a from import candidate may be a module
+        if filename and os.path.basename(filename).startswith('__init__.'):
+            ancestors += (parent,)
+
+        self.ancestors[parent] = ancestors
+        return ancestors
+
+    def get_implicit_imports(self, module, submodules):
+        """Get the packages implicitly imported by a module and its imports
+
+        :param module: The importing module
+        :type module: str
+        :param submodules: The modules it imports
+        :type submodules: set
+
+        :returns: The ancestor packages of the module and of its imports
+                  which are not imported explicitly
+        :rtype: set
+        """
+        packages = set()
+        for name in chain((module,), submodules):
+            packages.update(self.get_ancestors(name))
+
+        return packages.difference(submodules)
+
+    def package_must_run(self, package):
+        """Determine if anything imported by a package causes a run
+
+        The package is traversed (as if it was imported on its own) the first
+        time this is called, and the result is shared by every module it
+        contains, so that implicit imports of packages don't increase the
+        cost of each traversal.
+
+        :param package: The name of a package
+        :type package: str
+
+        :returns: True if the package causes a run
+        :rtype: bool
+
+        :raises BudgetExceeded: if the budget is exceeded during the traversal
+        """
+        if package in self.package_closures:
+            must_run = self.package_closures[package]
+            if must_run is None:
+                # An import cycle: the traversal of the package in progress
+                # covers its imports, but the traversals nested in it lack
+                # them
+                index = self._closure_stack.index(package)
+                self._incomplete_closures.update(
+                        self._closure_stack[index + 1:])
+                return False
+
+            return must_run
+
+        self.package_closures[package] = None
+        self._closure_stack.append(package)
+        try:
+            must_run = self._traverse(package, whole=False)
+        finally:
+            self._closure_stack.pop()
+            del self.package_closures[package]
+            complete = package not in self._incomplete_closures
+            self._incomplete_closures.discard(package)
+
+        if must_run:
+            self.modules_to_run.add(package)
+
+        # A run is certain, otherwise only complete traversals are reused
+        if must_run or complete:
+            self.package_closures[package] = must_run
+
+        return must_run
+
+    def add_running_packages(self, module, submodules):
+        """Add the implicitly imported packages which cause a run
+
+        Packages which don't cause a run are left out, since they don't need
+        to be traversed again.
+
+        :param module: The importing module
+        :type module: str
+        :param submodules: The modules it imports
+        :type submodules: set
+
+        :returns: The imported modules, including the packages which cause a
+                  run
+        :rtype: set
+        """
+        return set(submodules) | set(
+                _ for _ in self.get_implicit_imports(module, submodules)
+                if self.package_must_run(_))
+
+    def _traverse(self, root_module, whole=True):
         # Create an initial seed. The root module is always the start of the
         # traversal.
         imported_modules = deque((root_module,))
@@ -106,6 +620,9 @@ class Skippy(object):
         # traversal
         traversed = set()
 
+        # Record the import depth at which each module was first discovered
+        depths = {root_module: 0}
+
         # The root module is not imported by anything initially
         self.import_tree.setdefault(root_module, set())
 
@@ -124,28 +641,35 @@ class Skippy(object):
             # the future. This updates the cache of the modules causing a run
             # so that a future traversal is short circuited.
             for imported_module in modules_causing_run:
-                self.mark_as_run(imported_module)
+                distance = self.distances.get(imported_module, 0)
+                self.mark_as_run(imported_module, distance)
 
             # If any imported module causes a run, then mark the test as
             # needing to run
             if modules_causing_run:
+                self.set_distance(root_module, min(
+                        depths[_] + self.distances.get(_, 0)
+                        for _ in modules_causing_run))
                 return True
 
             # Pop imported module
             imported_module = imported_modules.popleft()
 
             # If the module is ignored, continue
-            if imported_module in (IGNORED_MODULES | traversed):
+            if is_ignored(imported_module) or imported_module in traversed:
                 continue
 
+            self.budget.visit_module()
+
             # Get filename
             imported_filename = self.convert_module_to_filename(
                     imported_module)
 
             # If we can't import something, we have to run the test if we're in
-            # safe mode. Otherwise we might be able to ignore it.
+            # safe mode (unless it's statically known to be an attribute of a
+            # module). Otherwise we might be able to ignore it.
             if not imported_filename:
-                if self.safe_mode:
+                if self.safe_mode and not self.is_attribute(imported_module):
                     break
                 # Some modules are definitely modules. (i.e. import pytest)
                 # If they can't be imported, we must run the test
@@ -160,13 +684,18 @@ class Skippy(object):
                 continue  # pragma: no cover
 
             # If file is in changed files, mark the test as needing to run.
-            if imported_filename in self.changed_files:
+            # The root module uses every definition in its own file (unless
+            # it is a package implicitly imported by the modules it contains)
+            if self.is_changed(imported_filename,
+                               whole=whole and imported_module == root_module):
                 break
 
             # else, the file is not directly edited and we must traverse its
             # children
 
-            submodules = self.prepare_traversal(imported_filename)
+            self.budget.parse_file()
+            submodules = self.add_running_packages(
+                    imported_module, self.prepare_traversal(imported_filename))
 
             # Update the import tree state with the discovered imports
             # The import tree maps {module: imported_by}
@@ -174,6 +703,11 @@ class Skippy(object):
 
             # Add imported modules to traversal
             imported_modules.extend(submodules)
+            self.read_ahead(submodules)
+
+            # Submodules are one import hop further from the root module
+            depth = depths[imported_module] + 1
+            depths.update((_, depth) for _ in submodules if _ not in depths)
 
             # Mark this module as traversed to prevent import cycles
             traversed.add(imported_module)
@@ -185,8 +719,25 @@ class Skippy(object):
             return False
 
         self.mark_as_run(imported_module)
+        self.set_distance(root_module, depths[imported_module])
         return True
 
+    def read_ahead(self, modules):
+        """Start reading the source files of modules about to be traversed
+
+        :param modules: The names of the modules
+        :type modules: iterable
+        """
+        if self.reader is None:
+            return
+
+        filenames = (self.convert_module_to_filename(_) for _ in modules
+                     if not is_ignored(_) and _ not in self.imported_modules)
+        self.reader.prefetch(
+                _ for _ in filenames
+                if _ and _.endswith('.py') and _ not in self.changed_files and
+                self.get_recorded_imports(_) is None)
+
     def prepare_traversal(self, imported_filename):
         """Extract submodules from a file
 
@@ -210,11 +761,137 @@ class Skippy(object):
         #   foo MUST be a module
         #
         #   from foo import bar
-        submodules, confirmed_submodules = (
-            parse.get_imported_modules(imported_filename))
+        #
+        # The imports of extension modules can't be extracted.
+        if imp.get_extension_sources(imported_filename):
+            return set()
+
+        # Recorded imports were all executed, so they are confirmed
+        recorded = self.get_recorded_imports(imported_filename)
+        if recorded is not None:
+            self.confirmed_modules.update(recorded)
+            return recorded
+
+        provided = self.get_provided_imports(imported_filename)
+        if provided is not None:
+            submodules, confirmed_submodules = provided
+            self.confirmed_modules.update(confirmed_submodules)
+            return submodules
+
+        if not self.changed_symbols:
+            submodules, confirmed_submodules = (
+                parse.get_imported_modules(
+                    imported_filename, self.use_bytecode, self.parse_cache,
+                    self.ignored_kinds, self.reader, self.module_settings))
+        else:
+            submodules, confirmed_submodules, imported_names = (
+                parse.get_imported_symbols(
+                    imported_filename, self.use_bytecode, self.parse_cache,
+                    self.ignored_kinds, self.reader, self.module_settings))
+
+            # Imports of changed symbols are added as submodules which cause
+            # a run
+            changed_symbols = self.find_changed_symbols(imported_names)
+            self.modules_to_run |= changed_symbols
+            for changed_symbol in changed_symbols:
+                self.set_distance(changed_symbol, 0)
+            submodules |= changed_symbols
 
         # Track confirmed, unambiguous imports for use outside of safe
         # mode
         self.confirmed_modules.update(confirmed_submodules)
 
         return submodules
+
+    def get_recorded_imports(self, filename):
+        """Get the imports of a file from the recorded import graph
+
+        :param filename: The canonical path of a file
+        :type filename: str
+
+        :returns: The set of recorded modules or None if the file must be
+                  parsed instead
+        :rtype: set
+        """
+        if self.import_graph is None:
+            return None
+
+        recorded = self.import_graph.get(filename)
+        if recorded is None or self.imports_changed_symbols(recorded):
+            return None
+
+        return recorded
+
+    def get_provided_imports(self, filename):
+        """Get the imports of a file from the parser plugged into skippy
+
+        :param filename: The canonical path of a file
+        :type filename: str
+
+        :returns: (submodules, confirmed_submodules) or None if the file must
+                  be parsed instead
+        :rtype: tuple
+        """
+        if self.parser is None:
+            return None
+
+        provided = self.parser(filename)
+        if provided is None:
+            return None
+
+        submodules, confirmed_submodules = provided
+        if self.imports_changed_symbols(submodules):
+            return None
+
+        return set(submodules), set(confirmed_submodules)
+
+    def imports_changed_symbols(self, modules):
+        """Determine if some modules are defined by files with changed symbols
+
+        The names imported from those files are only known from parsing.
+
+        :param modules: The names of imported modules
+        :type modules: iterable
+
+        :returns: True if one of the modules has changed symbols
+        :rtype: bool
+        """
+        if not self.changed_symbols:
+            return False
+
+        return any(self.convert_module_to_filename(_) in self.changed_symbols
+                   for _ in modules)
+
+    def find_changed_symbols(self, imported_names):
+        """Find the imports of changed top level definitions
+
+        Symbols are named after the module defining them (``foo.bar`` for the
+        name ``bar`` defined in the module ``foo``). A module imported as a
+        whole is reported as the symbol ``foo.*`` if any of its definitions
+        changed.
+
+        :param imported_names: A mapping of module to the names imported from
+                               that module (None if the whole module is
+                               imported)
+        :type imported_names: dict
+
+        :returns: A set of imported symbols which have changed
+        :rtype: set
+        """
+        symbols = set()
+        for module, names in imported_names.items():
+            if is_ignored(module):
+                continue
+
+            filename = self.convert_module_to_filename(module)
+            changed_names = self.changed_symbols.get(filename)
+            if not changed_names:
+                continue
+
+            if names is None:
+                symbols.add(module + '.*')
+            else:
+                symbols.update(
+                        '.'.join((module, _)) for _ in names & changed_names)
+
+        return symbols
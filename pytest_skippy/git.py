@@ -1,5 +1,359 @@
 import os
+import os.path
+import re
 import subprocess
+import threading
+
+# The escape sequences of paths quoted by git (see core.quotePath)
+_ESCAPES = {
+    b'a': b'\a', b'b': b'\b', b't': b'\t', b'n': b'\n', b'v': b'\v',
+    b'f': b'\f', b'r': b'\r', b'"': b'"', b'\\': b'\\',
+}
+_ESCAPE = re.compile(br'\\([0-7]{3}|.)')
+
+
+def _run_git(args, git_repo_dir=None, stderr=subprocess.STDOUT):
+    """Run a git command and return its output
+
+    :param args: Arguments to pass to git
+    :type args: list
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+    :param stderr: Where to send the standard error of the git command
+                   (default: merged into the output)
+
+    :returns: The raw output of the git command
+    :rtype: bytes
+    """
+    return subprocess.check_output(
+            ['git'] + list(args),
+            stderr=stderr,
+            cwd=git_repo_dir)
+
+
+def get_merge_base(target_branch, base_branch='HEAD', git_repo_dir=None):
+    """Get the SHA of the merge base between two branches
+
+    :param target_branch: The merge target for a branch.
+    :type target_branch: str
+    :param base_branch: The branch that's being merged (default: 'HEAD')
+    :type base_branch: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: The SHA of the merge base
+    :rtype: str
+    """
+    target_sha = _run_git(
+            ['merge-base', target_branch, base_branch], git_repo_dir)
+    if type(target_sha) is not str:
+        target_sha = target_sha.decode('utf-8')
+
+    # Remove the trailing newline
+    return target_sha.strip()
+
+
+def get_commit(revision='HEAD', git_repo_dir=None):
+    """Get the SHA of a commit
+
+    :param revision: A revision (default: 'HEAD')
+    :type revision: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: The SHA of the commit
+    :rtype: str
+    """
+    sha = _run_git(['rev-parse', '--verify', revision + '^{commit}'],
+                   git_repo_dir)
+    if type(sha) is not str:
+        sha = sha.decode('utf-8')
+
+    return sha.strip()
+
+
+def read_file(revision, filename, git_repo_dir=None):
+    """Read the contents of a file at a given revision
+
+    :param revision: The commit (or branch) to read the file from
+    :type revision: str
+    :param filename: The path of the file relative to the repository root
+    :type filename: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: The contents of the file or None if the file does not exist at
+              that revision
+    :rtype: bytes or None
+    """
+    try:
+        return _run_git(
+                ['show', '%s:%s' % (revision, filename)], git_repo_dir,
+                stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError:
+        return None
+
+
+def _split_null(output):
+    if type(output) is not str:
+        output = output.decode('utf-8')
+
+    return [_ for _ in output.split('\0') if _]
+
+
+def get_blob_ids(git_repo_dir=None):
+    """Get the blob SHA of every unmodified tracked file
+
+    Files with changes in the working tree (compared to the index) are not
+    included since their blob SHA does not describe their contents.
+
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: A mapping of canonical (real) file path to blob SHA
+    :rtype: dict
+    """
+    top_level = _run_git(['rev-parse', '--show-toplevel'], git_repo_dir,
+                         stderr=subprocess.PIPE)
+    if type(top_level) is not str:
+        top_level = top_level.decode('utf-8')
+    top_level = top_level.strip()
+
+    # List files from the top level so all paths are relative to it
+    modified = set(_split_null(
+            _run_git(['ls-files', '-m', '-z'], top_level)))
+
+    blob_ids = {}
+    for entry in _split_null(_run_git(['ls-files', '-s', '-z'], top_level)):
+        info, filename = entry.split('\t', 1)
+        mode, sha, stage = info.split()
+
+        # Only regular files which are not in conflict
+        if not mode.startswith('100') or stage != '0':
+            continue
+
+        if filename in modified:
+            continue
+
+        path = os.path.realpath(os.path.join(top_level, filename))
+        blob_ids[path] = sha
+
+    return blob_ids
+
+
+class BlobReader(object):
+    """Read many objects through a single ``git cat-file --batch`` process
+
+    All requests for a call to :py:meth:`read` are written to git up front
+    (from a separate thread) while the responses are streamed back, so
+    reading many objects costs a single process spawn and no round trips.
+
+    A reader may be used as a context manager, which closes the underlying
+    process on exit. A reader must not be used by several threads at once.
+
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+    """
+
+    COMMAND = ['git', 'cat-file', '--batch']
+
+    def __init__(self, git_repo_dir=None):
+        self.devnull = open(os.devnull, 'wb')
+        self.process = subprocess.Popen(
+                self.COMMAND,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self.devnull,
+                cwd=git_repo_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Terminate the git process"""
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):  # pragma: no cover
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+        self.devnull.close()
+
+    def _write_requests(self, names):
+        try:
+            for name in names:
+                self.process.stdin.write((name + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            # The process has exited, which is reported by the reader
+            pass
+
+    def _read_response(self):
+        header = self.process.stdout.readline()
+        if not header:
+            raise subprocess.CalledProcessError(
+                    self.process.wait(), self.COMMAND)
+
+        header = header.decode('utf-8').rstrip('\n')
+        if header.endswith(' missing') or header.endswith(' ambiguous'):
+            return None
+
+        size = int(header.rsplit(' ', 1)[-1])
+        contents = self.process.stdout.read(size)
+
+        # Discard the newline following the contents
+        self.process.stdout.read(1)
+
+        return contents
+
+    def read(self, names):
+        """Read the contents of several objects
+
+        :param names: Object names understood by git (for example a SHA or
+                      ``revision:path``)
+        :type names: list
+
+        :returns: The contents of each object in order (None for objects that
+                  do not exist)
+        :rtype: list
+
+        :raises subprocess.CalledProcessError: if the git process exits
+        """
+        names = list(names)
+
+        writer = threading.Thread(target=self._write_requests, args=(names,))
+        writer.daemon = True
+        writer.start()
+
+        try:
+            return [self._read_response() for _ in names]
+        finally:
+            writer.join()
+
+
+def read_files(revision, filenames, git_repo_dir=None):
+    """Read the contents of several files at a given revision
+
+    This uses a single :py:class:`BlobReader` process regardless of the number
+    of files.
+
+    :param revision: The commit (or branch) to read the files from
+    :type revision: str
+    :param filenames: The paths of the files relative to the repository root
+    :type filenames: list or set
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: A mapping of filename to contents (None if the file does not
+              exist at that revision)
+    :rtype: dict
+    """
+    filenames = list(filenames)
+    if not filenames:
+        return {}
+
+    with BlobReader(git_repo_dir) as reader:
+        contents = reader.read('%s:%s' % (revision, _) for _ in filenames)
+
+    return dict(zip(filenames, contents))
+
+
+def _unescape(match):
+    escape = match.group(1)
+    if len(escape) == 3:
+        return bytes(bytearray((int(escape, 8),)))
+
+    return _ESCAPES.get(escape, escape)
+
+
+def _unquote_path(path):
+    """Decode a path which git quoted since it contains special characters
+
+    >>> print(_unquote_path(r'"a/\\"1\\".py"'))
+    a/"1".py
+    >>> print(_unquote_path(r'"\\101\\102.py"'))
+    AB.py
+    >>> print(_unquote_path('a/plain.py'))
+    a/plain.py
+    """
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    quoted = path[1:-1]
+    if not isinstance(quoted, bytes):
+        quoted = quoted.encode('utf-8')
+
+    unquoted = _ESCAPE.sub(_unescape, quoted)
+    if isinstance(path, bytes):
+        return unquoted
+
+    return unquoted.decode('utf-8', 'replace')
+
+
+def get_changed_hunks(revision, base_branch='HEAD', git_repo_dir=None):
+    """Get the lines of each file changed since a revision
+
+    Renames are reported as a removed and an added file.
+
+    :param revision: The revision the files are compared against (usually the
+                     merge base)
+    :type revision: str
+    :param base_branch: The branch that's being merged (default: 'HEAD')
+    :type base_branch: str
+    :param git_repo_dir: The base directory of the git repository.
+                         None = current directory. (Default)
+    :type git_repo_dir: None or str
+
+    :returns: A mapping of changed file to a list of (start, count,
+              new_start, new_count) tuples describing the changed lines at
+              revision and the lines replacing them at base_branch. A count
+              of 0 means lines were inserted after the start line (or
+              removed after the new start line).
+    :rtype: dict
+    """
+    output = _run_git(
+            ['diff', '-U0', '--no-color', '--no-renames', '--no-ext-diff',
+             '--src-prefix=a/', '--dst-prefix=b/',
+             '%s..%s' % (revision, base_branch)],
+            git_repo_dir, stderr=subprocess.PIPE)
+    if type(output) is not str:
+        output = output.decode('utf-8', 'replace')
+
+    hunks = {}
+    old_name = None
+
+    # File names are only read from the header of each file, since removed
+    # and added lines may also start with '--- ' or '+++ '
+    in_header = False
+    for line in output.splitlines():
+        if line.startswith('diff --git '):
+            in_header = True
+        elif in_header and line.startswith('--- '):
+            # Names containing spaces are followed by a tab
+            old_name = _unquote_path(line[4:].rstrip('\t'))
+            old_name = old_name[2:] if old_name.startswith('a/') else None
+        elif in_header and line.startswith('+++ '):
+            name = old_name or _unquote_path(line[4:].rstrip('\t'))[2:]
+            file_hunks = hunks.setdefault(name, [])
+        elif line.startswith('@@ '):
+            in_header = False
+            ranges = line.split()[1:3]
+            hunk = []
+            for start, _, count in (_[1:].partition(',') for _ in ranges):
+                hunk.extend((int(start), int(count or 1)))
+            file_hunks.append(tuple(hunk))
+
+    return hunks
 
 
 def detect_changed_files(target_branch, base_branch='HEAD', git_repo_dir=None):
@@ -16,37 +370,21 @@ def detect_changed_files(target_branch, base_branch='HEAD', git_repo_dir=None):
     :returns: A set of files that have changed in the git repository.
     :rtype: set
     """
-    start_dir = os.getcwd()
-    git_repo_dir = git_repo_dir or start_dir
+    # Extract the SHA of the merge base
+    target_sha = get_merge_base(target_branch, base_branch, git_repo_dir)
 
-    os.chdir(git_repo_dir)
-    try:
-        # Extract the SHA of the merge base
-        target_sha = subprocess.check_output(
-                ['git', 'merge-base', target_branch, base_branch],
-                stderr=subprocess.STDOUT)
-        if type(target_sha) is not str:
-            target_sha = target_sha.decode('utf-8')
-
-        # Remove the trailing newline
-        target_sha = target_sha.strip()
-
-        # Extract the changed files going into the merge
-        changed_files = subprocess.check_output(
-                ['git', 'diff', '%s..%s' % (target_sha, base_branch),
-                    '--name-only'],
-                stderr=subprocess.STDOUT)
-        if type(changed_files) is not str:
-            changed_files = changed_files.decode('utf-8')
-
-        # Split changed files into a list
-        changed_files = changed_files.strip()
-        if not changed_files:
-            return set()
-
-        changed_files = changed_files.split('\n')
-
-        # Coerce to absolute path
-        return set(changed_files)
-    finally:
-        os.chdir(start_dir)
+    # Extract the changed files going into the merge
+    changed_files = _run_git(
+            ['diff', '%s..%s' % (target_sha, base_branch), '--name-only'],
+            git_repo_dir)
+    if type(changed_files) is not str:
+        changed_files = changed_files.decode('utf-8')
+
+    # Split changed files into a list
+    changed_files = changed_files.strip()
+    if not changed_files:
+        return set()
+
+    changed_files = changed_files.split('\n')
+
+    return set(changed_files)
@@ -0,0 +1,286 @@
+import importlib
+import os.path
+import sys
+
+import pytest_skippy.cache as cache
+
+try:
+    import builtins
+except ImportError:  # pragma: no cover
+    import __builtin__ as builtins
+
+
+def _resolve_name(name, package, level):
+    """Resolve a relative module name (as done by the import system)
+
+    >>> _resolve_name('c', 'a.b', 2)
+    'a.c'
+    >>> _resolve_name('', 'a.b', 1)
+    'a.b'
+
+    :raises ValueError: if the import goes beyond the top level package
+    """
+    bits = package.rsplit('.', level - 1)
+    if not package or len(bits) < level:
+        raise ValueError('Relative import beyond top level package')
+
+    base = bits[0]
+    return '%s.%s' % (base, name) if name else base
+
+
+def _get_package(module_globals):
+    """Get the package used to resolve relative imports in a module"""
+    package = module_globals.get('__package__')
+    if package:
+        return package
+
+    name = module_globals.get('__name__') or ''
+    if '__path__' in module_globals:
+        return name
+
+    return name.rpartition('.')[0]
+
+
+def _get_source(filename):
+    # Python 2 modules loaded from bytecode refer to the .pyc file
+    if filename.endswith(('.pyc', '.pyo')):
+        return filename[:-1]
+
+    return filename
+
+
+class ImportRecorder(object):
+    """Record the modules imported by each file at runtime
+
+    While recording, :py:func:`__import__` and
+    :py:func:`importlib.import_module` are wrapped so that every executed
+    import statement (including imports of modules which were already loaded)
+    is recorded as an edge from the file executing it to the imported module.
+
+    Only modules which are loaded while recording are part of the recorded
+    graph, since the imports executed by the other modules are unknown.
+
+    :param root: The root directory of the recorded files. Files outside of
+                 this directory are not recorded.
+    :type root: str
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+        # {filename: set(modules)}
+        self.imports = {}
+
+        # Modules loaded before the recording started
+        self.preloaded = set()
+
+        self._original_import = None
+        self._original_import_module = None
+
+    def start(self):
+        """Start recording"""
+        self.preloaded = set(sys.modules)
+        self._original_import = builtins.__import__
+        self._original_import_module = importlib.import_module
+        builtins.__import__ = self._import
+        importlib.import_module = self._import_module
+
+    def stop(self):
+        """Stop recording"""
+        if self._original_import is None:
+            return
+
+        builtins.__import__ = self._original_import
+        importlib.import_module = self._original_import_module
+        self._original_import = self._original_import_module = None
+
+    def _record(self, module_globals, name, fromlist=(), level=0):
+        filename = module_globals and module_globals.get('__file__')
+        if not filename:
+            return
+
+        if level > 0:
+            try:
+                name = _resolve_name(name, _get_package(module_globals),
+                                     level)
+            except ValueError:
+                return
+
+        modules = self.imports.setdefault(filename, set())
+        modules.add(name)
+
+        # Names imported from a package may be submodules
+        for attribute in fromlist or ():
+            submodule = '.'.join((name, attribute))
+            if submodule in sys.modules:
+                modules.add(submodule)
+
+    # Failed imports (such as optional dependencies) are recorded too, since
+    # the module may be added later
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        try:
+            return self._original_import(
+                    name, globals, locals, fromlist, level)
+        finally:
+            self._record(globals, name, fromlist, level)
+
+    def _import_module(self, name, package=None):
+        level = len(name) - len(name.lstrip('.'))
+        module_globals = sys._getframe(1).f_globals
+        if level:
+            module_globals = dict(module_globals, __package__=package)
+
+        try:
+            return self._original_import_module(name, package)
+        finally:
+            self._record(module_globals, name[level:], level=level)
+
+    def get_graph(self):
+        """Return the recorded import graph
+
+        :returns: A mapping of the path of each file loaded while recording
+                  (relative to the root directory) to the list of modules it
+                  imported
+        :rtype: dict
+        """
+        graph = {}
+        for name, module in list(sys.modules.items()):
+            filename = getattr(module, '__file__', None)
+            if name in self.preloaded or not filename:
+                continue
+
+            path = os.path.relpath(
+                    os.path.realpath(_get_source(filename)), self.root)
+            if path.startswith(os.pardir):
+                continue
+
+            graph[path] = sorted(self.imports.get(filename, ()))
+
+        return graph
+
+
+class ImportGraph(object):
+    """An import graph recorded by an :py:class:`ImportRecorder`
+
+    :param imports: The recorded graph (see
+                    :py:meth:`ImportRecorder.get_graph`)
+    :type imports: dict
+    :param root: The root directory of the recorded files
+    :type root: str
+    :param stale_files: Files (relative to the root directory) which changed
+                        since the graph was recorded. The graph is not used
+                        for those files.
+    :type stale_files: set
+    """
+
+    NAMESPACE = 'graph-v1'
+
+    def __init__(self, imports, root, stale_files=()):
+        self.imports = imports
+        self.root = os.path.realpath(root)
+        self.stale_files = set(stale_files)
+
+    @classmethod
+    def has_recordings(cls, directory):
+        """Determine if any graph was recorded
+
+        :param directory: The root directory of the cache
+        :type directory: str
+
+        :rtype: bool
+        """
+        return not cache.ContentStore(directory, cls.NAMESPACE).is_empty()
+
+    @classmethod
+    def load(cls, directory, commit, root, stale_files=()):
+        """Load the graph recorded at a commit
+
+        :param directory: The root directory of the cache
+        :type directory: str
+        :param commit: The SHA of the commit
+        :type commit: str
+        :param root: The root directory of the recorded files
+        :type root: str
+        :param stale_files: Files (relative to the root directory) which
+                            changed since the commit
+        :type stale_files: set
+
+        :returns: The recorded graph or None if no graph was recorded
+        :rtype: ImportGraph
+        """
+        imports = cache.ContentStore(directory, cls.NAMESPACE).get(commit)
+        if imports is None:
+            return None
+
+        return cls(imports, root, stale_files)
+
+    @classmethod
+    def save(cls, directory, commit, imports):
+        """Store the graph recorded at a commit
+
+        :param directory: The root directory of the cache
+        :type directory: str
+        :param commit: The SHA of the commit
+        :type commit: str
+        :param imports: The recorded graph
+        :type imports: dict
+        """
+        cache.ContentStore(directory, cls.NAMESPACE).set(commit, imports)
+
+    def get(self, filename):
+        """Get the modules imported by a file
+
+        :param filename: The canonical path of a file
+        :type filename: str
+
+        :returns: The set of recorded modules or None if the file was not
+                  recorded (or changed since it was recorded)
+        :rtype: set
+        """
+        path = os.path.relpath(filename, self.root)
+        if path in self.stale_files:
+            return None
+
+        modules = self.imports.get(path)
+        if modules is None:
+            return None
+
+        return set(modules)
+
+
+class GraphRecorder(object):
+    """A pytest plugin recording the import graph of a test session
+
+    The graph is stored (keyed by the current commit) once the session
+    finishes, unless some of the collected tests did not run.
+
+    :param recorder: The started import recorder
+    :type recorder: ImportRecorder
+    :param directory: The root directory of the cache
+    :type directory: str
+    :param get_commit: Returns the SHA of the current commit
+    :type get_commit: callable
+    """
+
+    def __init__(self, recorder, directory, get_commit):
+        self.recorder = recorder
+        self.directory = directory
+        self.get_commit = get_commit
+        self.complete = True
+
+    def pytest_deselected(self, items):
+        # Imports executed by deselected tests would be missing
+        self.complete = False
+
+    def pytest_sessionfinish(self, session):
+        self.recorder.stop()
+        interrupted = (session.shouldstop or
+                       getattr(session, 'shouldfail', False))
+        if not self.complete or interrupted:
+            return
+
+        commit = self.get_commit()
+        if commit:
+            ImportGraph.save(self.directory, commit,
+                             self.recorder.get_graph())
@@ -0,0 +1,82 @@
+import pytest
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_skippy_changed_files(config, target_branch, git_repo_dir):
+    """Detect the files changed relative to the target branch
+
+    Replaces the git diff against the merge base. Stops at the first non-None
+    result. This hook may be called from a background thread.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param target_branch: The value of ``--skippy-target-branch``
+    :type target_branch: str
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+
+    :returns: The changed files, relative to the repository root, or None to
+              ask git
+    :rtype: set
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_skippy_resolve_module(config, module_name):
+    """Locate the file defining a module
+
+    Called before the module is located on sys.path. Stops at the first
+    non-None result.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param module_name: The full name of the module
+    :type module_name: str
+
+    :returns: The canonical path of the file defining the module, an empty
+              string if the module has no file, or None to search sys.path
+    :rtype: str
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_skippy_parse_file(config, filename):
+    """Get the modules imported by a file
+
+    Called before the file is parsed (for example to use the dependencies
+    known to a build system). Stops at the first non-None result. The result
+    is ignored for files importing modules with changed symbols (see
+    ``--skippy-symbols``) since the imported names are only known from
+    parsing.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param filename: The canonical path of the file
+    :type filename: str
+
+    :returns: (modules, confirmed_modules) where confirmed_modules are the
+              modules which must exist for the file to be imported, or None
+              to parse the file
+    :rtype: tuple
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_skippy_decision(item, should_run, distance):
+    """Override the decision to run or skip a test
+
+    Stops at the first non-None result.
+
+    :param item: The test item
+    :type item: _pytest.main.Item
+    :param should_run: True if skippy decided to run the test
+    :type should_run: bool
+    :param distance: The import distance between the test and the nearest
+                     change (0 for tests which must run, None if unknown or
+                     if the test is skipped)
+    :type distance: int
+
+    :returns: True to run the test, False to skip it, or None to keep the
+              decision
+    :rtype: bool
+    """
@@ -1,8 +1,387 @@
+import os
 import os.path
 import pkgutil
+import sys
 
+import pytest_skippy.parse as parse
 
-def convert_module_to_filename(module_name):
+try:
+    from importlib import machinery
+except ImportError:  # pragma: no cover
+    machinery = None
+
+if machinery is not None and hasattr(machinery, 'EXTENSION_SUFFIXES'):
+    # Suffixes in the order they are tried by the import system
+    SUFFIXES = tuple(machinery.EXTENSION_SUFFIXES +
+                     machinery.SOURCE_SUFFIXES +
+                     machinery.BYTECODE_SUFFIXES)
+    EXTENSION_SUFFIXES = tuple(machinery.EXTENSION_SUFFIXES)
+    SOURCE_SUFFIXES = tuple(machinery.SOURCE_SUFFIXES)
+else:  # pragma: no cover
+    SUFFIXES = ('.so', 'module.so', '.py', '.pyc')
+    EXTENSION_SUFFIXES = ('.so', 'module.so')
+    SOURCE_SUFFIXES = ('.py',)
+
+# Suffixes of the files an extension module is conventionally built from
+EXTENSION_SOURCE_SUFFIXES = ('.pyx', '.pxd', '.c', '.cpp')
+
+# The longest suffix must be matched first (.abi3.so before .so)
+_EXTENSION_SUFFIXES_BY_LENGTH = tuple(
+        sorted(EXTENSION_SUFFIXES, key=len, reverse=True))
+
+
+def _extends_path(init):
+    """Determine if the __init__ file of a package declares a legacy
+    namespace package"""
+    try:
+        with open(init, 'rb') as f:
+            source = f.read()
+    except (IOError, OSError):
+        return False
+
+    return b'extend_path' in source or b'declare_namespace' in source
+
+
+class ModuleIndex(object):
+    """An index of module names to the files defining them
+
+    The index resolves modules the same way the import system's path based
+    finder would, without importing anything. Each directory is listed at most
+    once and every resolved name is cached, so repeated lookups are dictionary
+    lookups rather than a series of filesystem calls for each entry of the
+    search path. Package directories are only listed when one of their
+    submodules is looked up.
+
+    Changes to the filesystem after a directory has been listed are not
+    reflected in the index.
+
+    :param path: The search path for top level modules. (Default:
+                 :py:data:`sys.path` at the time the index is created)
+    :type path: list
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = sys.path
+        self.path = [os.path.abspath(_) for _ in path]
+
+        # {directory: set(entries) or None}
+        self._listings = {}
+
+        # {module_name: (filename, submodule_search_locations)}
+        self._modules = {}
+
+        # Non-directory entries of the path (zip files, eggs, ...)
+        self._archives = None
+
+        # {filename: set(top level names) or None}
+        self._top_level_names = {}
+
+    def _listdir(self, directory):
+        """List a directory (None if it's not a directory)"""
+        try:
+            return self._listings[directory]
+        except KeyError:
+            pass
+
+        try:
+            listing = set(os.listdir(directory))
+        except (IOError, OSError):
+            listing = None
+
+        self._listings[directory] = listing
+        return listing
+
+    def _find_package(self, directory):
+        """Return the __init__ file of a package directory"""
+        listing = self._listdir(directory)
+        for suffix in SUFFIXES:
+            if '__init__' + suffix in listing:
+                return os.path.join(directory, '__init__' + suffix)
+
+    def _find_portions(self, name, path):
+        """Find the directories named after a package in a list of
+        directories"""
+        return [os.path.join(_, name) for _ in path
+                if name in (self._listdir(_) or ()) and
+                self._listdir(os.path.join(_, name)) is not None]
+
+    def _get_locations(self, name, path, package_dir, init):
+        """Return the submodule search locations of a regular package
+
+        Legacy namespace packages (``pkgutil.extend_path`` or
+        ``pkg_resources.declare_namespace`` in their ``__init__``) extend
+        their ``__path__`` with the directory of the same name in every entry
+        of the search path.
+        """
+        locations = [package_dir]
+        portions = [_ for _ in self._find_portions(name, path)
+                    if _ != package_dir]
+        if portions and _extends_path(init):
+            locations.extend(portions)
+
+        return locations
+
+    def _find_in_path(self, name, path):
+        """Find a single (undotted) name in a list of directories
+
+        :returns: (filename, submodule_search_locations)
+        """
+        namespace_portions = []
+        for directory in path:
+            listing = self._listdir(directory)
+            if listing is None:
+                continue
+
+            if name in listing:
+                package_dir = os.path.join(directory, name)
+                if self._listdir(package_dir) is not None:
+                    init = self._find_package(package_dir)
+                    if init:
+                        return init, self._get_locations(
+                                name, path, package_dir, init)
+                    namespace_portions.append(package_dir)
+
+            for suffix in SUFFIXES:
+                if name + suffix in listing:
+                    return os.path.join(directory, name + suffix), None
+
+        return None, namespace_portions or None
+
+    def _find_in_archives(self, module_name):
+        """Locate a module in the non-directory entries of the path"""
+        if self._archives is None:
+            self._archives = [
+                    _ for _ in self.path
+                    if self._listdir(_) is None and os.path.isfile(_)]
+
+        for entry in self._archives:
+            filename = _find_with_importer(pkgutil.get_importer(entry),
+                                           module_name)
+            if filename:
+                return filename
+
+    def _lookup(self, module_name):
+        try:
+            return self._modules[module_name]
+        except KeyError:
+            pass
+
+        parent, _, name = module_name.rpartition('.')
+        if parent:
+            path = self._lookup(parent)[1] or ()
+        else:
+            path = self.path
+
+        filename, locations = self._find_in_path(name, path)
+        if not (filename or locations or parent):
+            filename = self._find_in_archives(module_name)
+
+        if filename:
+            filename = os.path.realpath(filename)
+
+        result = self._modules[module_name] = (filename, locations)
+        return result
+
+    def find(self, module_name):
+        """Find a module's file location
+
+        :param module_name: Full path to a module.
+        :type module_name: str
+
+        :returns: The canonical path of the file defining the module, or None
+                  if the module cannot be located (or has no file, as with
+                  builtin modules and namespace packages)
+        :rtype: str
+        """
+        if not module_name or module_name.startswith('.'):
+            return None
+
+        return self._lookup(module_name)[0]
+
+    def _get_top_level_names(self, filename, package):
+        """Return the names bound by a source file (None if unknown)"""
+        try:
+            return self._top_level_names[filename]
+        except KeyError:
+            pass
+
+        names = None
+        if filename.endswith(SOURCE_SUFFIXES):
+            try:
+                with open(filename, 'rb') as f:
+                    names = parse.get_top_level_names(f.read(), package)
+            except (IOError, OSError, SyntaxError, ValueError, TypeError):
+                pass
+
+        self._top_level_names[filename] = names
+        return names
+
+    def is_attribute(self, module_name):
+        """Determine if a dotted name statically refers to an attribute
+
+        ``from foo import bar`` imports either the submodule ``foo.bar`` or
+        the attribute ``bar`` of ``foo``. The name refers to an attribute when
+        ``foo`` can be located, ``bar`` is not a submodule of it (either since
+        ``foo`` is not a package or since none of its directories contain
+        ``bar``) and ``bar`` is bound by the top level statements of ``foo``'s
+        source (see :py:func:`pytest_skippy.parse.get_top_level_names`).
+
+        :param module_name: A dotted name (example: ``foo.bar``)
+        :type module_name: str
+
+        :returns: True if the name can't be a submodule. False if it is a
+                  submodule or if that can't be determined statically.
+        :rtype: bool
+        """
+        parent, _, name = module_name.rpartition('.')
+        if not parent or parent.startswith('.'):
+            return False
+
+        parent_filename, locations = self._lookup(parent)
+        if not parent_filename:
+            return False
+
+        is_package = os.path.basename(parent_filename).startswith('__init__.')
+        if locations is None and is_package:
+            # Packages in archives are located without their directories
+            return False
+
+        if locations is not None and any(self._lookup(module_name)):
+            return False
+
+        names = self._get_top_level_names(
+                parent_filename, parent if is_package else None)
+        return names is not None and name in names
+
+    def _is_external(self, module_name, root):
+        """Determine if a resolved module is located outside of a directory"""
+        if module_name not in self._modules:
+            return False
+
+        filename, locations = self._modules[module_name]
+        return not any(_is_within(os.path.realpath(_), root)
+                       for _ in [filename] + (locations or []) if _)
+
+    def _is_shadowed(self, module_name, path):
+        """Determine if a directory of a path may define a top level name"""
+        name = module_name.partition('.')[0]
+        for directory in path:
+            listing = self._listdir(directory) or ()
+            if name in listing or any(
+                    name + _ in listing for _ in SUFFIXES):
+                return True
+
+        return False
+
+    def get_resolutions(self, root):
+        """Export the resolved modules located outside of a directory
+
+        :param root: The root directory of the first party files
+        :type root: str
+
+        :returns: A mapping of module name to (filename,
+                  submodule_search_locations) for the modules which were
+                  looked up and located outside of the root directory (or not
+                  located at all), along with their parent packages
+        :rtype: dict
+        """
+        root = os.path.realpath(root)
+        return dict(
+                (name, result) for name, result in self._modules.items()
+                if self._is_external(name, root) and
+                self._is_external(name.partition('.')[0], root))
+
+    def add_resolutions(self, resolutions, root):
+        """Reuse the modules resolved by another index
+
+        The other index must use the same environment (see
+        :py:func:`pytest_skippy.cache.get_environment_key`). Since the
+        directories of the search path located in the root directory are not
+        part of the environment, a module is ignored when one of them may
+        define its top level package.
+
+        :param resolutions: The resolved modules (see
+                            :py:meth:`get_resolutions`)
+        :type resolutions: dict
+        :param root: The root directory of the first party files
+        :type root: str
+        """
+        root = os.path.realpath(root)
+        first_party = [_ for _ in self.path
+                       if _is_within(os.path.realpath(_), root)]
+        for name, result in resolutions.items():
+            if not self._is_shadowed(name, first_party):
+                self._modules.setdefault(name, result)
+
+
+def _is_within(path, root):
+    """Determine if a path is located in a directory"""
+    return not os.path.relpath(path, root).startswith(os.pardir)
+
+
+def _find_with_importer(importer, module_name):
+    """Get the filename of a module using a path entry importer"""
+    if hasattr(importer, 'find_spec'):
+        spec = importer.find_spec(module_name)
+        return spec and spec.origin
+    elif hasattr(importer, 'find_module'):  # pragma: no cover
+        loader = importer.find_module(module_name)
+        if loader and hasattr(loader, 'get_filename'):
+            return loader.get_filename(module_name)
+
+
+_default_index = None
+
+
+def get_module_index():
+    """Return a shared :py:class:`ModuleIndex` for the current sys.path
+
+    The shared index is rebuilt whenever :py:data:`sys.path` changes.
+
+    :rtype: ModuleIndex
+    """
+    global _default_index
+    path = [os.path.abspath(_) for _ in sys.path]
+    if _default_index is None or _default_index.path != path:
+        _default_index = ModuleIndex(path)
+
+    return _default_index
+
+
+def invalidate_caches():
+    """Discard the shared module index"""
+    global _default_index
+    _default_index = None
+
+
+def get_extension_sources(filename):
+    """Return the conventional source files of an extension module
+
+    The sources of an extension module (Cython or C / C++) are expected next
+    to it, with the same base name, as with in-place builds.
+
+    >>> get_extension_sources('/pkg/fast' + EXTENSION_SUFFIXES[0])
+    ['/pkg/fast.pyx', '/pkg/fast.pxd', '/pkg/fast.c', '/pkg/fast.cpp']
+    >>> get_extension_sources('/pkg/slow.py')
+    []
+
+    :param filename: The path of a module file
+    :type filename: str
+
+    :returns: The paths of the possible sources (an empty list if the file is
+              not an extension module)
+    :rtype: list
+    """
+    for suffix in _EXTENSION_SUFFIXES_BY_LENGTH:
+        if filename.endswith(suffix):
+            base = filename[:-len(suffix)]
+            return [base + _ for _ in EXTENSION_SOURCE_SUFFIXES]
+
+    return []
+
+
+def convert_module_to_filename(module_name, index=None):
     """Find a module's file location
 
     Returns the canonical path to the file that defines a module. The canonical
@@ -10,6 +389,9 @@ def convert_module_to_filename(module_name):
 
     :param module_name: Full path to a module.
     :type module_name: str
+    :param index: The index used to resolve the module. (Default: the shared
+                  index for the current sys.path)
+    :type index: ModuleIndex
 
     :returns: A string containing the filename of the requested
               module.
@@ -20,20 +402,8 @@ def convert_module_to_filename(module_name):
 
     >>> import os.path
     >>> path = convert_module_to_filename('re')
-    >>> os.path.split(path)[-1]
-    're.py'
+    >>> os.path.split(path)[-1] in ('re.py', '__init__.py')
+    True
     """
-
-    # If we can't import the module, return None
-    try:
-        for importer in pkgutil.iter_importers(module_name):
-            if not importer:
-                continue
-
-            loader = importer.find_module(module_name)
-            if loader and hasattr(loader, 'get_filename'):
-                filename = loader.get_filename()
-                if filename:
-                    return os.path.realpath(filename)
-    except ImportError:
-        return
+    index = index or get_module_index()
+    return index.find(module_name)
@@ -0,0 +1,375 @@
+import os.path
+import sys
+import threading
+
+import pytest
+
+import pytest_skippy.cache as cache
+import pytest_skippy.parse as parse
+
+
+# xunit style setup and teardown functions shared by several tests
+_SHARED_SETUP_NAMES = frozenset((
+    'setup_module', 'teardown_module', 'setUpModule', 'tearDownModule',
+    'setup_class', 'teardown_class', 'setUpClass', 'tearDownClass',
+))
+
+
+def _is_shared_code(frame, shared_code):
+    """Determine if a frame executes an import, or the setup or teardown of
+    state shared by several tests"""
+    code = frame.f_code
+    if code in shared_code or code.co_name in _SHARED_SETUP_NAMES:
+        return True
+
+    return (code.co_name == '<module>' and
+            frame.f_globals.get('__name__') != '__main__')
+
+
+def _contains(spans, first, last):
+    """Determine if a range of lines (possibly empty) is within a span"""
+    return last < first or any(
+            _[0] <= first and last <= _[1] for _ in spans)
+
+
+class LineTracer(object):
+    """Record the lines executed in the files of a directory
+
+    Lines are attributed to the current test (see :py:meth:`set_test`).
+    Lines executed outside of a test, while a module is being imported, or
+    by fixtures shared by several tests (see :py:meth:`add_shared_code`) are
+    global since they may affect every test.
+
+    :param root: The root directory of the traced files
+    :type root: str
+    """
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+        # {path: set(lines)}
+        self.global_lines = {}
+        self.test_lines = None
+
+        # {co_filename: path relative to the root (None if not traced)}
+        self._paths = {}
+
+        # The code of functions setting up state shared by several tests
+        self.shared_code = set()
+
+        # {frame: True if it is (indirectly) executed by shared code} for the
+        # traced frames which are running
+        self._shared_frames = {}
+
+        # The trace functions replaced while tracing
+        self._previous = (None, None)
+
+    def _path(self, filename):
+        try:
+            return self._paths[filename]
+        except KeyError:
+            pass
+
+        path = os.path.relpath(os.path.realpath(filename), self.root)
+        if path.startswith(os.pardir) or not os.path.isfile(filename):
+            path = None
+
+        self._paths[filename] = path
+        return path
+
+    def _is_shared(self, frame):
+        """Determine if a frame is (indirectly) executed by shared code
+
+        The callers are walked up to the nearest traced frame, whose result is
+        known, so the cost doesn't grow with the depth of the stack.
+        """
+        caller = frame
+        while caller is not None:
+            shared = self._shared_frames.get(caller)
+            if shared is not None:
+                break
+            if _is_shared_code(caller, self.shared_code):
+                shared = True
+                break
+            caller = caller.f_back
+        else:
+            shared = False
+
+        self._shared_frames[frame] = shared
+        return shared
+
+    def _trace(self, frame, event, arg):
+        path = self._path(frame.f_code.co_filename)
+        if path is None:
+            return None
+
+        if self._is_shared(frame) or self.test_lines is None:
+            coverage = self.global_lines
+        else:
+            coverage = self.test_lines
+
+        lines = coverage.setdefault(path, set())
+        shared_frames = self._shared_frames
+
+        def _trace_lines(frame, event, arg):
+            if event == 'line':
+                lines.add(frame.f_lineno)
+            elif event == 'return':
+                # Generators are resumed with another call event
+                shared_frames.pop(frame, None)
+            return _trace_lines
+
+        return _trace_lines
+
+    def start(self):
+        """Start tracing
+
+        Any other trace function (such as a coverage tool) is suspended until
+        tracing stops.
+        """
+        self._previous = (sys.gettrace(),
+                          getattr(threading, 'gettrace', lambda: None)())
+        threading.settrace(self._trace)
+        sys.settrace(self._trace)
+
+    def stop(self):
+        """Stop tracing"""
+        previous, previous_threading = self._previous
+        sys.settrace(previous)
+        threading.settrace(previous_threading)
+        self._shared_frames.clear()
+
+    def add_shared_code(self, function):
+        """Make the lines executed by a function (and its callees) global
+
+        :param function: A function setting up or tearing down state which is
+                         shared by several tests (such as a module scoped
+                         fixture)
+        :type function: callable
+        """
+        code = getattr(function, '__code__', None)
+        if code is not None:
+            self.shared_code.add(code)
+
+    def set_test(self):
+        """Attribute the executed lines to a new test
+
+        :returns: The lines executed by the test so far {path: set(lines)}
+        :rtype: dict
+        """
+        self.test_lines = {}
+        return self.test_lines
+
+    def clear_test(self):
+        """Attribute the executed lines to no test (global lines)"""
+        self.test_lines = None
+
+
+class CoverageDB(object):
+    """The lines executed by each test of a run
+
+    :param tests: The node ids of the tests
+    :type tests: list
+    :param global_lines: The lines executed outside of a test (or during an
+                         import) {path: lines}
+    :type global_lines: dict
+    :param lines: The tests which executed each line {path: {line: [index
+                  of the test in tests]}}
+    :type lines: dict
+    """
+
+    NAMESPACE = 'coverage-v1'
+
+    def __init__(self, tests, global_lines, lines):
+        self.tests = tests
+        self.global_lines = global_lines
+        self.lines = lines
+
+    @classmethod
+    def load(cls, directory, commit):
+        """Load the coverage recorded at a commit
+
+        :param directory: The root directory of the cache
+        :type directory: str
+        :param commit: The SHA of the commit
+        :type commit: str
+
+        :returns: The recorded coverage or None if no coverage was recorded
+        :rtype: CoverageDB
+        """
+        document = cache.ContentStore(directory, cls.NAMESPACE).get(commit)
+        if document is None:
+            return None
+
+        return cls(document['tests'],
+                   dict((path, set(lines)) for path, lines
+                        in document['global'].items()),
+                   dict((path, dict((int(line), tests)
+                                    for line, tests in lines.items()))
+                        for path, lines in document['lines'].items()))
+
+    def save(self, directory, commit):
+        """Store the coverage recorded at a commit
+
+        :param directory: The root directory of the cache
+        :type directory: str
+        :param commit: The SHA of the commit
+        :type commit: str
+        """
+        document = {
+            'tests': self.tests,
+            'global': dict((path, sorted(lines))
+                           for path, lines in self.global_lines.items()),
+            'lines': self.lines,
+        }
+        cache.ContentStore(directory, self.NAMESPACE).set(commit, document)
+
+    def add_test(self, nodeid, test_lines):
+        """Record the lines executed by a test
+
+        :param nodeid: The node id of the test
+        :type nodeid: str
+        :param test_lines: The executed lines {path: set(lines)}
+        :type test_lines: dict
+        """
+        index = len(self.tests)
+        self.tests.append(nodeid)
+        for path, lines in test_lines.items():
+            file_lines = self.lines.setdefault(path, {})
+            for line in lines:
+                file_lines.setdefault(line, []).append(index)
+
+    def get_tests(self, path, first, last):
+        """Get the tests which executed a range of lines of a file
+
+        :param path: The path of the file relative to the root directory
+        :type path: str
+        :param first: The first line of the range
+        :type first: int
+        :param last: The last line of the range
+        :type last: int
+
+        :returns: The node ids of the tests or None if some of the lines were
+                  executed outside of a test
+        :rtype: set
+        """
+        global_lines = self.global_lines.get(path, ())
+        file_lines = self.lines.get(path, {})
+
+        indices = set()
+        for line in range(first, last + 1):
+            if line in global_lines:
+                return None
+            indices.update(file_lines.get(line, ()))
+
+        return set(self.tests[_] for _ in indices)
+
+    def select_tests(self, path, source, new_source, hunks):
+        """Map the changed lines of a file to the tests that executed them
+
+        Each changed range of lines is widened to the body of the innermost
+        function containing it, since an executed line may span several
+        lines and inserted lines run whenever the function runs. The lines
+        replacing it must also be part of a function body, otherwise the
+        change may add code which runs on import.
+
+        :param path: The path of the file relative to the root directory
+        :type path: str
+        :param source: The source of the file when the coverage was recorded
+        :type source: bytes
+        :param new_source: The changed source of the file
+        :type new_source: bytes
+        :param hunks: The changed lines as (start, count, new_start,
+                      new_count) tuples (see
+                      :py:func:`pytest_skippy.git.get_changed_hunks`)
+        :type hunks: list
+
+        :returns: The node ids of the tests which must run or None if the
+                  changes can't be attributed to tests (the file was not
+                  executed, or code outside of a function body changed)
+        :rtype: set
+        """
+        if path not in self.global_lines and path not in self.lines:
+            return None
+
+        try:
+            spans = parse.get_function_spans(source)
+            new_spans = parse.get_function_spans(new_source)
+        except (SyntaxError, ValueError, TypeError):
+            return None
+
+        tests = set()
+        for start, count, new_start, new_count in hunks:
+            first, last = (start, start + count - 1) if count else (
+                    start, start + 1)
+            containing = [_ for _ in spans if _[0] <= first and last <= _[1]]
+            if not containing or not _contains(
+                    new_spans, new_start, new_start + new_count - 1):
+                return None
+
+            span = min(containing, key=lambda _: _[1] - _[0])
+            span_tests = self.get_tests(path, *span)
+            if span_tests is None:
+                return None
+
+            tests |= span_tests
+
+        return tests
+
+
+class CoverageRecorder(object):
+    """A pytest plugin recording the lines executed by each test
+
+    The coverage is stored (keyed by the current commit) once the session
+    finishes, unless some of the collected tests did not run.
+
+    :param root: The root directory of the traced files
+    :type root: str
+    :param directory: The root directory of the cache
+    :type directory: str
+    :param get_commit: Returns the SHA of the current commit
+    :type get_commit: callable
+    """
+
+    def __init__(self, root, directory, get_commit):
+        self.tracer = LineTracer(root)
+        self.coverage_db = CoverageDB([], self.tracer.global_lines, {})
+        self.directory = directory
+        self.get_commit = get_commit
+        self.complete = True
+
+    def start(self):
+        """Start tracing"""
+        self.tracer.start()
+
+    def pytest_deselected(self, items):
+        # The coverage of deselected tests would be missing
+        self.complete = False
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        # Fixtures wider than a function are set up (and torn down) during
+        # the first (and last) test using them, but affect all of them
+        if fixturedef.scope != 'function':
+            self.tracer.add_shared_code(fixturedef.func)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        test_lines = self.tracer.set_test()
+        try:
+            yield
+        finally:
+            self.tracer.clear_test()
+
+        self.coverage_db.add_test(item.nodeid, test_lines)
+
+    def pytest_sessionfinish(self, session):
+        self.tracer.stop()
+        interrupted = (session.shouldstop or
+                       getattr(session, 'shouldfail', False))
+        if not self.complete or interrupted:
+            return
+
+        commit = self.get_commit()
+        if commit:
+            self.coverage_db.save(self.directory, commit)
@@ -1,50 +1,337 @@
 import ast
+import doctest
+import hashlib
+import io
+import json
 import os.path
+import re
 import sys
 
+import pytest_skippy.bytecode as bytecode
+import pytest_skippy.readahead as readahead
+
+# Kinds of import edges, from the weakest to the strongest qualification
+# Imported when the module is imported
+RUNTIME = 'runtime'
+# Imported when a function is called
+LOCAL = 'local'
+# Guarded by an ImportError handler (the module may legitimately not exist)
+OPTIONAL = 'optional'
+# Under ``if TYPE_CHECKING:``, never imported at runtime
+TYPE_CHECKING = 'type_checking'
+
+_KINDS = (RUNTIME, LOCAL, OPTIONAL, TYPE_CHECKING)
+
+_IMPORT_ERRORS = frozenset(('ImportError', 'ModuleNotFoundError'))
+
+# Functions importing the module named by their first argument
+DYNAMIC_IMPORTS = frozenset(('import_module', '__import__'))
+
+# Variables holding the names of modules which are imported dynamically
+MODULE_SETTINGS = ('pytest_plugins',)
+
+_MODULE_PATH = re.compile(r'^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$')
+
+
+class PackageResolver(object):
+    """Resolve package directories to dotted package names
+
+    A package's name is made up of the directories between a root of the
+    search path and the package directory. Roots are stored in a set and
+    every resolved directory is cached, so resolving a directory costs a
+    dictionary lookup once it (or any of its subdirectories) has been
+    resolved.
+
+    :param path: The search path (Default: :py:data:`sys.path`)
+    :type path: list
+    """
+
+    _shared = None
+
+    def __init__(self, path=None):
+        if path is None:
+            path = sys.path
+        self.path = tuple(path)
+        self.roots = frozenset(os.path.abspath(_) for _ in self.path)
+
+        # {directory: package name parts (None if not below a root)}
+        self._prefixes = {}
+
+    @classmethod
+    def for_sys_path(cls):
+        """Return a shared resolver for the current :py:data:`sys.path`
+
+        The shared resolver is replaced whenever sys.path changes.
+
+        :rtype: PackageResolver
+        """
+        shared = cls._shared
+        if shared is None or shared.path != tuple(sys.path):
+            shared = cls._shared = cls()
+
+        return shared
+
+    def _prefix(self, directory):
+        try:
+            return self._prefixes[directory]
+        except KeyError:
+            pass
+
+        parent, name = os.path.split(directory)
+        if not name:
+            prefix = None
+        elif parent in self.roots:
+            prefix = (name,)
+        else:
+            prefix = self._prefix(parent)
+            if prefix is not None:
+                prefix += (name,)
+
+        self._prefixes[directory] = prefix
+        return prefix
+
+    def resolve(self, directory):
+        """Return the parts of the package name of a directory
+
+        If the directory is not below a root of the search path, the package
+        is assumed to be a top level package named after the directory.
+
+        :param directory: An absolute path to a package directory
+        :type directory: str
+
+        :returns: The components of the dotted package name
+        :rtype: tuple
+        """
+        return (self._prefix(directory) or
+                (os.path.basename(directory),))
+
+
+def _is_type_checking(test):
+    """Determine if the test of an if statement is ``TYPE_CHECKING``"""
+    if isinstance(test, ast.Name):
+        return test.id == 'TYPE_CHECKING'
+
+    return isinstance(test, ast.Attribute) and test.attr == 'TYPE_CHECKING'
+
+
+def _catches_import_error(handler):
+    """Determine if an except clause handles ImportError"""
+    types = [handler.type]
+    if isinstance(handler.type, ast.Tuple):
+        types = handler.type.elts
+
+    for type_ in types:
+        if type_ is None:
+            return True
+        elif isinstance(type_, ast.Name) and type_.id in _IMPORT_ERRORS:
+            return True
+        elif (isinstance(type_, ast.Attribute) and
+                type_.attr in _IMPORT_ERRORS):
+            return True
+
+    return False
+
+
+def _get_string(node):
+    """Return the value of a string literal (None for any other node)"""
+    if type(node).__name__ == 'Str':
+        return node.s
+
+    if (type(node).__name__ == 'Constant' and
+            isinstance(node.value, _STRING_TYPES)):
+        return node.value
+
+    return None
+
+
+def _get_module_paths(node):
+    """Return the module paths in a string, list, tuple or set literal"""
+    elements = [node]
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        elements = node.elts
+
+    strings = (_get_string(_) for _ in elements)
+    return [_ for _ in strings if _ and _MODULE_PATH.match(_)]
+
+
+def _get_dynamic_import(node):
+    """Return the module imported by a call such as
+    ``importlib.import_module('name')`` (None for other calls)
+    """
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        name = func.attr
+    else:
+        name = getattr(func, 'id', None)
+
+    if name not in DYNAMIC_IMPORTS or not node.args:
+        return None
+
+    # Relative names depend on the package argument
+    module = _get_string(node.args[0])
+    if module and _MODULE_PATH.match(module):
+        return module
+
+    return None
+
 
 class ImportVisitor(ast.NodeVisitor):
     """Record imported modules
 
     This NodeVisitor class recursively traverses an AST and records
     all modules that have been imported.
+
+    Each import is classified by kind (:py:data:`RUNTIME`, :py:data:`LOCAL`,
+    :py:data:`OPTIONAL` or :py:data:`TYPE_CHECKING`). Imports of an ignored
+    kind are not recorded as imports, and optional imports do not confirm
+    that a module exists.
+
+    Dynamic imports of a literal module name
+    (``importlib.import_module('foo.bar')`` or ``__import__('foo.bar')``)
+    are recorded like ``import foo.bar``. Each string literal assigned to a
+    module setting (for example ``pytest_plugins = ['foo.bar']``) is
+    recorded like ``from foo import bar``, since settings may also name
+    attributes of modules (such as Django app configs).
+
+    :param filename: The path of the file being visited
+    :type filename: str
+    :param ignored_kinds: Kinds of imports which are not recorded
+    :type ignored_kinds: set
+    :param module_settings: The names of the variables holding module paths
+    :type module_settings: set
     """
-    def __init__(self, filename):
+    def __init__(self, filename, ignored_kinds=(),
+                 module_settings=MODULE_SETTINGS):
         super(ImportVisitor, self).__init__()
         self.imports = {}
+        self.ignored_kinds = frozenset(ignored_kinds)
+        self.module_settings = frozenset(module_settings)
+
+        # The kind of the imports currently being visited
+        self.kind = RUNTIME
+
+        # The kinds of import of each module {module: set(kinds)}
+        self.kinds = {}
+
+        # Modules which must exist for the file to be imported
+        self.confirmed = set()
+
+        # Modules whose entire namespace is made available to the file
+        # (import foo / from foo import *)
+        self.whole_modules = set()
+
+        # Unresolved (module, fromlist, level, kind) import statements in the
+        # order they were visited
+        self.statements = []
 
         # Store path to filename for deriving relative import paths
         self.directories, _ = os.path.split(os.path.abspath(filename))
+        self.packages = PackageResolver.for_sys_path()
+
+    def _visit_as(self, kind, nodes):
+        """Visit nodes with (at least) the given kind of import"""
+        previous = self.kind
+        self.kind = max(kind, previous, key=_KINDS.index)
+        try:
+            for node in nodes:
+                self.visit(node)
+        finally:
+            self.kind = previous
+
+    def _record(self, module):
+        self.kinds.setdefault(module, set()).add(self.kind)
+        if self.kind != OPTIONAL:
+            self.confirmed.add(module)
+
+    def visit_FunctionDef(self, node):
+        self._visit_as(LOCAL, ast.iter_child_nodes(node))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_If(self, node):
+        if not _is_type_checking(node.test):
+            return self.generic_visit(node)
+
+        self._visit_as(TYPE_CHECKING, node.body)
+        self._visit_as(self.kind, node.orelse)
+
+    def visit_Try(self, node):
+        if not any(_catches_import_error(_) for _ in node.handlers):
+            return self.generic_visit(node)
+
+        self._visit_as(OPTIONAL, node.body + node.handlers)
+        self._visit_as(self.kind,
+                       node.orelse + getattr(node, 'finalbody', []))
+
+    # Python 2 / Python 3.11+ except* clauses
+    visit_TryExcept = visit_TryStar = visit_Try
+
+    def visit_Call(self, node):
+        module = _get_dynamic_import(node)
+        if module is not None:
+            self.visit_Import(ast.Import(names=[ast.alias(module, None)]))
+
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        if any(isinstance(_, ast.Name) and _.id in self.module_settings
+               for _ in node.targets):
+            self._visit_module_paths(node.value)
+
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if (isinstance(node.target, ast.Name) and
+                node.target.id in self.module_settings):
+            self._visit_module_paths(node.value)
+
+        self.generic_visit(node)
+
+    def _visit_module_paths(self, value):
+        for path in _get_module_paths(value):
+            module, _, name = path.rpartition('.')
+            if module:
+                self.visit_ImportFrom(ast.ImportFrom(
+                        module=module, names=[ast.alias(name, None)],
+                        level=0))
+            else:
+                self.visit_Import(ast.Import(names=[ast.alias(name, None)]))
 
     def visit_Import(self, node):
-        for module in (_.name for _ in node.names):
+        for alias in node.names:
+            module = alias.name
+            self.statements.append((module, None, 0, self.kind))
+            if self.kind in self.ignored_kinds:
+                continue
+
             self.imports.setdefault(module, None)
+            self.whole_modules.add(module)
+            self._record(module)
+
+            # import foo.bar binds foo, which gives access to the namespace
+            # of every ancestor package
+            if alias.asname is None:
+                parts = module.split('.')
+                self.whole_modules.update(
+                        '.'.join(parts[:_]) for _ in range(1, len(parts)))
 
     def visit_ImportFrom(self, node):
+        self.statements.append((node.module or '',
+                                tuple(_.name for _ in node.names),
+                                node.level or 0,
+                                self.kind))
+        if self.kind in self.ignored_kinds:
+            return
 
         module = node.module
         if node.level:
             # Handle relative imports
             path = self.directories
-            for _ in range(node.level):
-                path, prepend = os.path.split(path)
-
-            # After resolving the base module, prepend it to the module name
-            base_module = prepend
-
-            # Attempt to resolve package relative to sys.path
-            prepends = []
-            while prepend:
-                if path in sys.path:
-                    break
-                path, prepend = os.path.split(path)
-                prepends.insert(0, prepend)
-            else:
-                # The module is not relative to anything in the sys.path
-                prepends = []
+            for _ in range(node.level - 1):
+                path = os.path.dirname(path)
 
-            # Add the base module into the resolved module name
-            prepends.append(base_module)
+            # Resolve the package relative to sys.path
+            prepends = list(self.packages.resolve(path))
 
             # Build up each package path starting with the package root
             # Those modules are imported (detected as being within the sys.path
@@ -52,6 +339,7 @@ class ImportVisitor(ast.NodeVisitor):
             for idx in range(1, len(prepends)+1):
                 pkg_path = '.'.join(prepends[:idx])
                 self.imports.setdefault(pkg_path, None)
+                self._record(pkg_path)
 
             # This covers the
             # from . import foo
@@ -61,6 +349,8 @@ class ImportVisitor(ast.NodeVisitor):
 
             module = '.'.join(prepends)
 
+        self._record(module)
+
         # In "from foo import bar" type statements, bar may be a module or
         # simply an attribute of the module foo. Therefore, bar is referred to
         # as a candidate since the type of bar is ambiguous until runtime.
@@ -72,6 +362,34 @@ class ImportVisitor(ast.NodeVisitor):
         for candidate in (_.name for _ in node.names):
             candidates.add(candidate)
 
+        if '*' in candidates:
+            self.whole_modules.add(module)
+
+    def visit_imports(self, imports):
+        """Record imports extracted from bytecode (or a cache)
+
+        :param imports: (module, fromlist, level, kind) tuples as returned by
+                        :py:func:`pytest_skippy.bytecode.get_imports`
+        :type imports: list
+
+        :returns: a dictionary of modules to submodule candidates
+        :rtype: dict
+        """
+        for module, fromlist, level, kind in imports:
+            self.kind = kind
+            if fromlist is None:
+                node = ast.Import(names=[ast.alias(module, None)])
+                self.visit_Import(node)
+            else:
+                node = ast.ImportFrom(
+                        module=module or None,
+                        names=[ast.alias(_, None) for _ in fromlist],
+                        level=level)
+                self.visit_ImportFrom(node)
+
+        self.kind = RUNTIME
+        return self.imports
+
     def visit(self, node):
         """Search AST for imported modules
 
@@ -94,7 +412,9 @@ def compress_imports(imports):
     return full_imports
 
 
-def get_imported_modules(filename):
+def get_imported_modules(filename, use_bytecode=False, cache=None,
+                         ignored_kinds=(), reader=None,
+                         module_settings=MODULE_SETTINGS):
     """Return modules that are imported by a file
 
     This function will extract all modules that are imported within
@@ -129,20 +449,491 @@ def get_imported_modules(filename):
 
     :param filename: File path to a python file
     :type filename: str
+    :param use_bytecode: Extract imports from the cached bytecode of the file
+                         when it is up to date, instead of parsing the source
+    :type use_bytecode: bool
+    :param cache: A cache of import statements
+    :type cache: pytest_skippy.cache.ParseCache
+    :param ignored_kinds: Kinds of imports which are not returned (example:
+                          :py:data:`TYPE_CHECKING`)
+    :type ignored_kinds: set
+    :param reader: Reads the source of the file (possibly read ahead)
+    :type reader: pytest_skippy.readahead.SourceReader
+    :param module_settings: The names of the variables holding the names of
+                            dynamically imported modules (see
+                            :py:class:`ImportVisitor`)
+    :type module_settings: set
 
     :returns: (modules, confirmed_modules)
     :rtype: tuple
     """
-    with open(filename, 'r') as f:
-        source = f.read()
+    modules, confirmed_modules, _ = get_imported_symbols(
+            filename, use_bytecode, cache, ignored_kinds, reader,
+            module_settings)
+    return (modules, confirmed_modules)
+
+
+def _needs_source(code, ignored_kinds, module_settings):
+    """Determine if the imports of a file must be read from its source rather
+    than from its bytecode"""
+    names = bytecode.get_names(code)
+
+    # Dynamic imports are only found in the source
+    if not names.isdisjoint(DYNAMIC_IMPORTS.union(module_settings)):
+        return True
+
+    # Optional and type checking imports are only told apart in the source
+    if not names.isdisjoint(_IMPORT_ERRORS):
+        return True
+
+    return TYPE_CHECKING in ignored_kinds and 'TYPE_CHECKING' in names
+
+
+def _visit_file(filename, use_bytecode=False, cache=None, ignored_kinds=(),
+                reader=None, module_settings=MODULE_SETTINGS):
+    """Run an :py:class:`ImportVisitor` over a file"""
+    visitor = ImportVisitor(filename, ignored_kinds, module_settings)
+
+    statements = cache.get(filename) if cache is not None else None
+
+    # Only statements parsed from the source are stored
+    store = cache is not None and statements is None
+
+    if statements is None and use_bytecode:
+        code = bytecode.load_cached_code(filename)
+        if code and _needs_source(code, ignored_kinds, module_settings):
+            code = None
 
-    tree = ast.parse(source)
+        try:
+            statements = code and bytecode.get_imports(code)
+        except ValueError:
+            pass
 
-    visitor = ImportVisitor(filename)
+        # Statements extracted from bytecode have no kinds (other runs may
+        # ignore some kinds)
+        store = store and statements is None
+
+    if statements is not None:
+        visitor.visit_imports(statements)
+    else:
+        # The source is parsed as bytes, decoded as declared by the file
+        # (PEP 263) rather than with the locale encoding
+        if reader is not None:
+            source = reader.read(filename)
+        else:
+            source = readahead.read_file(filename)
+
+        tree = ast.parse(source)
+
+        visitor.visit(tree)
+
+    if store:
+        cache.set(filename, visitor.statements)
+
+    return visitor
+
+
+def get_imported_symbols(filename, use_bytecode=False, cache=None,
+                         ignored_kinds=(), reader=None,
+                         module_settings=MODULE_SETTINGS):
+    """Return modules and the names imported from them by a file
+
+    In addition to the values returned by :py:func:`get_imported_modules`, a
+    dictionary mapping each imported module to the set of names imported from
+    it is returned. Modules whose whole namespace is used (``import foo`` or
+    ``from foo import *``) map to None.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(delete=False) as f:
+    ...     x = f.write(b'''
+    ... import os
+    ... from re import compile, escape
+    ... ''')
+    >>> _, _, names = get_imported_symbols(f.name)
+    >>> names['os'] is None
+    True
+    >>> sorted(names['re'])
+    ['compile', 'escape']
+    >>> import os ; os.unlink(f.name)
 
-    imports = visitor.visit(tree)
+    :param filename: File path to a python file
+    :type filename: str
+    :param use_bytecode: Extract imports from the cached bytecode of the file
+                         when it is up to date, instead of parsing the source
+    :type use_bytecode: bool
+    :param cache: A cache of import statements
+    :type cache: pytest_skippy.cache.ParseCache
+    :param ignored_kinds: Kinds of imports which are not returned (example:
+                          :py:data:`TYPE_CHECKING`)
+    :type ignored_kinds: set
+    :param reader: Reads the source of the file (possibly read ahead)
+    :type reader: pytest_skippy.readahead.SourceReader
+    :param module_settings: The names of the variables holding the names of
+                            dynamically imported modules (see
+                            :py:class:`ImportVisitor`)
+    :type module_settings: set
+
+    :returns: (modules, confirmed_modules, imported_names)
+    :rtype: tuple
+    """
+    visitor = _visit_file(filename, use_bytecode, cache, ignored_kinds,
+                          reader, module_settings)
+    imports = visitor.imports
 
     full_import_set = compress_imports(imports)
-    confirmed_modules = set(imports.keys())
+    confirmed_modules = set(visitor.confirmed)
+
+    imported_names = {}
+    for module, candidates in imports.items():
+        if module in visitor.whole_modules:
+            imported_names[module] = None
+        else:
+            imported_names[module] = set(candidates or ())
+
+    # Ancestor packages bound by dotted imports
+    for module in visitor.whole_modules.difference(imports):
+        imported_names[module] = None
+
+    return (full_import_set, confirmed_modules, imported_names)
+
+
+def _get_notebook_cells(filename):
+    """Return the source of the code cells of a Jupyter notebook
+
+    IPython magics and shell commands are removed.
+    """
+    with io.open(filename, encoding='utf-8') as f:
+        notebook = json.load(f)
+
+    for cell in notebook.get('cells', ()):
+        if cell.get('cell_type') != 'code':
+            continue
+
+        lines = cell.get('source', ())
+        if not isinstance(lines, list):
+            lines = lines.splitlines(True)
+
+        yield ''.join(_ for _ in lines
+                      if not _.lstrip().startswith(('%', '!')))
+
+
+def _get_doctest_examples(filename):
+    """Return the source of the examples of a doctest text file"""
+    with io.open(filename, encoding='utf-8') as f:
+        text = f.read()
+
+    for example in doctest.DocTestParser().get_examples(text, filename):
+        yield example.source
+
+
+def get_embedded_imports(filename, ignored_kinds=()):
+    """Return modules that are imported by the code embedded in a file
+
+    The embedded code is the examples of a doctest text file, or the code
+    cells of a Jupyter notebook (``.ipynb``).
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(suffix='.txt', delete=False) as f:
+    ...     x = f.write(b'''
+    ... Some text
+    ...
+    ... >>> import os
+    ... >>> from re import escape
+    ... ''')
+    >>> modules, confirmed = get_embedded_imports(f.name)
+    >>> sorted(modules), sorted(confirmed)
+    (['os', 're', 're.escape'], ['os', 're'])
+    >>> import os ; os.unlink(f.name)
+
+    :param filename: The path of a doctest text file or of a notebook
+    :type filename: str
+    :param ignored_kinds: Kinds of imports which are not returned
+    :type ignored_kinds: set
+
+    :returns: (modules, confirmed_modules) as returned by
+              :py:func:`get_imported_modules`
+    :rtype: tuple
+
+    :raises SyntaxError: if some of the code can't be parsed
+    """
+    if filename.endswith('.ipynb'):
+        sources = _get_notebook_cells(filename)
+    else:
+        sources = _get_doctest_examples(filename)
+
+    visitor = ImportVisitor(filename, ignored_kinds)
+    for source in sources:
+        visitor.visit(ast.parse(source))
+
+    return compress_imports(visitor.imports), set(visitor.confirmed)
+
+
+if hasattr(ast, 'AsyncFunctionDef'):
+    _FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+else:  # pragma: no cover
+    _FUNCTION_TYPES = (ast.FunctionDef, ast.ClassDef)
 
-    return (full_import_set, confirmed_modules)
+_STRING_TYPES = (str, type(u''))
+
+
+def _get_docstring(node):
+    """Get the text of a bare string literal statement (None otherwise)"""
+    if not isinstance(node, ast.Expr):
+        return None
+
+    value = node.value
+    if type(value).__name__ == 'Str':
+        return value.s
+
+    if (type(value).__name__ == 'Constant' and
+            isinstance(value.value, _STRING_TYPES)):
+        return value.value
+
+
+def _normalize(tree):
+    """Remove docstrings from a module AST (in-place)
+
+    Together with :py:func:`ast.dump` (which does not include line and column
+    information), this removes any difference caused by comments, docstrings
+    and formatting. Docstrings containing doctests are kept, since they are
+    tests of the module.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module,) + _FUNCTION_TYPES) or (
+                not node.body):
+            continue
+
+        docstring = _get_docstring(node.body[0])
+        if docstring is not None and '>>>' not in docstring:
+            node.body = node.body[1:]
+
+    return tree
+
+
+def get_fingerprint(source):
+    """Return a fingerprint of the normalized AST of a module
+
+    Sources which differ only by comments, docstrings (without doctests) and
+    formatting have the same fingerprint.
+
+    >>> get_fingerprint('''
+    ... def foo(a, b):
+    ...     "Add things"
+    ...     return a + b
+    ... ''') == get_fingerprint('''
+    ... # Add some things
+    ... def foo(a,
+    ...         b):
+    ...     return (a + b)
+    ... ''')
+    True
+
+    :param source: The python source code of a module
+    :type source: str or bytes
+
+    :returns: A hex digest of the normalized AST
+    :rtype: str
+    """
+    tree = _normalize(ast.parse(source))
+    return hashlib.sha1(ast.dump(tree).encode('utf-8')).hexdigest()
+
+
+def _target_names(target):
+    """Names bound by an assignment target (None if not a plain name)"""
+    if isinstance(target, ast.Name):
+        return [target.id]
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        names = []
+        for element in target.elts:
+            element_names = _target_names(element)
+            if element_names is None:
+                return None
+            names.extend(element_names)
+        return names
+
+
+def _bound_names(node):
+    """Names bound by a top level statement
+
+    Statements that do not simply bind names (expressions, conditionals,
+    attribute assignments, ...) return None.
+    """
+    if isinstance(node, _FUNCTION_TYPES):
+        return [node.name]
+    elif isinstance(node, (ast.Import, ast.ImportFrom)):
+        names = [_.asname or _.name.split('.')[0] for _ in node.names]
+        if '*' not in names:
+            return names
+    elif isinstance(node, ast.Assign):
+        names = []
+        for target in node.targets:
+            target_names = _target_names(target)
+            if target_names is None:
+                return None
+            names.extend(target_names)
+        return names
+    elif type(node).__name__ == 'AnnAssign':
+        return _target_names(node.target)
+
+
+def get_top_level_names(source, package=None):
+    """Return the names bound by the top level statements of a module
+
+    Names bound conditionally (under ``if``, ``try``, ...) or by a star import
+    are not included.
+
+    >>> sorted(get_top_level_names('''
+    ... import os
+    ... from . import sub
+    ... from pkg import other
+    ... from .impl import helper
+    ... VALUE = 1
+    ... ''', package='pkg'))
+    ['VALUE', 'helper', 'os']
+
+    :param source: The python source code of a module
+    :type source: str or bytes
+    :param package: The name of the package, if the module is its
+                    ``__init__``. The names it imports from itself are left
+                    out, since they may be submodules.
+    :type package: str
+
+    :returns: The bound names
+    :rtype: set
+    """
+    names = set()
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.ImportFrom) and package is not None and (
+                (node.level == 1 and not node.module) or
+                (node.level == 0 and node.module == package)):
+            continue
+
+        names.update(_bound_names(node) or ())
+
+    return names
+
+
+def get_top_level_definitions(source):
+    """Return the top level definitions of a module
+
+    Each top level name maps to a tuple of (fingerprint, referenced names)
+    where the fingerprint is a dump of the AST of every statement binding
+    that name. Statements that do not bind names are collected under the
+    None key since they affect the module as a whole. Docstrings are not
+    considered part of a definition, unless they contain doctests.
+
+    >>> definitions = get_top_level_definitions('''
+    ... import os
+    ... def cwd():
+    ...     return os.getcwd()
+    ... ''')
+    >>> sorted(definitions['cwd'][1])
+    ['os']
+
+    :param source: The python source code of a module
+    :type source: str or bytes
+
+    :returns: {name: (fingerprint, referenced_names)}
+    :rtype: dict
+    """
+    tree = _normalize(ast.parse(source))
+
+    dumps = {None: []}
+    references = {None: set()}
+    for node in tree.body:
+        referenced = set(
+                _.id for _ in ast.walk(node) if isinstance(_, ast.Name))
+        for name in _bound_names(node) or (None,):
+            dumps.setdefault(name, []).append(ast.dump(node))
+            references.setdefault(name, set()).update(referenced)
+
+    return dict(
+            (name, (tuple(dumps[name]), references[name]))
+            for name in dumps)
+
+
+def get_changed_definitions(old_source, new_source):
+    """Return the top level names whose definitions differ between sources
+
+    Definitions that reference a changed name (for example, a function
+    calling a changed function in the same module) are also considered
+    changed.
+
+    >>> sorted(get_changed_definitions('''
+    ... def a(): return 1
+    ... def b(): return a()
+    ... def c(): return 3
+    ... ''', '''
+    ... def a(): return 2
+    ... def b(): return a()
+    ... def c(): return 3
+    ... '''))
+    ['a', 'b']
+
+    :param old_source: The original source of the module
+    :type old_source: str or bytes
+    :param new_source: The modified source of the module
+    :type new_source: str or bytes
+
+    :returns: A set of changed names, or None if the module as a whole has
+              changed (module level code changed or a source failed to
+              parse)
+    :rtype: set or None
+    """
+    try:
+        old = get_top_level_definitions(old_source)
+        new = get_top_level_definitions(new_source)
+    except (SyntaxError, ValueError, TypeError):
+        return None
+
+    changed = set(
+            name for name in set(old) | set(new)
+            if old.get(name, (None,))[0] != new.get(name, (None,))[0])
+
+    # Propagate changes to definitions that reference changed names
+    propagated = True
+    while propagated:
+        propagated = False
+        for name, (_, referenced) in new.items():
+            if name not in changed and referenced & changed:
+                changed.add(name)
+                propagated = True
+
+    if None in changed:
+        return None
+
+    return changed
+
+
+def get_function_spans(source):
+    """Return the line spans of the bodies of every function in a module
+
+    A span starts at the first statement of the function body (the ``def``
+    line, decorators and default values are executed when the module is
+    imported) and ends at the last line containing a node of the body.
+    Nested functions and methods are included.
+
+    >>> get_function_spans('''
+    ... @decorator
+    ... def a(x=1):
+    ...     def b():
+    ...         return 2
+    ...     return b
+    ... ''')
+    [(4, 6), (5, 5)]
+
+    :param source: The python source code of a module
+    :type source: str or bytes
+
+    :returns: A list of (first line, last line) tuples
+    :rtype: list
+    """
+    spans = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, _FUNCTION_TYPES[:-1]):
+            last = max(getattr(_, 'lineno', 0)
+                       for statement in node.body
+                       for _ in ast.walk(statement))
+            spans.append((node.body[0].lineno, last))
+
+    return sorted(spans)
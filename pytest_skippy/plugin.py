@@ -1,8 +1,15 @@
 import os.path
 import pytest
 import subprocess
-import pytest_skippy.core as core
-import pytest_skippy.git as git
+
+# The rest of skippy is imported when it is enabled so that the plugin does
+# not slow down the startup of pytest runs which don't use it.
+
+
+def pytest_addhooks(pluginmanager):
+    import pytest_skippy.hooks as hooks
+
+    pluginmanager.add_hookspecs(hooks)
 
 
 def pytest_addoption(parser):
@@ -20,6 +27,154 @@ def pytest_addoption(parser):
                      dest='skippy_safe',
                      help="When in safe mode, any modules that cannot be "
                           "imported force the test to run.")
+    parser.addoption("--skippy-order", action="store_true",
+                     dest='skippy_order',
+                     help="Run tests that failed last time first, followed "
+                          "by tests ordered by the number of import hops "
+                          "to a changed file.")
+    parser.addoption("--skippy-symbols", action="store_true",
+                     dest='skippy_symbols',
+                     help="Track changes to individual top level "
+                          "definitions. Imports of unchanged names from a "
+                          "changed file do not force a test run.")
+    parser.addoption("--skippy-semantic", action="store_true",
+                     dest='skippy_semantic',
+                     help="Ignore changes which do not alter the syntax tree "
+                          "of a python file (comments, docstrings and "
+                          "formatting).")
+    parser.addoption("--skippy-bytecode", action="store_true",
+                     dest='skippy_bytecode',
+                     help="Read imports from up to date cached bytecode "
+                          "(__pycache__) instead of parsing source files "
+                          "when possible.")
+    parser.addoption("--skippy-cache-dir",
+                     dest='skippy_cache_dir',
+                     help="Directory of a cache of parse results keyed by "
+                          "the git blob id of each file. The directory may "
+                          "be shared between CI jobs.")
+    parser.addoption("--skippy-results", action="store_true",
+                     dest='skippy_results',
+                     help="Skip tests which previously passed with the same "
+                          "contents of every file in their import graph. "
+                          "Results are stored in the skippy cache directory "
+                          "(or the pytest cache).")
+    parser.addoption("--skippy-ignore-type-checking", action="store_true",
+                     dest='skippy_ignore_type_checking',
+                     help="Ignore imports under 'if TYPE_CHECKING:' since "
+                          "they are never executed at runtime.")
+    parser.addoption("--skippy-coverage", action="store_true",
+                     dest='skippy_coverage',
+                     help="During a full run, record the lines executed by "
+                          "each test. With --skippy, select the tests which "
+                          "executed the changed lines, using the coverage "
+                          "recorded at the merge base.")
+    parser.addoption("--skippy-max-modules", type=int,
+                     dest='skippy_max_modules',
+                     help="Stop the analysis after visiting this many modules "
+                          "and run the remaining tests.")
+    parser.addoption("--skippy-max-files", type=int,
+                     dest='skippy_max_files',
+                     help="Stop the analysis after parsing this many files "
+                          "and run the remaining tests.")
+    parser.addoption("--skippy-time-limit", type=float,
+                     dest='skippy_time_limit',
+                     help="Stop the analysis after this many seconds and run "
+                          "the remaining tests.")
+    parser.addoption("--skippy-read-ahead", type=int, default=0,
+                     dest='skippy_read_ahead', metavar='THREADS',
+                     help="Read source files ahead of the import graph "
+                          "analysis on this many threads (useful on network "
+                          "filesystems).")
+    parser.addoption("--skippy-record", action="store_true",
+                     dest='skippy_record',
+                     help="Record the modules imported at runtime by each "
+                          "file during a full run. The graph is stored for "
+                          "the current commit in the skippy cache directory "
+                          "(or the pytest cache) and used by later --skippy "
+                          "runs based on that commit.")
+    parser.addoption("--skippy-change-set", action="append", default=[],
+                     dest='skippy_change_sets', metavar='CHANGE_SET',
+                     help="Report the test files affected by a change set: "
+                          "'target..head', 'target' (target..HEAD) or "
+                          "'file:path' listing changed files. May be "
+                          "repeated; the import graph is built once for all "
+                          "change sets.")
+    parser.addoption("--skippy-affected-json", action="store",
+                     dest='skippy_affected_json', metavar='PATH',
+                     help="Write the test files affected by each change set "
+                          "(see --skippy-change-set) to a JSON file.")
+    parser.addini("skippy_mapping", type="linelist",
+                  help="Map changed files to the tests which must run. Each "
+                       "line is in the form 'pattern = target [target ...]' "
+                       "where a target is a test path or '*' to run all "
+                       "tests.")
+    parser.addini("skippy_module_settings", type="linelist",
+                  help="Names of variables holding the names of modules "
+                       "which are imported dynamically (such as "
+                       "INSTALLED_APPS). pytest_plugins is always "
+                       "included.")
+    parser.addini("skippy_extension_mapping", type="linelist",
+                  help="Map changed build sources (such as Cython or C "
+                       "files) to the extension modules built from them. "
+                       "Each line is in the form "
+                       "'pattern = module [module ...]'.")
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    if config.option.skippy_record and config.option.skippy:
+        raise pytest.UsageError(
+                "--skippy-record requires a full run (without --skippy)")
+
+    # The git queries overlap with collection
+    if config.option.skippy and config.option.skippy_target_branch:
+        import pytest_skippy.util as util
+
+        # The modules used in the background are imported first, since
+        # concurrent imports of submodules of a package aren't safe on
+        # Python < 3.7
+        import pytest_skippy.cache  # noqa: F401
+        import pytest_skippy.changes  # noqa: F401
+        import pytest_skippy.graph  # noqa: F401
+
+        config._skippy_changes = util.BackgroundTask(
+                prepare_changes, config, str(config.rootdir))
+
+    # Recording happens during full runs
+    if config.option.skippy or not (config.option.skippy_record or
+                                    config.option.skippy_coverage):
+        return
+
+    directory = get_cache_dir(config)
+    if not directory:
+        return
+
+    import pytest_skippy.git as git
+
+    git_repo_dir = str(config.rootdir)
+
+    def get_commit():
+        try:
+            return git.get_commit(git_repo_dir=git_repo_dir)
+        except subprocess.CalledProcessError:
+            return None
+
+    if config.option.skippy_record:
+        import pytest_skippy.graph as graph
+
+        recorder = graph.ImportRecorder(git_repo_dir)
+        recorder.start()
+        config.pluginmanager.register(
+                graph.GraphRecorder(recorder, directory, get_commit),
+                'skippy-record')
+
+    if config.option.skippy_coverage:
+        import pytest_skippy.linecoverage as linecoverage
+
+        recorder = linecoverage.CoverageRecorder(
+                git_repo_dir, directory, get_commit)
+        recorder.start()
+        config.pluginmanager.register(recorder, 'skippy-coverage')
 
 
 @pytest.hookimpl(tryfirst=True)
@@ -27,34 +182,826 @@ def pytest_collection_modifyitems(session, config, items):
     """called after collection has been performed, may filter or re-order
     the items in-place.
     """
-    if not (config.option.skippy and
-            config.option.skippy_target_branch and
-            items):
+    enabled = bool(config.option.skippy and
+                   config.option.skippy_target_branch and
+                   items)
+    if not (enabled or config.option.skippy_change_sets):
         return
 
+    import pytest_skippy.core as core
+
+    # The budget covers the whole skippy phase, including waiting for change
+    # detection
+    budget = core.Budget(max_modules=config.option.skippy_max_modules,
+                         max_files=config.option.skippy_max_files,
+                         time_limit=config.option.skippy_time_limit)
+
+    report_affected(config, str(session.fspath), items, budget)
+    if enabled:
+        skip_unaffected_tests(session, config, items, budget)
+
+    if budget.exceeded:
+        config.warn('skippy-budget',
+                    'Skippy analysis stopped after exceeding its %s; the '
+                    'remaining tests were not skipped' % budget.exceeded,
+                    fslocation=__file__)
+
+
+def skip_unaffected_tests(session, config, items, budget):
+    """Skip the tests which are not affected by the detected changes
+
+    :param session: The pytest session
+    :type session: _pytest.main.Session
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param items: The collected test items
+    :type items: list
+    :param budget: The budget of the analysis. Every test runs if it is
+                   exceeded before the changes are known.
+    :type budget: pytest_skippy.core.Budget
+    """
+    import pytest_skippy.core as core
+
     try:
-        target_branch = config.option.skippy_target_branch
-        changed_files = git.detect_changed_files(
-                target_branch,
-                git_repo_dir=str(session.fspath))
+        (changed_files, changed_symbols, forced_paths, extension_modules,
+         parse_cache, import_graph) = budget.wait(config._skippy_changes)
+
+        # Modules are located once collection has updated sys.path
+        changed_files |= get_module_files(extension_modules)
+        changed_files, forced_tests = select_by_coverage(
+                config, str(session.fspath), changed_files, items)
+        budget.check()
     except subprocess.CalledProcessError as e:
         config.warn('skippy-git',
                     'Call to git failed: %s' % str(e), fslocation=__file__)
         return
+    except core.BudgetExceeded:
+        return
+
+    # A change requires every test to run
+    if forced_paths is None:
+        return
 
-    changed_files = set([os.path.abspath(_) for _ in changed_files])
+    import pytest_skippy.readahead as readahead
+
+    reader = readahead.SourceReader(config.option.skippy_read_ahead)
+    module_index, resolution_cache = get_module_index(
+            config, str(config.rootdir))
 
     # Instantiate the core skippy object.
     safe_mode = config.option.skippy_safe
-    skippy = core.Skippy(changed_files, safe_mode=safe_mode)
+    skippy = core.Skippy(changed_files, safe_mode=safe_mode,
+                         changed_symbols=changed_symbols,
+                         use_bytecode=config.option.skippy_bytecode,
+                         parse_cache=parse_cache,
+                         budget=budget,
+                         ignored_kinds=get_ignored_kinds(config),
+                         import_graph=import_graph,
+                         reader=reader,
+                         module_settings=get_module_settings(config),
+                         module_index=module_index,
+                         resolver=get_resolver(config),
+                         parser=get_parser(config))
+
+    try:
+        distances = select_items(skippy, items, forced_paths, forced_tests)
+
+        if config.option.skippy_results:
+            skip_passed_tests(config, skippy, [
+                _ for _ in distances
+                if get_item_module(_) is not None and
+                not is_forced(_, forced_paths)
+            ], distances)
+    finally:
+        reader.close()
+        if resolution_cache is not None:
+            resolution_cache.save(
+                    module_index.get_resolutions(str(config.rootdir)))
+
+    if config.option.skippy_order:
+        order_by_proximity(config, items, distances)
+
+
+def pytest_terminal_summary(terminalreporter):
+    affected = getattr(terminalreporter.config, '_skippy_affected', None)
+    if affected is None:
+        return
+
+    terminalreporter.section('skippy affected tests')
+    for name in sorted(affected):
+        terminalreporter.write_line(
+                '%s: %d test files' % (name, len(affected[name])))
+        for path in affected[name]:
+            terminalreporter.write_line('    %s' % path)
+
+
+def report_affected(config, git_repo_dir, items, budget=None):
+    """Report the test files affected by each change set of
+    ``--skippy-change-set`` (if any)
 
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+    :param items: The collected test items
+    :type items: list
+    :param budget: The budget of the analysis (None = unlimited)
+    :type budget: pytest_skippy.core.Budget
+    """
+    if not config.option.skippy_change_sets:
+        return
+
+    import json
+
+    try:
+        result = get_affected_tests(config, git_repo_dir, items, budget)
+    except subprocess.CalledProcessError as e:
+        raise pytest.UsageError('Call to git failed: %s' % str(e))
+
+    config._skippy_affected = result
+    if config.option.skippy_affected_json:
+        with open(config.option.skippy_affected_json, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+
+
+def get_affected_tests(config, git_repo_dir, items, budget=None):
+    """Get the test files affected by each change set of
+    ``--skippy-change-set``
+
+    The import graph of each test file is built once and matched against
+    every change set. Changes are detected at the level of files. Test files
+    which are not analyzed within the budget are affected by any change.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+    :param items: The collected test items
+    :type items: list
+    :param budget: The budget of the analysis (None = unlimited)
+    :type budget: pytest_skippy.core.Budget
+
+    :returns: A mapping of each change set (and ``'union'`` for all of them)
+              to the sorted list of affected test files
+    :rtype: dict
+    """
+    import pytest_skippy.affected as affected
+    import pytest_skippy.changes as changes
+    import pytest_skippy.core as core
+
+    try:
+        mapping = changes.parse_mapping(config.getini('skippy_mapping'))
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+
+    skippy = core.Skippy(set(), use_bytecode=config.option.skippy_bytecode,
+                         parse_cache=get_parse_cache(config, git_repo_dir),
+                         budget=budget,
+                         ignored_kinds=get_ignored_kinds(config),
+                         module_settings=get_module_settings(config),
+                         resolver=get_resolver(config),
+                         parser=get_parser(config))
+
+    # The dependencies of each test file (None if unknown)
+    dependencies = {}
     for item in items:
-        # Any tests that don't have an analyzable module need to run
-        if not hasattr(item, 'module'):
-            continue
+        path = item.nodeid.split('::')[0]
+        if path not in dependencies:
+            dependencies[path] = get_item_dependencies(skippy, item)
+
+    change_sets = {}
+    forced = {}
+    for spec in config.option.skippy_change_sets:
+        changed_files = affected.get_change_set(spec, git_repo_dir)
+        change_sets[spec] = set(
+                os.path.realpath(os.path.join(git_repo_dir, _))
+                for _ in changed_files)
+
+        # Tests mapped to a changed file (or a changed conftest)
+        run_all, test_paths = changes.map_changed_files(changed_files, mapping)
+        test_paths = set(os.path.normpath(_) for _ in test_paths)
+
+        # A conftest at the root of the repository affects every test
+        run_all = run_all or '.' in test_paths
+        forced[spec] = set(
+                _ for _ in dependencies if run_all or any(
+                    _ == path or _.startswith(path + '/')
+                    for path in test_paths))
+
+    result, union = affected.get_affected(dependencies, change_sets)
+    for spec, paths in forced.items():
+        result[spec] |= paths
+        union |= paths
+
+    result['union'] = union
+    return dict((name, sorted(paths)) for name, paths in result.items())
+
+
+def get_item_dependencies(skippy, item):
+    """Get the files an item depends on
+
+    :param skippy: The core skippy object
+    :type skippy: pytest_skippy.core.Skippy
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+
+    :returns: The canonical paths of the files in the import graph of the
+              item, or None if they can't be determined
+    :rtype: set
+    """
+    import pytest_skippy.affected as affected
+    import pytest_skippy.core as core
+
+    try:
+        module = get_item_module(item)
+        if module is not None:
+            return affected.get_dependencies(skippy, module)
 
-        item_module = item.module.__name__
+        if not has_embedded_code(item):
+            return None
 
-        if not skippy.should_run(item_module):
+        filename = os.path.realpath(str(item.fspath))
+        dependencies = set([filename])
+        for module in skippy.get_embedded_imports(filename):
+            dependencies |= affected.get_dependencies(skippy, module)
+    except (core.BudgetExceeded, SyntaxError, ValueError, TypeError,
+            IOError, OSError):
+        return None
+
+    return dependencies
+
+
+def select_items(skippy, items, forced_paths, forced_tests=()):
+    """Mark the items that don't need to run as skipped
+
+    :param skippy: The core skippy object
+    :type skippy: pytest_skippy.core.Skippy
+    :param items: The collected test items
+    :type items: list
+    :param forced_paths: Absolute paths of tests which must run
+    :type forced_paths: set
+    :param forced_tests: Node ids of tests which must run
+    :type forced_tests: set
+
+    :returns: A mapping of each item that will run to its import distance
+              from a change (None if unknown)
+    :rtype: dict
+    """
+    # Maps each item that will run to its import distance from a change
+    distances = {}
+
+    for item in items:
+        should_run, distance = get_decision(
+                skippy, item, forced_paths, forced_tests)
+
+        # Plugins may override the decision
+        decision = item.config.hook.pytest_skippy_decision(
+                item=item, should_run=should_run, distance=distance)
+        if decision is not None:
+            should_run = bool(decision)
+
+        if not should_run:
             # Skip test
             item.add_marker(pytest.mark.skip)
+        else:
+            distances[item] = distance
+
+    return distances
+
+
+def get_decision(skippy, item, forced_paths, forced_tests=()):
+    """Decide if an item needs to run
+
+    :param skippy: The core skippy object
+    :type skippy: pytest_skippy.core.Skippy
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+    :param forced_paths: Absolute paths of tests which must run
+    :type forced_paths: set
+    :param forced_tests: Node ids of tests which must run
+    :type forced_tests: set
+
+    :returns: (should_run, distance) where distance is the import distance
+              of a running item from a change (None if unknown)
+    :rtype: tuple
+    """
+    # Tests mapped to a changed file (or a changed conftest) always run
+    if is_forced(item, forced_paths) or item.nodeid in forced_tests:
+        return True, 0
+
+    # Tests are analyzed from their module, or from the file defining them if
+    # it embeds python code
+    root = get_item_module(item)
+    if root is not None:
+        should_run = skippy.should_run(root)
+    elif has_embedded_code(item):
+        root = str(item.fspath)
+        should_run = skippy.should_run_file(root)
+    else:
+        # Any tests that can't be analyzed need to run
+        return True, None
+
+    return should_run, skippy.distances.get(root) if should_run else None
+
+
+def get_item_module(item):
+    """Get the name of the module defining an item
+
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+
+    :returns: The name of the module or None if the item is not defined by a
+              python module
+    :rtype: str
+    """
+    if hasattr(item, 'module'):
+        return item.module.__name__
+
+    # Doctests of a python module run in (a copy of) the module namespace
+    dtest = getattr(item, 'dtest', None)
+    name = dtest is not None and dtest.globs.get('__name__')
+    if name and name != '__main__':
+        return name
+
+    return None
+
+
+def has_embedded_code(item):
+    """Determine if an item is defined by code embedded in a non python file
+
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+
+    :returns: True for doctest text files and notebook cells
+    :rtype: bool
+    """
+    path = str(item.fspath)
+    if path.endswith('.py'):
+        return False
+
+    return hasattr(item, 'dtest') or path.endswith('.ipynb')
+
+
+def detect_changes(config, git_repo_dir):
+    """Detect the changes made relative to the target branch
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+
+    :returns: (changed_files, changed_symbols, forced_paths,
+              extension_modules) with absolute filenames. changed_files and
+              changed_symbols are as expected by
+              :py:class:`pytest_skippy.core.Skippy`. forced_paths is a set of
+              test paths which must run (None if all tests must run).
+              extension_modules are the names of extension modules whose
+              build sources changed.
+    :rtype: tuple
+    """
+    import pytest_skippy.changes as changes
+    import pytest_skippy.git as git
+
+    try:
+        mapping = changes.parse_mapping(config.getini('skippy_mapping'))
+        extension_mapping = changes.parse_mapping(
+                config.getini('skippy_extension_mapping'))
+    except ValueError as e:
+        raise pytest.UsageError(str(e))
+
+    target_branch = config.option.skippy_target_branch
+    changed_files = config.hook.pytest_skippy_changed_files(
+            config=config, target_branch=target_branch,
+            git_repo_dir=git_repo_dir)
+    if changed_files is None:
+        changed_files = git.detect_changed_files(
+                target_branch,
+                git_repo_dir=git_repo_dir)
+    changed_files = set(changed_files)
+
+    changed_symbols = {}
+    if config.option.skippy_symbols or config.option.skippy_semantic:
+        merge_base = git.get_merge_base(
+                target_branch, git_repo_dir=git_repo_dir)
+
+    if config.option.skippy_semantic:
+        changed_files -= changes.detect_cosmetic_changes(
+                changed_files, merge_base, git_repo_dir=git_repo_dir)
+
+    if config.option.skippy_symbols:
+        changed_symbols = changes.detect_changed_symbols(
+                changed_files, merge_base, git_repo_dir=git_repo_dir)
+
+    run_all, forced_paths = changes.map_changed_files(changed_files, mapping)
+    extension_modules = changes.map_extension_sources(
+            changed_files, extension_mapping)
+    if run_all:
+        forced_paths = None
+    else:
+        forced_paths = set([os.path.abspath(_) for _ in forced_paths])
+
+    changed_files = set([os.path.abspath(_) for _ in
+                         changed_files - set(changed_symbols)])
+    changed_symbols = dict(
+            (os.path.abspath(k), v) for k, v in changed_symbols.items())
+
+    return changed_files, changed_symbols, forced_paths, extension_modules
+
+
+def prepare_changes(config, git_repo_dir):
+    """Detect the changes and load the caches used by the analysis
+
+    This only depends on git and the skippy caches (not on the collected
+    tests) so it runs in the background during collection.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+
+    :returns: The values returned by :py:func:`detect_changes`, followed by
+              the parse cache and the recorded import graph
+    :rtype: tuple
+    """
+    changes = detect_changes(config, git_repo_dir)
+    changed_files, changed_symbols = changes[:2]
+
+    return changes + (
+            get_parse_cache(config, git_repo_dir),
+            get_import_graph(config, git_repo_dir,
+                             changed_files | set(changed_symbols)))
+
+
+def get_module_files(modules):
+    """Get the files defining a group of modules
+
+    :param modules: Module names
+    :type modules: set
+
+    :returns: The canonical paths of the files of the modules that can be
+              located
+    :rtype: set
+    """
+    if not modules:
+        return set()
+
+    import pytest_skippy.imp as imp
+
+    filenames = (imp.convert_module_to_filename(_) for _ in modules)
+    return set(_ for _ in filenames if _)
+
+
+def get_parse_cache(config, git_repo_dir):
+    """Create the parse cache (if enabled)
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+
+    :returns: A parse cache or None if caching is disabled
+    :rtype: pytest_skippy.cache.ParseCache
+    """
+    cache_dir = config.option.skippy_cache_dir
+    if not cache_dir:
+        return None
+
+    import pytest_skippy.cache as cache
+    import pytest_skippy.git as git
+
+    blob_ids = git.get_blob_ids(git_repo_dir)
+    return cache.ParseCache(os.path.abspath(cache_dir), blob_ids,
+                            variant=','.join(get_module_settings(config)),
+                            root=git_repo_dir)
+
+
+def get_module_index(config, git_repo_dir):
+    """Create the module index used by the analysis
+
+    When caching is enabled, the index starts with the stdlib and third party
+    modules resolved by earlier runs in the same environment.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+
+    :returns: (index, resolution_cache) where resolution_cache is None if
+              caching is disabled
+    :rtype: tuple
+    """
+    import pytest_skippy.imp as imp
+
+    index = imp.ModuleIndex()
+    cache_dir = config.option.skippy_cache_dir
+    if not cache_dir:
+        return index, None
+
+    import pytest_skippy.cache as cache
+
+    resolution_cache = cache.ResolutionCache(
+            os.path.abspath(cache_dir), git_repo_dir, index.path)
+    index.add_resolutions(resolution_cache.load(), git_repo_dir)
+    return index, resolution_cache
+
+
+def get_resolver(config):
+    """Get the module resolver plugged in by the resolve_module hook
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+
+    :returns: A callable locating a module (see
+              :py:func:`pytest_skippy.hooks.pytest_skippy_resolve_module`)
+    :rtype: callable
+    """
+    def resolve_module(module_name):
+        return config.hook.pytest_skippy_resolve_module(
+                config=config, module_name=module_name)
+
+    return resolve_module
+
+
+def get_parser(config):
+    """Get the parser plugged in by the parse_file hook
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+
+    :returns: A callable returning the modules imported by a file (see
+              :py:func:`pytest_skippy.hooks.pytest_skippy_parse_file`)
+    :rtype: callable
+    """
+    def parse_file(filename):
+        return config.hook.pytest_skippy_parse_file(
+                config=config, filename=filename)
+
+    return parse_file
+
+
+def get_cache_dir(config):
+    """Get the directory where skippy stores its results and import graphs
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+
+    :returns: The skippy cache directory if set, otherwise a directory in the
+              pytest cache (None if the pytest cache is disabled)
+    :rtype: str
+    """
+    directory = config.option.skippy_cache_dir
+    if directory:
+        return os.path.abspath(directory)
+    elif getattr(config, 'cache', None):
+        return str(config.cache.makedir('skippy'))
+
+
+def get_import_graph(config, git_repo_dir, changed_files):
+    """Load the import graph recorded at the merge base (if any)
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+    :param changed_files: Absolute paths of the files changed since the merge
+                          base. The graph is not used for those files.
+    :type changed_files: set
+
+    :returns: The recorded import graph or None
+    :rtype: pytest_skippy.graph.ImportGraph
+    """
+    import pytest_skippy.graph as graph
+
+    # git is only needed once a graph was recorded
+    directory = get_cache_dir(config)
+    if not directory or not graph.ImportGraph.has_recordings(directory):
+        return None
+
+    import pytest_skippy.git as git
+
+    merge_base = git.get_merge_base(config.option.skippy_target_branch,
+                                    git_repo_dir=git_repo_dir)
+    root = os.path.realpath(git_repo_dir)
+    return graph.ImportGraph.load(
+            directory, merge_base, git_repo_dir,
+            set(os.path.relpath(os.path.realpath(_), root)
+                for _ in changed_files))
+
+
+def select_by_coverage(config, git_repo_dir, changed_files, items):
+    """Select the tests which executed the changed lines (if enabled)
+
+    Changes are mapped to tests using the coverage recorded at the merge
+    base. Changed files whose changes can't be mapped to tests are left to
+    the import graph analysis.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param git_repo_dir: The base directory of the git repository
+    :type git_repo_dir: str
+    :param changed_files: Absolute paths of changed files
+    :type changed_files: set
+    :param items: The collected test items
+    :type items: list
+
+    :returns: (changed_files, forced_tests) where changed_files are the files
+              left to the import graph analysis and forced_tests is a set of
+              node ids of tests which must run
+    :rtype: tuple
+    """
+    directory = get_cache_dir(config)
+    if not (config.option.skippy_coverage and directory):
+        return changed_files, set()
+
+    import pytest_skippy.git as git
+    import pytest_skippy.linecoverage as linecoverage
+
+    merge_base = git.get_merge_base(config.option.skippy_target_branch,
+                                    git_repo_dir=git_repo_dir)
+    coverage_db = linecoverage.CoverageDB.load(directory, merge_base)
+    if coverage_db is None:
+        return changed_files, set()
+
+    hunks = git.get_changed_hunks(merge_base, git_repo_dir=git_repo_dir)
+    paths = dict((os.path.relpath(_, git_repo_dir), _)
+                 for _ in changed_files if _.endswith('.py'))
+    sources = git.read_files(merge_base, list(paths), git_repo_dir)
+    new_sources = git.read_files('HEAD', list(paths), git_repo_dir)
+
+    # Tests which were not recorded (new tests) must run
+    recorded = set(coverage_db.tests)
+    forced_tests = set(_.nodeid for _ in items if _.nodeid not in recorded)
+
+    changed_files = set(changed_files)
+    for path, filename in paths.items():
+        if sources[path] is None or new_sources[path] is None:
+            continue
+
+        tests = coverage_db.select_tests(
+                path, sources[path], new_sources[path], hunks.get(path, ()))
+        if tests is not None:
+            forced_tests |= tests
+            changed_files.discard(filename)
+
+    return changed_files, forced_tests
+
+
+def get_ignored_kinds(config):
+    """Get the kinds of imports which are not traversed
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+
+    :returns: A set of kinds of imports (see :py:mod:`pytest_skippy.parse`)
+    :rtype: set
+    """
+    import pytest_skippy.parse as parse
+
+    ignored_kinds = set()
+    if config.option.skippy_ignore_type_checking:
+        ignored_kinds.add(parse.TYPE_CHECKING)
+
+    return ignored_kinds
+
+
+def get_module_settings(config):
+    """Get the names of the variables holding dynamically imported modules
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+
+    :returns: A sorted tuple of variable names
+    :rtype: tuple
+    """
+    import pytest_skippy.parse as parse
+
+    names = set(parse.MODULE_SETTINGS)
+    names.update(config.getini('skippy_module_settings'))
+    return tuple(sorted(names))
+
+
+def is_forced(item, forced_paths):
+    """Determine if an item is located in one of the forced test paths
+
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+    :param forced_paths: Absolute paths of files or directories
+    :type forced_paths: set
+
+    :returns: True if the item must run
+    :rtype: bool
+    """
+    path = str(item.fspath)
+    return any(path == _ or path.startswith(_ + os.sep)
+               for _ in forced_paths)
+
+
+def get_conftests(item, rootdir):
+    """Get the conftest files that apply to an item
+
+    :param item: A collected test item
+    :type item: _pytest.main.Item
+    :param rootdir: The pytest root directory
+    :type rootdir: py.path.local
+
+    :returns: The canonical paths of conftest files between the item's
+              directory and the root directory
+    :rtype: set
+    """
+    conftests = set()
+    for path in item.fspath.dirpath().parts(reverse=True):
+        conftest = path.join('conftest.py')
+        if conftest.check(file=1):
+            conftests.add(str(conftest.realpath()))
+
+        if path == rootdir:
+            break
+
+    return conftests
+
+
+def skip_passed_tests(config, skippy, items, distances):
+    """Skip items that passed with the same dependencies before
+
+    The dependencies of an item are the files in the import graph of its
+    module and the conftest files that apply to it. Items that are not
+    skipped are recorded in the result cache if they pass.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param skippy: The core skippy object
+    :type skippy: pytest_skippy.core.Skippy
+    :param items: The test items that would otherwise run
+    :type items: list
+    :param distances: The mapping of items that will run to their import
+                      distance. Skipped items are removed from the mapping.
+    :type distances: dict
+    """
+    directory = get_cache_dir(config)
+    if not directory:
+        return
+
+    import pytest_skippy.core as core
+    import pytest_skippy.results as results
+
+    result_cache = results.ResultCache(directory)
+
+    closures = {}
+    file_digests = {}
+    keys = {}
+    for item in items:
+        module = get_item_module(item)
+        if module not in closures:
+            try:
+                dependencies = skippy.get_dependencies(module)
+            except core.BudgetExceeded:
+                # Without the full closure, results can't be looked up or
+                # recorded for any of the remaining items
+                break
+
+            dependencies |= get_conftests(item, config.rootdir)
+            closures[module] = results.hash_files(
+                    dependencies, str(config.rootdir), file_digests)
+
+        key = result_cache.get_key(item.nodeid, closures[module])
+        if result_cache.has_passed(key):
+            item.add_marker(pytest.mark.skip(
+                reason="passed previously with the same dependencies"))
+            distances.pop(item)
+        else:
+            keys[item.nodeid] = key
+
+    config.pluginmanager.register(
+            results.ResultRecorder(result_cache, keys), 'skippy-results')
+
+
+def order_by_proximity(config, items, distances):
+    """Reorder items in-place so that the fastest feedback comes first
+
+    Skipped tests are moved to the end. Among the others, tests that failed on
+    the previous run (as recorded by pytest's cache provider) come first,
+    followed by tests sorted by the number of import hops between the test
+    module and a changed file.
+
+    :param config: The pytest config object
+    :type config: _pytest.config.Config
+    :param items: The collected test items
+    :type items: list
+    :param distances: A mapping of item to import distance (None when the
+                      distance is unknown). Items that will be skipped are
+                      not present in the mapping.
+    :type distances: dict
+    """
+    cache = getattr(config, 'cache', None)
+    last_failed = cache.get('cache/lastfailed', {}) if cache else {}
+
+    def proximity(item):
+        skipped = item not in distances
+        distance = distances.get(item)
+        if distance is None:
+            distance = float('inf')
+
+        return (skipped, item.nodeid not in last_failed, distance)
+
+    # sorted is stable so the collection order is kept for ties
+    items[:] = sorted(items, key=proximity)
@@ -0,0 +1,91 @@
+from multiprocessing.pool import ThreadPool
+
+
+def read_file(filename):
+    """Read the contents of a file
+
+    :param filename: The path of the file
+    :type filename: str
+
+    :returns: The contents of the file
+    :rtype: bytes
+
+    :raises IOError: if the file can't be read
+    """
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+class SourceReader(object):
+    """Read source files, optionally ahead of time on a pool of threads
+
+    Files passed to :py:meth:`prefetch` are read concurrently in the
+    background, so that the latency of reading them (for example from a
+    network filesystem) overlaps. The number of files that are read ahead
+    but not yet consumed is bounded to limit memory use.
+
+    :param threads: The number of threads reading ahead (0 = files are only
+                    read on demand)
+    :type threads: int
+    :param max_pending: The maximum number of files read ahead and not yet
+                        consumed (Default: 8 per thread)
+    :type max_pending: int
+    """
+
+    def __init__(self, threads=0, max_pending=None):
+        self.pool = ThreadPool(threads) if threads > 0 else None
+        self.max_pending = max_pending or 8 * threads
+
+        # {filename: multiprocessing.pool.AsyncResult}
+        self.pending = {}
+
+    def prefetch(self, filenames):
+        """Start reading files in the background
+
+        :param filenames: The files that will be read next
+        :type filenames: iterable
+        """
+        if self.pool is None:
+            return
+
+        for filename in filenames:
+            if len(self.pending) >= self.max_pending:
+                break
+
+            if filename not in self.pending:
+                self.pending[filename] = self.pool.apply_async(
+                        read_file, (filename,))
+
+    def read(self, filename):
+        """Read a file, waiting for it if it is being read ahead
+
+        :param filename: The path of the file
+        :type filename: str
+
+        :returns: The contents of the file
+        :rtype: bytes
+
+        :raises IOError: if the file can't be read
+        """
+        pending = self.pending.pop(filename, None)
+        if pending is not None:
+            return pending.get()
+
+        return read_file(filename)
+
+    def discard(self):
+        """Forget the files read ahead which were not consumed
+
+        Files which are being read are still read, but their contents are
+        dropped. This makes room for files read ahead later (see
+        ``max_pending``).
+        """
+        self.pending.clear()
+
+    def close(self):
+        """Stop the threads reading ahead"""
+        self.pending.clear()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
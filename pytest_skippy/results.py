@@ -0,0 +1,125 @@
+import hashlib
+import os.path
+import sys
+
+import pytest_skippy.cache as cache
+
+
+def hash_files(filenames, root, file_digests=None):
+    """Hash the contents of a group of files
+
+    The hash depends on the contents of the files and on their paths relative
+    to the root directory, so it is stable across checkouts in different
+    directories. The running interpreter version is included since test
+    outcomes may depend on it.
+
+    :param filenames: The files to hash
+    :type filenames: set
+    :param root: The root directory of the files
+    :type root: str
+    :param file_digests: A memo of the digests of individual files, shared
+                         between calls
+    :type file_digests: dict
+
+    :returns: A hex digest
+    :rtype: str
+    """
+    if file_digests is None:
+        file_digests = {}
+
+    root = os.path.realpath(root)
+    digests = []
+    for filename in filenames:
+        digest = file_digests.get(filename)
+        if digest is None:
+            try:
+                with open(filename, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except (IOError, OSError):
+                digest = ''
+            file_digests[filename] = digest
+        path = os.path.relpath(os.path.realpath(filename), root)
+        digests.append((path, digest))
+
+    closure = hashlib.sha1(sys.version.encode('utf-8'))
+    for path, digest in sorted(digests):
+        closure.update(('%s\0%s\0' % (path, digest)).encode('utf-8'))
+
+    return closure.hexdigest()
+
+
+class ResultCache(object):
+    """A store of tests which passed with a given set of dependencies
+
+    :param directory: The root directory of the cache
+    :type directory: str
+    """
+
+    NAMESPACE = 'results-v1'
+
+    def __init__(self, directory):
+        self.store = cache.ContentStore(directory, self.NAMESPACE)
+
+    @staticmethod
+    def get_key(nodeid, closure_hash):
+        """Get the cache key of a test
+
+        :param nodeid: The pytest node id of the test
+        :type nodeid: str
+        :param closure_hash: The hash of the test's dependencies (see
+                             :py:func:`hash_files`)
+        :type closure_hash: str
+
+        :rtype: str
+        """
+        key = hashlib.sha1(closure_hash.encode('utf-8'))
+        key.update(nodeid.encode('utf-8'))
+        return key.hexdigest()
+
+    def has_passed(self, key):
+        """Determine if a test previously passed
+
+        :param key: The cache key of the test (see :py:func:`get_key`)
+        :type key: str
+
+        :rtype: bool
+        """
+        return self.store.get(key) == 'passed'
+
+    def record_pass(self, key):
+        """Record that a test passed
+
+        :param key: The cache key of the test (see :py:func:`get_key`)
+        :type key: str
+        """
+        self.store.set(key, 'passed')
+
+
+class ResultRecorder(object):
+    """A pytest plugin recording passing tests in a :py:class:`ResultCache`
+
+    A test is recorded once its setup, call and teardown have all passed.
+
+    :param result_cache: The cache where passing tests are recorded
+    :type result_cache: ResultCache
+    :param keys: A mapping of node id to cache key for the tests that should
+                 be recorded
+    :type keys: dict
+    """
+
+    def __init__(self, result_cache, keys):
+        self.result_cache = result_cache
+        self.keys = keys
+        self.passed = set()
+
+    def pytest_runtest_logreport(self, report):
+        key = self.keys.get(report.nodeid)
+        if key is None:
+            return
+
+        if not report.passed:
+            self.keys.pop(report.nodeid)
+        elif report.when == 'call':
+            self.passed.add(report.nodeid)
+        elif report.when == 'teardown' and report.nodeid in self.passed:
+            self.result_cache.record_pass(key)
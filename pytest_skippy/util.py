@@ -1,3 +1,5 @@
+import sys
+import threading
 from collections import deque
 
 
@@ -40,3 +42,95 @@ def flatten_imports(imported_module, import_tree):
         to_traverse.extend(import_tree[module])
 
     return flat_imports
+
+
+def get_import_distances(imported_module, import_tree):
+    """Returns the number of import hops to imported_module
+
+    Every module that imports imported_module (directly or indirectly) is
+    mapped to the smallest number of imports between it and imported_module.
+
+    :param imported_module: A leaf module name
+    :type imported_module: str
+    :param import_tree: A dict in the form of {module: set(imported_by)}
+    :type import_tree: dict
+
+    :returns: A dict in the form of {module: hops}
+    :rtype: dict
+
+    Example:
+    A is imported by B, which is imported by C
+
+    >>> distances = get_import_distances(
+    ...     'A', {'A': {'B', 'C'}, 'B': {'C'}, 'C': set()})
+    >>> sorted(distances.items())
+    [('A', 0), ('B', 1), ('C', 1)]
+    """
+    distances = {imported_module: 0}
+
+    # breadth first, so each module is first reached by a shortest path
+    to_traverse = deque((imported_module,))
+
+    while to_traverse:
+        module = to_traverse.popleft()
+
+        for importer in import_tree.get(module, ()):
+            if importer not in distances:
+                distances[importer] = distances[module] + 1
+                to_traverse.append(importer)
+
+    return distances
+
+
+class TaskTimeout(Exception):
+    """Raised when a :py:class:`BackgroundTask` doesn't complete in time"""
+
+
+class BackgroundTask(object):
+    """Call a function on a background (daemon) thread
+
+    :param function: The function to call
+    :type function: callable
+    :param args: The arguments of the function
+
+    >>> task = BackgroundTask(sorted, {2, 1})
+    >>> task.result()
+    [1, 2]
+    """
+
+    def __init__(self, function, *args):
+        self._value = None
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run,
+                                        args=(function, args))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, function, args):
+        try:
+            self._value = function(*args)
+        except BaseException:
+            self._error = sys.exc_info()[1]
+
+    def result(self, timeout=None):
+        """Wait for the function to return
+
+        :param timeout: The maximum number of seconds to wait (None = no
+                        limit)
+        :type timeout: float
+
+        :returns: The value returned by the function
+
+        :raises TaskTimeout: if the function is still running after the
+                             timeout
+        :raises: the exception raised by the function (if any)
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TaskTimeout()
+
+        if self._error is not None:
+            raise self._error
+
+        return self._value
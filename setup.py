@@ -61,7 +61,10 @@ setup(
     ],
     keywords='pytest incremental testing',
     packages=find_packages(exclude=['contrib', 'docs', 'tests']),
-    install_requires=['pytest>=2.3.4', 'stdlib_list>=0.4.0'],
+    install_requires=[
+        'pytest>=2.3.4',
+        'stdlib_list>=0.4.0; python_version < "3.10"',
+    ],
     tests_require=test_requirements,
     extras_require={
         'dev': dev_requirements,
@@ -0,0 +1,41 @@
+import pytest
+
+from pytest_skippy.affected import get_change_set, get_dependencies
+from pytest_skippy.imp import EXTENSION_SUFFIXES
+
+
+@pytest.fixture()
+def repo(git_repo):
+    path = git_repo.workspace
+    for _ in range(3):
+        (path / ('file_%d.txt' % _)).write_text(u'content')
+        git_repo.run('git add file_%d.txt' % _)
+        git_repo.api.index.commit(str(_))
+
+    return git_repo
+
+
+@pytest.mark.parametrize('spec,expected', [
+    ('HEAD~2', {'file_1.txt', 'file_2.txt'}),
+    ('HEAD~2..HEAD~1', {'file_1.txt'}),
+    ('HEAD..HEAD~1', set()),
+])
+def test_change_set_of_commits(repo, spec, expected):
+    assert get_change_set(spec, git_repo_dir=repo.workspace) == expected
+
+
+def test_change_set_of_file_list(tmpdir):
+    change_list = tmpdir.join('changes.txt')
+    change_list.write('a.py\n\nsub/b.py\n')
+
+    assert get_change_set('file:%s' % change_list) == {'a.py', 'sub/b.py'}
+
+
+def test_dependencies_include_extension_sources():
+    class FakeSkippy(object):
+        def get_dependencies(self, root_module):
+            return {'/r/test_a.py', '/r/fast' + EXTENSION_SUFFIXES[0]}
+
+    dependencies = get_dependencies(FakeSkippy(), 'test_a')
+    assert '/r/test_a.py' in dependencies
+    assert '/r/fast.pyx' in dependencies
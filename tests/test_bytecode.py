@@ -0,0 +1,180 @@
+import py_compile
+import sys
+
+import pytest
+
+from pytest_skippy.bytecode import get_imports, load_cached_code
+from pytest_skippy.parse import TYPE_CHECKING, get_imported_symbols
+
+SOURCE = b'''
+import os, sys as system
+import a.b.c
+import d.e as f
+from g import h, i as j
+from k import *
+from . import l
+from ..m import n
+
+
+class Foo(object):
+    def bar(self):
+        import o
+
+    x = [__import__('p') for _ in range(2)]
+
+
+def baz():
+    def qux():
+        from r import s
+'''
+
+
+@pytest.fixture
+def source_file(tmpdir):
+    filename = tmpdir.mkdir('pkg').join('mod.py')
+    filename.write_binary(SOURCE)
+    return str(filename)
+
+
+def compile_file(filename, **kwargs):
+    py_compile.compile(filename, doraise=True, **kwargs)
+
+
+def test_get_imports():
+    code = compile(SOURCE, '<string>', 'exec')
+    imports = get_imports(code)
+
+    assert sorted(imports, key=repr) == sorted([
+        ('os', None, 0, 'runtime'),
+        ('sys', None, 0, 'runtime'),
+        ('a.b.c', None, 0, 'runtime'),
+        ('d.e', None, 0, 'runtime'),
+        ('g', ('h', 'i'), 0, 'runtime'),
+        ('k', ('*',), 0, 'runtime'),
+        ('', ('l',), 1, 'runtime'),
+        ('m', ('n',), 2, 'runtime'),
+        ('o', None, 0, 'local'),
+        ('r', ('s',), 0, 'local'),
+    ], key=repr)
+
+
+def test_load_cached_code(source_file):
+    # No cached bytecode
+    assert load_cached_code(source_file) is None
+
+    compile_file(source_file)
+    code = load_cached_code(source_file)
+    assert code is not None
+    assert code.co_filename == source_file
+
+
+def test_stale_bytecode_is_not_loaded(source_file):
+    compile_file(source_file)
+
+    # Changing the size of the source invalidates the bytecode
+    with open(source_file, 'ab') as f:
+        f.write(b'import t\n')
+
+    assert load_cached_code(source_file) is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason="Hash based bytecode requires python 3.7+")
+def test_hash_based_bytecode(source_file):
+    invalidation_mode = py_compile.PycInvalidationMode.CHECKED_HASH
+    compile_file(source_file, invalidation_mode=invalidation_mode)
+    assert load_cached_code(source_file) is not None
+
+    # Same size, different contents
+    with open(source_file, 'rb+') as f:
+        f.write(b'#')
+
+    assert load_cached_code(source_file) is None
+
+
+def test_bytecode_from_another_interpreter(source_file):
+    compile_file(source_file)
+
+    import importlib.util
+    cache = importlib.util.cache_from_source(source_file)
+    with open(cache, 'rb+') as f:
+        f.write(b'\0\0\0\0')
+
+    assert load_cached_code(source_file) is None
+
+
+def test_bytecode_matches_source(source_file):
+    expected = get_imported_symbols(source_file)
+
+    compile_file(source_file)
+    assert get_imported_symbols(source_file, use_bytecode=True) == expected
+
+
+def test_dynamic_imports_are_parsed(source_file):
+    compile_file(source_file)
+
+    # __import__('p') is not visible in the bytecode
+    modules, _, _ = get_imported_symbols(source_file, use_bytecode=True)
+    assert 'p' in modules
+
+
+def test_stale_bytecode_falls_back_to_source(source_file):
+    compile_file(source_file)
+    with open(source_file, 'ab') as f:
+        f.write(b'import t\n')
+
+    modules, _, _ = get_imported_symbols(source_file, use_bytecode=True)
+    assert 't' in modules
+
+
+@pytest.mark.parametrize('source,ignored_kinds,module,confirmed', [
+    (b'from typing import TYPE_CHECKING\n'
+     b'if TYPE_CHECKING:\n'
+     b'    import typed\n', {TYPE_CHECKING}, 'typed', False),
+    (b'try:\n'
+     b'    import ujson\n'
+     b'except ImportError:\n'
+     b'    ujson = None\n', (), 'ujson', True),
+])
+def test_import_kinds_are_parsed(tmpdir, source, ignored_kinds, module,
+                                 confirmed):
+    filename = tmpdir.join('kinds.py')
+    filename.write_binary(source)
+    compile_file(str(filename))
+
+    # The kinds of the imports are only known from the source
+    modules, confirmed_modules, _ = get_imported_symbols(
+            str(filename), use_bytecode=True, ignored_kinds=ignored_kinds)
+    assert (module in modules) is confirmed
+    assert module not in confirmed_modules
+
+
+class DictCache(dict):
+    def get(self, filename):
+        return dict.get(self, filename)
+
+    def set(self, filename, statements):
+        self[filename] = statements
+
+
+def test_bytecode_is_not_cached(tmpdir):
+    filename = tmpdir.join('kinds.py')
+    filename.write_binary(b'''
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import typed
+''')
+    compile_file(str(filename))
+
+    # The kinds of the imports are unknown in bytecode
+    cache = DictCache()
+    modules, _, _ = get_imported_symbols(str(filename), use_bytecode=True,
+                                         cache=cache)
+    assert 'typed' in modules
+    assert cache == {}
+
+    modules, _, _ = get_imported_symbols(str(filename), cache=cache,
+                                         ignored_kinds={TYPE_CHECKING})
+    assert 'typed' not in modules
+    assert list(cache) == [str(filename)]
@@ -0,0 +1,135 @@
+import os
+
+from pytest_skippy.cache import (ContentStore, ParseCache, ResolutionCache,
+                                 get_environment_key)
+
+
+def test_content_store(tmpdir):
+    store = ContentStore(str(tmpdir), 'test')
+
+    assert store.get('abcdef') is None
+    assert store.is_empty()
+
+    store.set('abcdef', {'value': [1, 2]})
+    assert store.get('abcdef') == {'value': [1, 2]}
+    assert not store.is_empty()
+    assert tmpdir.join('test', 'ab', 'cdef.json').check()
+
+    # Overwriting an entry
+    store.set('abcdef', [])
+    assert store.get('abcdef') == []
+
+    # No temporary files are left behind
+    assert tmpdir.join('test', 'ab').listdir() == [
+            tmpdir.join('test', 'ab', 'cdef.json')]
+
+
+def test_content_store_corrupt_entry(tmpdir):
+    store = ContentStore(str(tmpdir), 'test')
+    tmpdir.join('test', 'ab', 'cdef.json').write('{', ensure=True)
+    assert store.get('abcdef') is None
+
+
+def test_content_store_unwritable(tmpdir):
+    # The store directory can't be created below a file
+    tmpdir.join('file').write('')
+    store = ContentStore(str(tmpdir.join('file')), 'test')
+
+    store.set('abcdef', [])
+    assert store.get('abcdef') is None
+
+
+def test_parse_cache(tmpdir):
+    blob_ids = {'/tracked.py': 'abcdef'}
+    parse_cache = ParseCache(str(tmpdir), blob_ids)
+
+    statements = [('os', None, 0, 'runtime'),
+                  ('', ('foo', 'bar'), 1, 'type_checking')]
+
+    assert parse_cache.get('/tracked.py') is None
+    parse_cache.set('/tracked.py', statements)
+    assert parse_cache.get('/tracked.py') == statements
+
+    # Entries are shared by any file with the same contents
+    blob_ids['/copy.py'] = 'abcdef'
+    assert parse_cache.get('/copy.py') == statements
+
+    # Untracked files are never cached
+    parse_cache.set('/untracked.py', statements)
+    assert parse_cache.get('/untracked.py') is None
+    assert len(os.listdir(str(tmpdir.join(ParseCache.NAMESPACE)))) == 1
+
+
+def test_parse_cache_variants(tmpdir):
+    blob_ids = {'/tracked.py': 'abcdef'}
+    statements = [('os', None, 0, 'runtime')]
+
+    ParseCache(str(tmpdir), blob_ids).set('/tracked.py', statements)
+    parse_cache = ParseCache(str(tmpdir), blob_ids, variant='INSTALLED_APPS')
+
+    # Statements extracted with other settings are not used
+    assert parse_cache.get('/tracked.py') is None
+    parse_cache.set('/tracked.py', [])
+    assert parse_cache.get('/tracked.py') == []
+
+
+def test_parse_cache_external_files(tmpdir):
+    root = tmpdir.mkdir('root')
+    external = tmpdir.join('external.py')
+    external.write('import os\n')
+    untracked = root.join('untracked.py')
+    untracked.write('import os\n')
+    statements = [('os', None, 0, 'runtime')]
+
+    parse_cache = ParseCache(str(tmpdir.join('cache')), {}, root=str(root))
+    parse_cache.set(str(external), statements)
+    parse_cache.set(str(untracked), statements)
+    assert parse_cache.get(str(external)) == statements
+
+    # Untracked first party files are still never cached
+    assert parse_cache.get(str(untracked)) is None
+
+    # External files are keyed by their metadata
+    external.write('import sys\nimport os\n')
+    assert parse_cache.get(str(external)) is None
+
+
+def test_environment_key(tmpdir):
+    root = tmpdir.mkdir('root')
+    site_packages = tmpdir.mkdir('site-packages')
+    path = [str(root), str(site_packages)]
+
+    key = get_environment_key(str(root), path)
+    assert get_environment_key(str(root), path) == key
+
+    # Changes to the first party directories are ignored
+    root.join('new.py').write('')
+    assert get_environment_key(str(root), path) == key
+
+    assert get_environment_key(str(root), path[:1]) != key
+
+    # Installing a package changes the key
+    site_packages.mkdir('package')
+    os.utime(str(site_packages), (0, 0))
+    assert get_environment_key(str(root), path) != key
+
+
+def test_resolution_cache(tmpdir):
+    root = tmpdir.mkdir('root')
+    site_packages = tmpdir.mkdir('site-packages')
+    path = [str(root), str(site_packages)]
+    directory = str(tmpdir.join('cache'))
+
+    resolution_cache = ResolutionCache(directory, str(root), path)
+    assert resolution_cache.load() == {}
+
+    resolutions = {'six': ('/site-packages/six.py', None),
+                   'yaml': ('/site-packages/yaml/__init__.py',
+                            ['/site-packages/yaml']),
+                   'missing': (None, None)}
+    resolution_cache.save(resolutions)
+    assert ResolutionCache(directory, str(root), path).load() == resolutions
+
+    # Other environments have their own entries
+    other_path = [str(root), str(tmpdir.mkdir('other-site-packages'))]
+    assert ResolutionCache(directory, str(root), other_path).load() == {}
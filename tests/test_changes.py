@@ -0,0 +1,102 @@
+import pytest
+
+from pytest_skippy.changes import (detect_changed_symbols,
+                                   detect_cosmetic_changes,
+                                   map_changed_files, parse_mapping)
+
+DOCTEST = (u'def run():\n'
+           u'    """\n'
+           u'    >>> run()\n'
+           u'    %d\n'
+           u'    """\n'
+           u'    return 1\n')
+
+
+@pytest.fixture()
+def test_repo(git_repo):
+    path = git_repo.workspace
+
+    for name in ('a.py', 'b.py', 'c.py', 'data.txt'):
+        (path / name).write_text(u'def run(): pass\ndef other(): pass\n')
+    (path / 'doc.py').write_text(DOCTEST % 1)
+    git_repo.run('git add a.py b.py c.py data.txt doc.py')
+    git_repo.api.index.commit('initial')
+
+    return git_repo, git_repo.api.head.commit.hexsha
+
+
+def test_detect_changed_symbols(test_repo):
+    git_repo, revision = test_repo
+    path = git_repo.workspace
+
+    # Definition level change
+    (path / 'a.py').write_text(u'def run(): return 1\ndef other(): pass\n')
+    # Module level change
+    (path / 'b.py').write_text(u'def run(): pass\ndef other(): pass\nrun()\n')
+    # Removed file
+    (path / 'c.py').unlink()
+    # New file
+    (path / 'd.py').write_text(u'def run(): pass\n')
+
+    changed_files = {'a.py', 'b.py', 'c.py', 'd.py', 'data.txt'}
+    changed_symbols = detect_changed_symbols(
+            changed_files, revision, git_repo_dir=path)
+
+    assert changed_symbols == {'a.py': {'run'}}
+
+
+def test_detect_cosmetic_changes(test_repo):
+    git_repo, revision = test_repo
+    path = git_repo.workspace
+
+    # Formatting, comment and docstring changes
+    (path / 'a.py').write_text(
+            u'"""Docstring"""\n'
+            u'def run():\n'
+            u'    """Docstring"""\n'
+            u'    pass  # comment\n'
+            u'def other(): pass\n')
+    # Semantic change
+    (path / 'b.py').write_text(u'def run(): return 1\ndef other(): pass\n')
+    # Syntax error
+    (path / 'c.py').write_text(u'def run(:\n')
+    # Doctests are tests
+    (path / 'doc.py').write_text(DOCTEST % 2)
+
+    changed_files = {'a.py', 'b.py', 'c.py', 'doc.py', 'data.txt'}
+    cosmetic_files = detect_cosmetic_changes(
+            changed_files, revision, git_repo_dir=path)
+
+    assert cosmetic_files == {'a.py'}
+
+
+def test_parse_mapping():
+    mapping = parse_mapping([
+        '',
+        'data/*.json = tests/a tests/b',
+        '  *.cfg=*  ',
+    ])
+    assert mapping == [('data/*.json', ['tests/a', 'tests/b']),
+                       ('*.cfg', ['*'])]
+
+
+@pytest.mark.parametrize('line', [
+    'data/*.json',
+    'data/*.json =',
+    '= tests',
+])
+def test_parse_invalid_mapping(line):
+    with pytest.raises(ValueError):
+        parse_mapping([line])
+
+
+@pytest.mark.parametrize('changed_files,expected', [
+    (set(), (False, set())),
+    ({'conftest.py'}, (False, {''})),
+    ({'tests/unit/conftest.py', 'src/x.py'}, (False, {'tests/unit'})),
+    ({'data/a.json', 'data/b.json'}, (False, {'tests/a', 'tests/b'})),
+    ({'data/a.json', 'setup.cfg'}, (True, {'tests/a', 'tests/b'})),
+])
+def test_map_changed_files(changed_files, expected):
+    mapping = [('data/*.json', ['tests/a', 'tests/b']), ('setup.cfg', ['*'])]
+    assert map_changed_files(changed_files, mapping) == expected
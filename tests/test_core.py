@@ -1,5 +1,10 @@
+import threading
+
 import pytest
-from pytest_skippy.core import Skippy
+from pytest_skippy.core import Budget, BudgetExceeded, Skippy
+from pytest_skippy.imp import EXTENSION_SUFFIXES
+from pytest_skippy.readahead import SourceReader
+from pytest_skippy.util import BackgroundTask
 
 
 def fail_on_call(*args, **kwargs):
@@ -13,6 +18,14 @@ def module_to_file(d):
     return _module_to_file
 
 
+def marker_arg(request, name, default=None):
+    marker = request.node.get_marker(name)
+    if marker is None:
+        return default
+
+    return marker.args[0]
+
+
 @pytest.fixture
 def skippy(request):
     _module_to_file = request.node.get_marker('module_to_file')
@@ -46,16 +59,19 @@ def skippy(request):
             def convert_module_to_filename(module):
                 return _module_to_file(module)
 
-    changed_files = request.node.get_marker('changed_files')
-    if changed_files is None:
-        changed_files = set()
-    else:
-        changed_files = changed_files.args[0]
+    changed_files = marker_arg(request, 'changed_files', set())
 
     safe_mode = request.node.get_marker('safe_mode')
     safe_mode = safe_mode or False
 
-    skippy = _Skippy(changed_files, safe_mode=safe_mode)
+    changed_symbols = marker_arg(request, 'changed_symbols')
+
+    budget = request.node.get_marker('budget')
+    if budget is not None:
+        budget = Budget(**budget.kwargs)
+
+    skippy = _Skippy(changed_files, safe_mode=safe_mode,
+                     changed_symbols=changed_symbols, budget=budget)
     return skippy
 
 
@@ -91,6 +107,17 @@ def test_missing_file_causes_run_in_safe_mode(skippy):
     assert 'foo' in skippy.modules_to_run
 
 
+@pytest.mark.safe_mode
+@pytest.mark.module_to_file({'foo': '/foo.py'})
+@pytest.mark.fake_traversal({'/foo.py': {'bar.baz'}})
+@pytest.mark.parametrize('attribute,expected', [(True, False), (False, True)])
+def test_attribute_candidate_in_safe_mode(attribute, expected, skippy):
+    skippy.is_attribute = lambda name: attribute
+
+    # A missing candidate only forces a run if it may be a submodule
+    assert skippy.should_run('foo') is expected
+
+
 @pytest.mark.parametrize('confirmed', [True, False])
 def test_missing_module(confirmed, skippy):
     if confirmed:
@@ -169,3 +196,376 @@ def test_traversal_logic(changed_file, modules_to_run, skippy):
     skippy.changed_files = {changed_file}
     assert skippy.should_run('A') is True
     assert skippy.modules_to_run == modules_to_run
+
+
+@pytest.mark.module_to_file(
+    {'A': 'a.py',
+     'B': 'b.py',
+     'C': 'c.py',
+     'D': 'd.py',
+     'E': 'e.py'})
+@pytest.mark.fake_traversal(
+    {'a.py': {'B', 'D'},
+     'b.py': {'C'},
+     'c.py': set(),
+     'd.py': {'C', 'E'},
+     'e.py': set()})
+@pytest.mark.parametrize('changed_file,distance', [
+    ('a.py', 0),
+    ('b.py', 1),
+    ('c.py', 2),
+    ('e.py', 2),
+])
+def test_distance_to_changed_file(changed_file, distance, skippy):
+    skippy.changed_files = {changed_file}
+    assert skippy.should_run('A') is True
+    assert skippy.distances['A'] == distance
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py', 'C': 'c.py'})
+@pytest.mark.fake_traversal({'a.py': {'B'}, 'b.py': {'C'}})
+@pytest.mark.changed_files({'c.py'})
+def test_distance_of_short_circuited_traversal(skippy):
+    assert skippy.should_run('B') is True
+    assert skippy.distances['B'] == 1
+
+    # A reaches B (which is known to be 1 hop from a change) in 1 hop
+    assert skippy.should_run('A') is True
+    assert skippy.distances['A'] == 2
+
+
+@pytest.mark.module_to_file(
+    {'A': 'a.py',
+     'B': 'b.py',
+     'C': 'c.py',
+     'D': 'd.py',
+     'E': 'e.py'})
+@pytest.mark.fake_traversal(
+    {'a.py': {'B', 'D'},
+     'b.py': {'C'},
+     'c.py': set(),
+     'd.py': {'C', 'E'},
+     'e.py': set()})
+@pytest.mark.changed_files({'e.py'})
+@pytest.mark.parametrize('analyzed', [('D',), ('A', 'D')])
+def test_distance_is_independent_of_order(analyzed, skippy):
+    for root_module in analyzed:
+        assert skippy.should_run(root_module) is True
+
+    # D was marked as run by the traversal of A
+    assert skippy.distances['D'] == 1
+    assert skippy.distances['E'] == 0
+    assert 'B' not in skippy.distances
+
+
+@pytest.fixture
+def symbol_files(tmpdir):
+    tmpdir.join('utils.py').write('def helper(): pass\ndef other(): pass\n')
+    tmpdir.join('test_from.py').write('from utils import helper\n')
+    tmpdir.join('test_whole.py').write('import utils\n')
+    return dict((_, str(tmpdir.join(_ + '.py')))
+                for _ in ('utils', 'test_from', 'test_whole'))
+
+
+@pytest.mark.parametrize('root_module,changed_names,expected', [
+    ('test_from', {'other'}, False),
+    ('test_from', {'helper'}, True),
+    ('test_from', set(), False),
+    ('test_whole', {'other'}, True),
+    ('test_whole', set(), False),
+])
+def test_changed_symbols(symbol_files, root_module, changed_names, expected):
+    class _Skippy(Skippy):
+        @staticmethod
+        def convert_module_to_filename(module):
+            return symbol_files.get(module)
+
+    skippy = _Skippy(set(), changed_symbols={
+        symbol_files['utils']: changed_names})
+    assert skippy.should_run(root_module) is expected
+
+    if expected:
+        assert root_module in skippy.modules_to_run
+        assert 'utils' not in skippy.modules_to_run
+
+
+@pytest.mark.module_to_file({'foo': '/foo.py'})
+@pytest.mark.changed_symbols({'/foo.py': {'bar'}})
+@pytest.mark.fake_traversal({'/foo.py': set()})
+def test_root_module_with_changed_symbols_runs(skippy):
+    assert skippy.should_run('foo') is True
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py', 'C': 'c.py'})
+@pytest.mark.fake_traversal(
+    {'a.py': {'B', 'os', 'missing'}, 'b.py': {'A', 'C'}, 'c.py': set()})
+@pytest.mark.changed_files({'b.py'})
+def test_get_dependencies(skippy):
+    assert skippy.should_run('A') is True
+
+    # The traversal continues past the changed file, without traversing any
+    # file twice
+    assert skippy.get_dependencies('A') == {'a.py', 'b.py', 'c.py'}
+    assert skippy.get_dependencies('C') == {'c.py'}
+
+
+@pytest.mark.parametrize('kwargs,exceeded', [
+    ({'max_modules': 2}, 'limit of 2 modules visited'),
+    ({'max_files': 1}, 'limit of 1 files parsed'),
+    ({'time_limit': -1}, 'time limit of -1s'),
+])
+def test_budget(kwargs, exceeded):
+    budget = Budget(**kwargs)
+
+    with pytest.raises(BudgetExceeded):
+        for _ in range(3):
+            budget.visit_module()
+            budget.parse_file()
+
+    assert budget.exceeded == exceeded
+
+    # An exceeded budget can't be used anymore
+    with pytest.raises(BudgetExceeded):
+        budget.visit_module()
+
+
+def test_budget_wait():
+    event = threading.Event()
+    task = BackgroundTask(event.wait)
+
+    budget = Budget(time_limit=0.01)
+    with pytest.raises(BudgetExceeded):
+        budget.wait(task)
+    assert budget.exceeded == 'time limit of 0.01s'
+
+    event.set()
+    assert Budget().wait(task) is True
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py', 'C': 'c.py'})
+@pytest.mark.fake_traversal({'a.py': {'B'}, 'b.py': set(), 'c.py': set()})
+@pytest.mark.budget(max_files=2)
+def test_exceeded_budget_runs_tests(skippy):
+    assert skippy.should_run('A') is False
+    assert skippy.budget.exceeded is None
+
+    # The analysis stops once the budget is exceeded
+    assert skippy.should_run('C') is True
+    assert skippy.budget.exceeded == 'limit of 2 files parsed'
+    assert 'C' not in skippy.distances
+
+    with pytest.raises(BudgetExceeded):
+        skippy.get_dependencies('A')
+
+
+@pytest.mark.module_to_file(
+        {'A': 'a.py', 'fast': 'fast' + EXTENSION_SUFFIXES[0]})
+@pytest.mark.changed_files({'fast.pyx'})
+def test_changed_extension_source(skippy):
+    skippy.prepare_traversal = lambda filename: {'fast'}
+
+    assert skippy.should_run('A') is True
+    assert skippy.distances['A'] == 1
+
+
+def test_extension_module_is_not_parsed(skippy):
+    assert skippy.prepare_traversal(
+            '/missing/fast' + EXTENSION_SUFFIXES[0]) == set()
+
+
+class FakeImportGraph(dict):
+    def get(self, filename):
+        modules = dict.get(self, filename)
+        return None if modules is None else set(modules)
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py'})
+@pytest.mark.parametrize('changed_symbols,expected', [
+    (None, {'B'}),
+    # The names imported from files with changed symbols must be parsed
+    ({'b.py': {'x'}}, None),
+])
+def test_recorded_imports(changed_symbols, expected, skippy):
+    skippy.changed_symbols = changed_symbols or {}
+    skippy.import_graph = FakeImportGraph({'a.py': ['B'], 'b.py': []})
+
+    assert skippy.get_recorded_imports('a.py') == expected
+    assert skippy.get_recorded_imports('c.py') is None
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py'})
+def test_recorded_imports_are_not_parsed(skippy, monkeypatch):
+    skippy.import_graph = FakeImportGraph({'a.py': ['B'], 'b.py': []})
+    monkeypatch.setattr('pytest_skippy.parse.get_imported_modules',
+                        fail_on_call)
+
+    assert skippy.should_run('A') is False
+    assert skippy.confirmed_modules == {'B'}
+
+
+def test_resolver():
+    skippy = Skippy(set(), resolver={'A': '/a.py', 'B': ''}.get)
+
+    assert skippy.convert_module_to_filename('A') == '/a.py'
+    assert not skippy.convert_module_to_filename('B')
+
+    # Other modules are located on sys.path
+    assert skippy.convert_module_to_filename('pytest') == (
+            skippy.module_index.find('pytest'))
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py'})
+@pytest.mark.parametrize('changed_symbols,expected', [
+    (None, ({'B'}, {'B'})),
+    # The names imported from files with changed symbols must be parsed
+    ({'b.py': {'x'}}, None),
+])
+def test_provided_imports(changed_symbols, expected, skippy, monkeypatch):
+    skippy.changed_symbols = changed_symbols or {}
+    skippy.parser = {'a.py': (['B'], ['B']), 'b.py': ([], [])}.get
+
+    assert skippy.get_provided_imports('a.py') == expected
+    assert skippy.get_provided_imports('c.py') is None
+
+    if changed_symbols is None:
+        monkeypatch.setattr('pytest_skippy.parse.get_imported_modules',
+                            fail_on_call)
+        assert skippy.should_run('A') is False
+        assert skippy.confirmed_modules == {'B'}
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py'})
+@pytest.mark.fake_traversal({'a.py': {'os'}, 'b.py': {'A'}})
+@pytest.mark.changed_files({'a.py', 'changed.txt'})
+@pytest.mark.parametrize('filename,modules,expected,distance', [
+    ('changed.txt', set(), True, 0),
+    ('doc.txt', {'os', 'B'}, True, 2),
+    ('doc.txt', {'os'}, False, None),
+])
+def test_should_run_file(filename, modules, expected, distance, skippy):
+    skippy.embedded_imports[filename] = modules
+
+    assert skippy.should_run_file(filename) is expected
+    assert skippy.distances.get(filename) == distance
+
+
+def test_should_run_file_that_cant_be_parsed(skippy, tmpdir):
+    text = tmpdir.join('doc.txt')
+    text.write('>>> import (')
+    assert skippy.should_run_file(str(text)) is True
+
+
+class FakeReader(object):
+    def __init__(self):
+        self.prefetched = []
+        self.discarded = False
+
+    def prefetch(self, filenames):
+        self.prefetched.extend(filenames)
+
+    def discard(self):
+        self.discarded = True
+
+
+@pytest.mark.module_to_file(
+        {'A': 'a.py', 'B': 'b.py', 'C': 'c.py', 'D': 'd.py',
+         'fast': 'fast' + EXTENSION_SUFFIXES[0]})
+@pytest.mark.fake_traversal({
+    'a.py': {'B', 'C', 'os', 'fast', 'missing'}, 'b.py': {'D'},
+    'c.py': set(), 'd.py': set(), 'fast' + EXTENSION_SUFFIXES[0]: set(),
+})
+@pytest.mark.changed_files({'d.py'})
+def test_read_ahead(skippy):
+    skippy.reader = FakeReader()
+
+    assert skippy.should_run('A') is True
+
+    # The files of each discovered module are read ahead, except the files
+    # which aren't parsed (changed files, extension modules)
+    assert sorted(skippy.reader.prefetched) == ['b.py', 'c.py']
+    assert skippy.reader.discarded
+
+
+@pytest.mark.module_to_file({'A': 'a.py', 'B': 'b.py', 'C': 'c.py'})
+@pytest.mark.fake_traversal({'a.py': {'B', 'C'}})
+def test_read_ahead_early_return(skippy):
+    skippy.reader = SourceReader(1)
+    skippy.modules_to_run = {'B'}
+    try:
+        assert skippy.should_run('A') is True
+
+        # b.py and c.py were read ahead but the traversal stopped before
+        # parsing them
+        assert skippy.reader.pending == {}
+    finally:
+        skippy.reader.close()
+
+
+PACKAGE_FILES = {
+    'A': 'a.py', 'p': 'p/__init__.py', 'p.q': 'p/q/__init__.py',
+    'p.q.m': 'p/q/m.py', 'p.q.n': 'p/q/n.py', 'p.r': 'p/r.py',
+}
+
+
+@pytest.mark.module_to_file(PACKAGE_FILES)
+@pytest.mark.fake_traversal({
+    'a.py': {'p.q.m'}, 'p/q/m.py': {'p.q.n', 'p.r.attribute'},
+    'p/q/n.py': set(), 'p/r.py': set(),
+    'p/__init__.py': set(), 'p/q/__init__.py': set(),
+})
+@pytest.mark.parametrize('changed_files,expected,distance', [
+    (set(), False, None),
+    # The fake traversal fails if a package is traversed twice
+    ({'p/__init__.py'}, True, 1),
+    ({'p/q/__init__.py'}, True, 1),
+])
+def test_ancestor_packages(changed_files, expected, distance, skippy):
+    skippy.changed_files = changed_files
+
+    assert skippy.should_run('A') is expected
+    assert skippy.distances.get('A') == distance
+
+    # Modules are not packages
+    assert skippy.get_ancestors('p.r.attribute') == ('p',)
+    assert skippy.get_ancestors('p.q.m') == ('p', 'p.q')
+
+
+@pytest.mark.parametrize('changed_files,expected', [
+    (set(), False),
+    ({'p/__init__.py'}, True),
+    ({'p/q/__init__.py'}, True),
+    ({'p/q/n.py'}, True),
+])
+def test_ancestor_package_cycles(changed_files, expected):
+    imports = {
+        'a.py': ['p.q.m'], 'p/q/m.py': [],
+        # Packages commonly import their own submodules
+        'p/__init__.py': ['p.q.m'], 'p/q/__init__.py': ['p.q.n'],
+        'p/q/n.py': [],
+    }
+    skippy = Skippy(changed_files, resolver=PACKAGE_FILES.get,
+                    parser=lambda _: (imports[_], []))
+
+    assert skippy.should_run('A') is expected
+    assert skippy.get_dependencies('A') == {
+            'a.py', 'p/__init__.py', 'p/q/__init__.py', 'p/q/m.py',
+            'p/q/n.py'}
+    if not expected:
+        assert skippy.package_closures == {'p': False, 'p.q': False}
+
+
+def test_changed_symbols_of_ancestor_packages(tmpdir):
+    package = tmpdir.mkdir('pkg')
+    package.join('__init__.py').write('def helper():\n    pass\n')
+    package.join('sub.py').write('')
+    tmpdir.join('a.py').write('import pkg.sub\n\npkg.helper()\n')
+    files = {
+        'A': str(tmpdir.join('a.py')),
+        'pkg': str(package.join('__init__.py')),
+        'pkg.sub': str(package.join('sub.py')),
+    }
+
+    # import pkg.sub gives access to pkg.helper
+    skippy = Skippy(set(), changed_symbols={files['pkg']: {'helper'}},
+                    resolver=files.get)
+    assert skippy.should_run('A') is True
@@ -1,6 +1,10 @@
+import os
 import pytest
+import subprocess
 
-from pytest_skippy.git import detect_changed_files
+from pytest_skippy.git import (BlobReader, detect_changed_files,
+                               get_blob_ids, get_changed_hunks, get_commit,
+                               get_merge_base, read_file, read_files)
 
 
 @pytest.fixture()
@@ -36,3 +40,133 @@ def test_git_changes(test_repo, target_branch, base_branch, expected):
 
     # Verify that the changed files are 'hello.txt'
     assert changed_files == expected
+
+
+def test_merge_base(test_repo):
+    git_repo, commits = test_repo
+    merge_base = get_merge_base(
+            commits[0].hexsha, git_repo_dir=git_repo.workspace)
+    assert merge_base == commits[0].hexsha
+
+
+@pytest.mark.parametrize('commit,filename,expected', [
+    (0, 'hello_0.txt', b'hello world!'),
+    (0, 'hello_1.txt', None),
+    (-1, 'hello_1.txt', b'hello world!'),
+])
+def test_read_file(test_repo, commit, filename, expected):
+    git_repo, commits = test_repo
+    contents = read_file(
+            commits[commit].hexsha, filename,
+            git_repo_dir=git_repo.workspace)
+    assert contents == expected
+
+
+def test_blob_reader(test_repo):
+    git_repo, commits = test_repo
+    root = commits[0].hexsha
+
+    with BlobReader(git_repo.workspace) as reader:
+        contents = reader.read(['%s:hello_0.txt' % root,
+                                '%s:hello_1.txt' % root,
+                                'HEAD:hello_1.txt'])
+        assert contents == [b'hello world!', None, b'hello world!']
+
+        # The same process may be reused
+        assert reader.read(['HEAD:hello_2.txt']) == [b'hello world!']
+
+        # Enough requests to fill the pipes in both directions
+        names = ['HEAD:hello_%d.txt' % (_ % 3) for _ in range(5000)]
+        assert reader.read(names) == [b'hello world!'] * len(names)
+
+
+def test_blob_reader_outside_repo(tmpdir):
+    with BlobReader(str(tmpdir)) as reader:
+        with pytest.raises(subprocess.CalledProcessError):
+            reader.read(['HEAD:hello_0.txt'])
+
+
+def test_read_files(test_repo):
+    git_repo, commits = test_repo
+    contents = read_files(
+            commits[0].hexsha, ['hello_0.txt', 'hello_1.txt'],
+            git_repo_dir=git_repo.workspace)
+    assert contents == {'hello_0.txt': b'hello world!', 'hello_1.txt': None}
+
+    assert read_files('HEAD', [], git_repo_dir=git_repo.workspace) == {}
+
+
+def test_get_blob_ids(test_repo):
+    git_repo, commits = test_repo
+    path = git_repo.workspace
+
+    expected_sha = commits[-1].tree['hello_0.txt'].hexsha
+
+    # Modify a file in the working tree and add an untracked file
+    (path / 'hello_1.txt').write_text(u'goodbye')
+    (path / 'untracked.txt').write_text(u'hello world!')
+
+    blob_ids = get_blob_ids(str(path))
+
+    realpath = os.path.realpath(str(path))
+    assert blob_ids == {
+        os.path.join(realpath, 'hello_0.txt'): expected_sha,
+        os.path.join(realpath, 'hello_2.txt'): expected_sha,
+    }
+
+
+def test_get_commit(test_repo):
+    git_repo, commits = test_repo
+    assert get_commit(git_repo_dir=git_repo.workspace) == commits[-1].hexsha
+    assert get_commit('HEAD~2', git_repo_dir=git_repo.workspace) == (
+            commits[0].hexsha)
+
+
+def test_get_changed_hunks(test_repo):
+    git_repo, commits = test_repo
+    path = git_repo.workspace
+
+    (path / 'hello_0.txt').write_text(u'a\nb\nc\nd\n')
+    (path / 'hello_1.txt').write_text(u'-- a/removed\n')
+    git_repo.run('git add hello_0.txt hello_1.txt')
+    git_repo.api.index.commit('base')
+    base = git_repo.api.head.commit.hexsha
+
+    (path / 'hello_0.txt').write_text(u'a\nB\nc\ninserted\nd\n')
+    (path / 'added.txt').write_text(u'new\n')
+    (path / 'hello_1.txt').write_text(u'++ b/added\n')
+    git_repo.run('git add hello_0.txt hello_1.txt added.txt')
+    git_repo.run('git rm -q hello_2.txt')
+    git_repo.api.index.commit('changes')
+
+    assert get_changed_hunks(base, git_repo_dir=path) == {
+        # Line 2 changed, a line was inserted after line 3
+        'hello_0.txt': [(2, 1, 2, 1), (3, 0, 4, 1)],
+        'hello_2.txt': [(1, 1, 0, 0)],
+        'added.txt': [(0, 0, 1, 1)],
+        # Changed lines which look like file headers
+        'hello_1.txt': [(1, 1, 1, 1)],
+    }
+
+
+@pytest.mark.parametrize('config', [
+    'diff.noprefix true', 'diff.mnemonicPrefix true'])
+def test_get_changed_hunks_names(test_repo, config):
+    git_repo, commits = test_repo
+    path = git_repo.workspace
+    git_repo.run('git config %s' % config)
+
+    names = [u'with space.txt', u'tab\there.txt', u'quote".txt']
+    for name in names:
+        (path / name).write_text(u'a\n')
+    git_repo.api.index.add(names)
+    git_repo.api.index.commit('base')
+    base = git_repo.api.head.commit.hexsha
+
+    for name in names:
+        (path / name).write_text(u'b\n')
+    git_repo.api.index.add(names)
+    git_repo.api.index.commit('changes')
+
+    assert get_changed_hunks(base, git_repo_dir=path) == dict(
+            (_, [(1, 1, 1, 1)]) for _ in names)
@@ -0,0 +1,114 @@
+import sys
+
+import pytest
+
+from pytest_skippy.graph import ImportGraph, ImportRecorder
+
+
+@pytest.fixture
+def package(tmpdir, monkeypatch):
+    pkg = tmpdir.mkdir('recorded_pkg')
+    pkg.join('__init__.py').write('')
+    pkg.join('a.py').write(
+            'import os\n'
+            'from . import b\n'
+            'from .b import value\n'
+            'import importlib\n'
+            'importlib.import_module(".c", __package__)\n'
+            '\n'
+            'def unused():\n'
+            '    import recorded_pkg.d\n')
+    pkg.join('b.py').write('value = 1\n')
+    pkg.join('c.py').write('')
+    pkg.join('d.py').write('')
+
+    monkeypatch.syspath_prepend(str(tmpdir))
+    yield tmpdir
+
+    for name in list(sys.modules):
+        if name.startswith('recorded_pkg'):
+            del sys.modules[name]
+
+
+def test_import_recorder(package):
+    recorder = ImportRecorder(str(package))
+    recorder.start()
+    try:
+        import recorded_pkg.a  # noqa: F401
+    finally:
+        recorder.stop()
+
+    graph = recorder.get_graph()
+
+    # Only executed imports are recorded
+    assert graph == {
+        package.join('recorded_pkg', '__init__.py').relto(package): [],
+        package.join('recorded_pkg', 'a.py').relto(package): [
+            'importlib',
+            'os',
+            'recorded_pkg',
+            'recorded_pkg.b',
+            'recorded_pkg.c',
+        ],
+        package.join('recorded_pkg', 'b.py').relto(package): [],
+        package.join('recorded_pkg', 'c.py').relto(package): [],
+    }
+
+
+def test_import_recorder_preloaded(package):
+    import recorded_pkg.b  # noqa: F401
+
+    recorder = ImportRecorder(str(package))
+    recorder.start()
+    try:
+        import recorded_pkg.c  # noqa: F401
+    finally:
+        recorder.stop()
+
+    # Modules loaded before the recording are not part of the graph
+    assert sorted(recorder.get_graph()) == [
+            package.join('recorded_pkg', 'c.py').relto(package)]
+
+
+def test_import_recorder_failed_import(package):
+    package.join('recorded_pkg', 'optional.py').write(
+            'try:\n'
+            '    import recorded_pkg.missing\n'
+            'except ImportError:\n'
+            '    pass\n')
+
+    recorder = ImportRecorder(str(package))
+    recorder.start()
+    try:
+        import recorded_pkg.optional  # noqa: F401
+    finally:
+        recorder.stop()
+
+    # Failed imports are recorded, since the module may be added later
+    graph = recorder.get_graph()
+    assert graph[package.join('recorded_pkg', 'optional.py').relto(
+            package)] == ['recorded_pkg.missing']
+
+
+def test_import_graph(tmpdir):
+    ImportGraph.save(str(tmpdir), 'abcdef', {
+        'a.py': ['b', 'c'],
+        'b.py': [],
+        'c.py': ['os'],
+    })
+
+    root = tmpdir.mkdir('root')
+    import_graph = ImportGraph.load(str(tmpdir), 'abcdef', str(root),
+                                    stale_files={'c.py'})
+
+    assert import_graph.get(str(root.join('a.py'))) == {'b', 'c'}
+    assert import_graph.get(str(root.join('b.py'))) == set()
+
+    # Files which changed since the graph was recorded
+    assert import_graph.get(str(root.join('c.py'))) is None
+
+    # Files which were not recorded
+    assert import_graph.get(str(root.join('d.py'))) is None
+    assert import_graph.get(str(tmpdir.join('a.py'))) is None
+
+    assert ImportGraph.load(str(tmpdir), 'fedcba', str(root)) is None
@@ -1,4 +1,8 @@
+import os
 import tempfile
+import zipfile
+
+import pytest
 import pytest_skippy.imp as imp
 
 
@@ -48,3 +52,190 @@ def test_file_with_syntax_error():
         assert result == filename
     finally:
         os.unlink(f.name)
+
+
+def _make_tree(root, files):
+    for name, contents in files.items():
+        root.join(name).write(contents, ensure=True)
+
+
+def test_module_index_resolution(tmpdir):
+    first = tmpdir.join('first')
+    second = tmpdir.join('second')
+    _make_tree(first, {
+        'pkg/__init__.py': '',
+        'pkg/sub/__init__.py': '',
+        'pkg/sub/mod.py': '',
+        'pkg/mod.py': '',
+        'ns/inner.py': '',
+        'shadowed.py': '',
+        'both.py': '',
+        'both/__init__.py': '',
+    })
+    _make_tree(second, {
+        'shadowed.py': '',
+        'ns/other.py': '',
+        'only_second.py': '',
+    })
+
+    index = imp.ModuleIndex([str(first), str(second)])
+
+    def expected(path):
+        return os.path.realpath(str(path))
+
+    assert index.find('pkg') == expected(first.join('pkg/__init__.py'))
+    assert index.find('pkg.mod') == expected(first.join('pkg/mod.py'))
+    assert index.find('pkg.sub.mod') == expected(
+            first.join('pkg/sub/mod.py'))
+
+    # Earlier path entries take precedence
+    assert index.find('shadowed') == expected(first.join('shadowed.py'))
+    assert index.find('only_second') == expected(
+            second.join('only_second.py'))
+
+    # Packages take precedence over modules
+    assert index.find('both') == expected(first.join('both/__init__.py'))
+
+    # Namespace packages have no file but span all path entries
+    assert index.find('ns') is None
+    assert index.find('ns.inner') == expected(first.join('ns/inner.py'))
+    assert index.find('ns.other') == expected(second.join('ns/other.py'))
+
+    # Modules are not packages
+    assert index.find('shadowed.x') is None
+    assert index.find('missing') is None
+    assert index.find('.pkg') is None
+
+
+def test_module_index_is_attribute(tmpdir):
+    _make_tree(tmpdir, {
+        'pkg/__init__.py': 'value = 1\nfrom . import mod\n',
+        'pkg/sub/__init__.py': '',
+        'pkg/mod.py': '',
+        'ns/inner.py': '',
+        'ns/nested/mod.py': '',
+        'mod.py': 'def value(): pass\n',
+    })
+    archive = str(tmpdir.join('archive.zip'))
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('zipped/__init__.py', '')
+        f.writestr('zipped_mod.py', 'value = 1\n')
+
+    index = imp.ModuleIndex([str(tmpdir), archive])
+
+    # Submodules
+    assert index.is_attribute('pkg.mod') is False
+    assert index.is_attribute('pkg.sub') is False
+    assert index.is_attribute('ns.inner') is False
+    assert index.is_attribute('ns.nested') is False
+
+    # Names defined by the package which aren't in its directories
+    assert index.is_attribute('pkg.value') is True
+
+    # Modules have no submodules
+    assert index.is_attribute('mod.value') is True
+
+    # Names which aren't defined (such as deleted submodules) and namespace
+    # packages
+    assert index.is_attribute('pkg.missing') is False
+    assert index.is_attribute('mod.missing') is False
+    assert index.is_attribute('ns.value') is False
+
+    # Undetermined
+    assert index.is_attribute('zipped.value') is False
+    assert index.is_attribute('zipped_mod.value') is False
+    assert index.is_attribute('missing.value') is False
+    assert index.is_attribute('pkg') is False
+    assert index.is_attribute('.pkg.value') is False
+
+
+@pytest.mark.parametrize('init', [
+    "__path__ = __import__('pkgutil').extend_path(__path__, __name__)\n",
+    "__import__('pkg_resources').declare_namespace(__name__)\n",
+])
+def test_module_index_legacy_namespace(tmpdir, init):
+    first = tmpdir.join('first')
+    second = tmpdir.join('second')
+    _make_tree(first, {'nspkg/__init__.py': init + 'value = 1\n',
+                       'nspkg/foo.py': '', 'regular/__init__.py': 'other = 1'})
+    _make_tree(second, {'nspkg/__init__.py': init, 'nspkg/bar.py': '',
+                        'regular/other.py': ''})
+
+    index = imp.ModuleIndex([str(first), str(second)])
+
+    # The package spans the directories of every path entry
+    assert index.find('nspkg') == os.path.realpath(
+            str(first.join('nspkg/__init__.py')))
+    assert index.find('nspkg.bar') == os.path.realpath(
+            str(second.join('nspkg/bar.py')))
+    assert index.is_attribute('nspkg.bar') is False
+    assert index.is_attribute('nspkg.value') is True
+
+    # Regular packages don't
+    assert index.find('regular.other') is None
+    assert index.is_attribute('regular.other') is True
+
+
+def test_module_index_lists_directories_once(tmpdir, monkeypatch):
+    _make_tree(tmpdir, {'a.py': '', 'pkg/__init__.py': '', 'pkg/b.py': ''})
+
+    listed = []
+    listdir = os.listdir
+
+    def _listdir(path):
+        listed.append(path)
+        return listdir(path)
+
+    monkeypatch.setattr(os, 'listdir', _listdir)
+
+    index = imp.ModuleIndex([str(tmpdir)])
+    for _ in range(3):
+        for name in ('a', 'pkg', 'pkg.b', 'pkg.c', 'c'):
+            index.find(name)
+
+    assert sorted(listed) == sorted(set(listed))
+
+
+def test_module_index_archive(tmpdir):
+    archive = str(tmpdir.join('archive.zip'))
+    with zipfile.ZipFile(archive, 'w') as f:
+        f.writestr('zipped_module.py', '')
+
+    index = imp.ModuleIndex([archive])
+    result = index.find('zipped_module')
+    assert result == os.path.join(os.path.realpath(archive),
+                                  'zipped_module.py')
+
+
+def test_module_index_resolutions(tmpdir):
+    root = tmpdir.join('root')
+    site_packages = tmpdir.join('site-packages')
+    _make_tree(root, {'first.py': '', 'local/__init__.py': ''})
+    _make_tree(site_packages, {
+        'third/__init__.py': '',
+        'third/sub.py': '',
+        'other.py': '',
+    })
+    path = [str(root), str(site_packages)]
+
+    index = imp.ModuleIndex(path)
+    for name in ('first', 'local', 'local.x', 'third.sub', 'other', 'gone'):
+        index.find(name)
+
+    # Only modules located outside of the root directory are exported
+    resolutions = index.get_resolutions(str(root))
+    assert sorted(resolutions) == ['gone', 'other', 'third', 'third.sub']
+    assert resolutions['third.sub'] == (
+            os.path.realpath(str(site_packages.join('third/sub.py'))), None)
+
+    # A first party module added since the export shadows the resolution
+    root.join('other.py').write('')
+    site_packages.join('third/sub.py').remove()
+
+    index = imp.ModuleIndex(path)
+    index.add_resolutions(resolutions, str(root))
+    assert index.find('other') == os.path.realpath(str(root.join('other.py')))
+
+    # The other resolutions are reused without touching the filesystem
+    assert index.find('third.sub') == resolutions['third.sub'][0]
+    assert index.find('gone') is None
@@ -0,0 +1,168 @@
+import sys
+
+import pytest
+
+import pytest_skippy.linecoverage as linecoverage
+from pytest_skippy.linecoverage import CoverageDB, LineTracer
+
+SOURCE = b'''import os
+
+CONSTANT = 1
+
+
+def first():
+    value = CONSTANT
+    return (value +
+            1)
+
+
+def second():
+    def inner():
+        return 2
+
+    return inner()
+
+
+def called_on_import():
+    return 3
+
+
+RESULT = called_on_import()
+'''
+
+
+@pytest.fixture
+def coverage_db():
+    return CoverageDB(['test_first', 'test_second', 'test_both'], {
+        'mod.py': {1, 3, 6, 12, 19, 20, 23},
+    }, {
+        'mod.py': {7: [0, 2], 8: [0, 2], 13: [1, 2], 16: [1, 2], 14: [1]},
+    })
+
+
+@pytest.mark.parametrize('hunks,expected', [
+    # No changes
+    ([], set()),
+    # Line granularity within a function body
+    ([(7, 1, 7, 1)], {'test_first', 'test_both'}),
+    # Removed lines
+    ([(7, 1, 6, 0)], {'test_first', 'test_both'}),
+    # Lines which are not executed (continuation lines) map to the function
+    ([(9, 1, 9, 1)], {'test_first', 'test_both'}),
+    # Lines inserted into a function body
+    ([(15, 0, 16, 1)], {'test_second', 'test_both'}),
+    # The innermost function is used
+    ([(14, 1, 14, 1)], {'test_second'}),
+    ([(7, 1, 7, 1), (14, 1, 14, 1)],
+     {'test_first', 'test_second', 'test_both'}),
+    # Module level code
+    ([(3, 1, 3, 1)], None),
+    ([(6, 1, 6, 1)], None),
+    ([(7, 1, 7, 1), (3, 1, 3, 1)], None),
+    # Lines inserted outside of a function body
+    ([(10, 0, 11, 1)], None),
+    ([(0, 0, 1, 1)], None),
+    # A function executed during an import
+    ([(20, 1, 20, 1)], None),
+    # Lines replaced by code outside of a function body
+    ([(8, 1, 8, 3)], None),
+])
+def test_select_tests(coverage_db, hunks, expected):
+    tests = coverage_db.select_tests('mod.py', SOURCE, SOURCE, hunks)
+    assert tests == expected
+
+
+def test_select_tests_not_executed(coverage_db):
+    assert coverage_db.select_tests(
+        'other.py', SOURCE, SOURCE, [(7, 1, 7, 1)]) is None
+    assert coverage_db.select_tests(
+        'mod.py', b'def (', SOURCE, [(7, 1, 7, 1)]) is None
+
+
+def test_coverage_db_storage(tmpdir, coverage_db):
+    coverage_db.add_test('test_new', {'mod.py': {7}, 'other.py': {1}})
+    coverage_db.save(str(tmpdir), 'abcdef')
+
+    loaded = CoverageDB.load(str(tmpdir), 'abcdef')
+    assert loaded.tests == coverage_db.tests
+    assert loaded.global_lines == coverage_db.global_lines
+    assert loaded.lines == {
+        'mod.py': {7: [0, 2, 3], 8: [0, 2], 13: [1, 2], 16: [1, 2], 14: [1]},
+        'other.py': {1: [3]},
+    }
+
+    assert CoverageDB.load(str(tmpdir), 'fedcba') is None
+
+
+def test_line_tracer(tmpdir, monkeypatch):
+    tmpdir.join('traced_mod.py').write(SOURCE)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    tracer = LineTracer(str(tmpdir))
+    tracer.start()
+    try:
+        import traced_mod
+        test_lines = tracer.set_test()
+        traced_mod.first()
+        tracer.clear_test()
+    finally:
+        tracer.stop()
+        del sys.modules['traced_mod']
+
+    # Lines executed during the import are global
+    assert tracer.global_lines == {'traced_mod.py': {1, 3, 6, 12, 19, 20, 23}}
+    # Continuation lines may be traced, depending on the python version
+    assert list(test_lines) == ['traced_mod.py']
+    assert {7, 8} <= test_lines['traced_mod.py'] <= {7, 8, 9}
+
+
+def test_line_tracer_shared_code(tmpdir, monkeypatch):
+    tmpdir.join('traced_mod.py').write(SOURCE)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    tracer = LineTracer(str(tmpdir))
+    tracer.start()
+    try:
+        import traced_mod
+        tracer.add_shared_code(traced_mod.first)
+        tracer.global_lines.clear()
+        test_lines = tracer.set_test()
+        traced_mod.first()
+        tracer.clear_test()
+    finally:
+        tracer.stop()
+        del sys.modules['traced_mod']
+
+    # Lines executed by shared setup code are global
+    assert test_lines == {}
+    assert {7, 8} <= tracer.global_lines['traced_mod.py']
+
+
+def test_line_tracer_walks_to_traced_frames(tmpdir, monkeypatch):
+    tmpdir.join('traced_mod.py').write(SOURCE)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    checked = []
+    is_shared_code = linecoverage._is_shared_code
+
+    def _is_shared_code(frame, shared_code):
+        checked.append(frame.f_code.co_name)
+        return is_shared_code(frame, shared_code)
+
+    monkeypatch.setattr(linecoverage, '_is_shared_code', _is_shared_code)
+
+    tracer = LineTracer(str(tmpdir))
+    tracer.start()
+    try:
+        import traced_mod
+        tracer.set_test()
+        del checked[:]
+        traced_mod.second()
+        tracer.clear_test()
+    finally:
+        tracer.stop()
+        del sys.modules['traced_mod']
+
+    # The callers of second() are walked, but inner() stops at second()
+    assert checked[0] == 'second' and len(checked) > 2
+    assert checked[checked.index('inner'):] == ['inner']
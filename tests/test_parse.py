@@ -1,8 +1,14 @@
+import ast
+import json
 import os
 import pytest
 import shutil
 import tempfile as _tempfile
-from pytest_skippy.parse import get_imported_modules
+from pytest_skippy.parse import (LOCAL, OPTIONAL, RUNTIME, TYPE_CHECKING,
+                                 ImportVisitor, PackageResolver,
+                                 get_changed_definitions,
+                                 get_embedded_imports, get_imported_modules,
+                                 get_imported_symbols)
 
 
 @pytest.fixture()
@@ -197,3 +203,309 @@ from . import bar
     expected_confirmed = {pkg_name, pkg_name+'.'+subpkg_name}
     assert confirmed == expected_confirmed
     assert modules == expected_confirmed | {pkg_name+'.'+subpkg_name+'.bar'}
+
+
+def test_package_resolver(tmpdir):
+    root = str(tmpdir)
+    resolver = PackageResolver([root])
+
+    deep = os.path.join(root, 'a', 'b', 'c')
+    assert resolver.resolve(deep) == ('a', 'b', 'c')
+    assert resolver.resolve(os.path.join(root, 'a')) == ('a',)
+
+    # Parent directories are cached when resolving a subdirectory
+    assert os.path.join(root, 'a', 'b') in resolver._prefixes
+
+    # Directories outside of the path are treated as top level packages
+    outside = os.path.join(os.path.dirname(root), 'elsewhere', 'pkg')
+    assert resolver.resolve(outside) == ('pkg',)
+
+
+def test_shared_package_resolver(monkeypatch, tmpdir):
+    resolver = PackageResolver.for_sys_path()
+    assert PackageResolver.for_sys_path() is resolver
+
+    monkeypatch.syspath_prepend(str(tmpdir))
+    updated = PackageResolver.for_sys_path()
+    assert updated is not resolver
+    assert os.path.abspath(str(tmpdir)) in updated.roots
+
+
+def test_imported_symbols(tempfile):
+    tempfile(b'''
+import foo
+from foo import bar
+from baz import x, y
+from qux import *
+''')
+    modules, confirmed, names = get_imported_symbols(tempfile.name)
+
+    assert modules == {'foo', 'foo.bar', 'baz', 'baz.x', 'baz.y', 'qux',
+                       'qux.*'}
+    assert confirmed == {'foo', 'baz', 'qux'}
+    assert names == {'foo': None, 'baz': {'x', 'y'}, 'qux': None}
+
+
+def test_imported_symbols_of_ancestors(tempfile):
+    tempfile(b'''
+import a.b.c
+import d.e as f
+from g import h
+''')
+    modules, _, names = get_imported_symbols(tempfile.name)
+
+    # import a.b.c binds a, giving access to a and a.b
+    assert names == {'a': None, 'a.b': None, 'a.b.c': None, 'd.e': None,
+                     'g': {'h'}}
+    assert modules == {'a.b.c', 'd.e', 'g', 'g.h'}
+
+
+@pytest.mark.parametrize('old,new,expected', [
+    # Unchanged definitions
+    (b'def a(): pass', b'def a():\n    pass  # comment', set()),
+    # Changed, added and removed definitions
+    (b'def a(): pass\ndef b(): pass', b'def a(): return 1\nc = 1',
+     {'a', 'b', 'c'}),
+    # Imports are definitions and propagate to definitions using them
+    (b'import os\ndef a(): os\ndef b(): pass',
+     b'import sys as os\ndef a(): os\ndef b(): pass',
+     {'os', 'a'}),
+    # Propagation is transitive
+    (b'x = 1\ny = x\nz = y\nw = 0', b'x = 2\ny = x\nz = y\nw = 0',
+     {'x', 'y', 'z'}),
+    # Docstrings are not part of a definition
+    (b'"""Old"""\ndef a():\n    """Old"""', b'def a():\n    """New"""', set()),
+    # Unless they contain doctests
+    (b'def a():\n    """>>> a()"""', b'def a():\n    """>>> a(1)"""', {'a'}),
+    (b'""">>> 1"""\ndef a(): pass', b'""">>> 2"""\ndef a(): pass', None),
+    # Module level code changes the whole module
+    (b'def a(): pass\na()', b'def a(): pass\na(); a()', None),
+    # Module level code using a changed name changes the whole module
+    (b'def a(): pass\na()', b'def a(): return 1\na()', None),
+    # Unparseable source changes the whole module
+    (b'def a(): pass', b'def a(:', None),
+])
+def test_changed_definitions(old, new, expected):
+    assert get_changed_definitions(old, new) == expected
+
+
+class FakeCache(dict):
+    def get(self, filename):
+        return dict.get(self, filename)
+
+    def set(self, filename, statements):
+        self[filename] = statements
+
+
+def test_cached_statements_match_source(tempfile):
+    tempfile(b'''
+import foo, bar.baz
+from qux import x, y
+from . import z
+from .. import w
+
+def inner():
+    from qux import v
+
+if TYPE_CHECKING:
+    import typed
+''')
+    expected = get_imported_symbols(tempfile.name,
+                                    ignored_kinds={TYPE_CHECKING})
+
+    cache = FakeCache()
+    assert get_imported_symbols(tempfile.name, cache=cache,
+                                ignored_kinds={TYPE_CHECKING}) == expected
+    assert len(cache[tempfile.name]) == 7
+
+    # The file is not read when the statements are cached
+    os.unlink(tempfile.name)
+    assert get_imported_symbols(tempfile.name, cache=cache,
+                                ignored_kinds={TYPE_CHECKING}) == expected
+
+    # Recreate the file for the fixture's cleanup
+    with open(tempfile.name, 'w'):
+        pass
+
+
+def test_import_kinds():
+    source = b'''
+import a
+from typing import TYPE_CHECKING
+
+try:
+    import b
+except ImportError:
+    import c
+else:
+    import d
+
+try:
+    import e
+except ValueError:
+    pass
+
+if TYPE_CHECKING:
+    import f
+
+    def g():
+        import h
+else:
+    import i
+
+if typing.TYPE_CHECKING:
+    import j
+
+class K(object):
+    import k
+
+    def l(self):
+        import m
+
+        try:
+            import n
+        except (KeyError, ModuleNotFoundError):
+            pass
+'''
+    visitor = ImportVisitor('mod.py')
+    visitor.visit(ast.parse(source))
+
+    assert visitor.kinds == {
+        'a': {RUNTIME},
+        'typing': {RUNTIME},
+        'b': {OPTIONAL},
+        'c': {OPTIONAL},
+        'd': {RUNTIME},
+        'e': {RUNTIME},
+        'f': {TYPE_CHECKING},
+        'h': {TYPE_CHECKING},
+        'i': {RUNTIME},
+        'j': {TYPE_CHECKING},
+        'k': {RUNTIME},
+        'm': {LOCAL},
+        'n': {OPTIONAL},
+    }
+
+
+def test_ignored_kinds(tempfile):
+    tempfile(b'''
+from typing import TYPE_CHECKING
+try:
+    import fast
+except ImportError:
+    import slow
+
+if TYPE_CHECKING:
+    from typed import T
+    import fast
+''')
+    modules, confirmed = get_imported_modules(
+            tempfile.name, ignored_kinds={TYPE_CHECKING})
+
+    assert modules == {'typing', 'typing.TYPE_CHECKING', 'fast', 'slow'}
+
+    # Optional imports may not exist
+    assert confirmed == {'typing'}
+
+
+def test_embedded_imports_of_notebook(tmpdir):
+    notebook = tmpdir.join('example.ipynb')
+    notebook.write(json.dumps({'cells': [
+        {'cell_type': 'markdown', 'source': ['import ignored']},
+        {'cell_type': 'code', 'source': [
+            '%matplotlib inline\n',
+            '!pip install foo\n',
+            'import foo\n',
+            'from bar import baz\n',
+        ]},
+        {'cell_type': 'code', 'source': 'def f():\n    import qux'},
+    ]}))
+
+    modules, confirmed = get_embedded_imports(str(notebook))
+    assert modules == {'foo', 'bar', 'bar.baz', 'qux'}
+    assert confirmed == {'foo', 'bar', 'qux'}
+
+
+def test_embedded_imports_of_doctest(tmpdir):
+    text = tmpdir.join('example.txt')
+    text.write('''
+Example
+=======
+
+>>> from foo import bar
+>>> def f():
+...     import qux
+>>> import printer
+is output, not code
+''')
+
+    modules, _ = get_embedded_imports(str(text))
+    assert modules == {'foo', 'foo.bar', 'qux', 'printer'}
+
+    text.write('>>> import (')
+    with pytest.raises(SyntaxError):
+        get_embedded_imports(str(text))
+
+
+def test_source_encoding(tempfile):
+    # The encoding declared by the file is used (not the locale encoding)
+    tempfile(u'''# -*- coding: latin-1 -*-
+NAME = "\xe9t\xe9"
+import foo
+'''.encode('latin-1'))
+
+    modules, _ = get_imported_modules(tempfile.name)
+    assert modules == {'foo'}
+
+
+def test_dynamic_imports():
+    source = b'''
+import importlib
+from importlib import import_module
+
+importlib.import_module('a.b')
+import_module('c')
+__import__('d.e', fromlist=['f'])
+
+def load(name):
+    import_module(name)
+    import_module('.relative', __name__)
+    return import_module('g')
+
+pytest_plugins = 'h.plugin'
+INSTALLED_APPS = ['i', 'j.apps.JConfig', 'not a module', name]
+INSTALLED_APPS += ('k.l',)
+OTHER = ['m']
+'''
+    visitor = ImportVisitor('/root/mod.py',
+                            module_settings={'pytest_plugins',
+                                             'INSTALLED_APPS'})
+    visitor.visit(ast.parse(source))
+
+    assert visitor.imports == {
+        'importlib': {'import_module'},
+        'a.b': None,
+        'c': None,
+        'd.e': None,
+        'g': None,
+        'h': {'plugin'},
+        'i': None,
+        'j.apps': {'JConfig'},
+        'k': {'l'},
+    }
+    assert visitor.kinds['g'] == {LOCAL}
+
+    # Dynamic imports are cached like import statements
+    replayed = ImportVisitor('/root/mod.py')
+    replayed.visit_imports(visitor.statements)
+    assert replayed.imports == visitor.imports
+
+
+def test_default_module_settings():
+    visitor = ImportVisitor('/root/mod.py')
+    visitor.visit(ast.parse(b'''
+pytest_plugins = ['a.plugin']
+INSTALLED_APPS = ['b']
+'''))
+
+    assert visitor.imports == {'a': {'plugin'}}
@@ -1,6 +1,11 @@
 """Integration Tests"""
+import json
+import time
+
 import git
 
+from pytest_skippy.imp import EXTENSION_SUFFIXES
+
 
 def test_plugin(testdir):
     repo = git.Repo.init(testdir.tmpdir)
@@ -25,13 +30,13 @@ def test_plugin(testdir):
             "--skippy", "--skippy-target-branch", "master")
     result.assert_outcomes(skipped=1)
 
-    # In safe mode, it should run since a from import is used to import the
-    # function
+    # In safe mode, it's also skipped since core is a module (not a package)
+    # so the function it imports can't be a submodule
     result = testdir.runpytest(
             "--skippy",
             "--skippy-target-branch", "master",
             "--skippy-safe")
-    result.assert_outcomes(passed=1)
+    result.assert_outcomes(skipped=1)
 
     # Change an imported file
     f_core = testdir.makepyfile(core="""
@@ -49,6 +54,324 @@ def test_plugin(testdir):
             "--skippy-target-branch", "master")
     result.assert_outcomes(passed=1)
 
+    # Reading the files ahead doesn't change the result
+    result = testdir.runpytest(
+            "--skippy",
+            "--skippy-target-branch", "master",
+            "--skippy-read-ahead", "2")
+    result.assert_outcomes(passed=1)
+
+    # The change is only a comment, which is not semantic
+    result = testdir.runpytest(
+            "--skippy",
+            "--skippy-target-branch", "master",
+            "--skippy-semantic")
+    result.assert_outcomes(skipped=1)
+
+
+def test_safe_mode_deleted_submodule(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    pkg = testdir.mkpydir('pkg')
+    pkg.join('bar.py').write('def run():\n    pass\n')
+    testdir.makepyfile(test_bar="""
+    def test_bar():
+        from pkg import bar
+        bar.run()
+    """)
+
+    repo.index.add([str(pkg.join('__init__.py')), str(pkg.join('bar.py')),
+                    str(testdir.tmpdir.join('test_bar.py'))])
+    repo.index.commit("Initial commit.")
+
+    repo.git.checkout('HEAD', b="delete-bar")
+    repo.index.remove([str(pkg.join('bar.py'))], working_tree=True)
+    repo.index.commit("Delete bar.")
+
+    # bar is not defined by pkg/__init__.py, so it may be the deleted
+    # submodule
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master", "--skippy-safe")
+    result.assert_outcomes(failed=1)
+
+
+def test_order_by_proximity(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(core="""
+    def run():
+        pass
+    """, helper="""
+    from core import run
+    """, test_far="""
+    import helper
+
+    def test_far():
+        helper.run()
+    """, test_near="""
+    import core
+
+    def test_near():
+        core.run()
+    """, test_other="""
+    def test_other():
+        assert False
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    # test_other failed on the last run
+    testdir.runpytest().assert_outcomes(passed=2, failed=1)
+
+    testdir.makepyfile(core="""
+    def run():
+        return True
+    """)
+    repo.git.checkout('HEAD', b="modify")
+    repo.index.add([str(testdir.tmpdir.join('core.py'))])
+    repo.index.commit("Modify core.")
+
+    # The test closest to the change runs first, and skipped tests (even
+    # those which failed last) come after the tests which run
+    result = testdir.runpytest(
+            "-v",
+            "--skippy",
+            "--skippy-target-branch", "master",
+            "--skippy-order")
+    result.assert_outcomes(passed=2, skipped=1)
+    result.stdout.fnmatch_lines([
+        "*test_near.py::test_near PASSED*",
+        "*test_far.py::test_far PASSED*",
+        "*test_other.py::test_other SKIPPED*",
+    ])
+
+
+def test_changed_symbols(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    f_core = testdir.makepyfile(core="""
+    def run():
+        pass
+
+    def other():
+        pass
+    """)
+
+    f_test = testdir.makepyfile("""
+    from core import run
+
+    def test_simple():
+        run()
+    """)
+
+    repo.index.add([str(f_test), str(f_core)])
+    repo.index.commit("Initial commit.")
+
+    # Change a function that isn't imported by the test
+    f_core = testdir.makepyfile(core="""
+    def run():
+        pass
+
+    def other():
+        return True
+    """)
+    repo.git.checkout('HEAD', b="modify")
+    repo.index.add([str(f_core)])
+    repo.index.commit("Modify core.")
+
+    # The file has changed, so the test runs by default
+    result = testdir.runpytest(
+            "--skippy",
+            "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1)
+
+    # The imported function has not changed
+    result = testdir.runpytest(
+            "--skippy",
+            "--skippy-target-branch", "master",
+            "--skippy-symbols")
+    result.assert_outcomes(skipped=1)
+
+
+def test_non_python_changes(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makeini("""
+    [pytest]
+    skippy_mapping =
+        *.json = test_data.py
+        *.cfg = *
+    """)
+    testdir.makeconftest("")
+    testdir.makepyfile(test_data="""
+    def test_data():
+        pass
+    """, test_other="""
+    def test_other():
+        pass
+    """)
+    data = testdir.tmpdir.join('data.json')
+    data.write('{}')
+    cfg = testdir.tmpdir.join('setup.cfg')
+    cfg.write('')
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir()
+                    if _.isfile()])
+    repo.index.commit("Initial commit.")
+    repo.git.checkout('HEAD', b="modify")
+
+    def run_after_change(changed):
+        changed.write(changed.read() + '\n')
+        repo.index.add([str(changed)])
+        repo.index.commit("Modify %s" % changed.basename)
+        result = testdir.runpytest(
+                "--skippy",
+                "--skippy-target-branch", "master")
+        repo.git.reset('--hard', 'master')
+        return result
+
+    # Only the mapped test runs
+    result = run_after_change(data)
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["test_data.py .*"])
+
+    # Every test runs
+    run_after_change(cfg).assert_outcomes(passed=2)
+
+    # A conftest affects all tests in its directory
+    run_after_change(
+            testdir.tmpdir.join('conftest.py')).assert_outcomes(passed=2)
+
+
+def test_invalid_mapping(testdir):
+    testdir.makeini("""
+    [pytest]
+    skippy_mapping =
+        *.json
+    """)
+    testdir.makepyfile("""
+    def test_simple():
+        pass
+    """)
+    git.Repo.init(testdir.tmpdir)
+
+    result = testdir.runpytest(
+            "--skippy",
+            "--skippy-target-branch", "master")
+    assert result.ret != 0
+    result.stderr.fnmatch_lines(["*Invalid skippy mapping*"])
+
+
+def test_parse_cache(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    f_core = testdir.makepyfile(core="""
+    def run():
+        pass
+    """)
+    f_test = testdir.makepyfile("""
+    from core import run
+
+    def test_simple():
+        run()
+    """)
+
+    repo.index.add([str(f_test), str(f_core)])
+    repo.index.commit("Initial commit.")
+
+    cache_dir = testdir.tmpdir.join('.skippy-cache')
+    for _ in range(2):
+        result = testdir.runpytest(
+                "--skippy",
+                "--skippy-target-branch", "master",
+                "--skippy-cache-dir", str(cache_dir))
+        result.assert_outcomes(skipped=1)
+
+    # Both tracked files have cache entries
+    entries = cache_dir.visit('*.json')
+    assert len(list(entries)) == 2
+
+
+def test_resolution_cache(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    f_test = testdir.makepyfile("""
+    try:
+        import not_installed
+    except ImportError:
+        not_installed = None
+
+    def test_simple():
+        pass
+    """)
+
+    repo.index.add([str(f_test)])
+    repo.index.commit("Initial commit.")
+
+    cache_dir = testdir.tmpdir.join('.skippy-cache')
+    for _ in range(2):
+        result = testdir.runpytest(
+                "--skippy",
+                "--skippy-target-branch", "master",
+                "--skippy-cache-dir", str(cache_dir))
+        result.assert_outcomes(skipped=1)
+
+    # External modules are resolved once per environment
+    entries = list(cache_dir.join('resolution-v1').visit('*.json'))
+    assert len(entries) == 1
+    assert json.loads(entries[0].read()) == {
+            'not_installed': [None, None]}
+
+
+def test_result_cache(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    f_core = testdir.makepyfile(core="""
+    def run():
+        return True
+    """)
+    f_test = testdir.makepyfile("""
+    from core import run
+
+    def test_simple():
+        assert run()
+    """)
+
+    repo.index.add([str(f_test), str(f_core)])
+    repo.index.commit("Initial commit.")
+    repo.git.checkout('HEAD', b="modify")
+
+    def run_after_change(source):
+        f_core = testdir.makepyfile(core=source)
+        repo.index.add([str(f_core)])
+        repo.index.commit("Modify core.")
+        return testdir.runpytest(
+                "-rs",
+                "--skippy",
+                "--skippy-target-branch", "master",
+                "--skippy-results")
+
+    # The changed test runs the first time
+    change = """
+    def run():
+        return 1
+    """
+    run_after_change(change).assert_outcomes(passed=1)
+
+    # The dependencies haven't changed since the test passed
+    result = run_after_change(change)
+    result.assert_outcomes(skipped=1)
+    result.stdout.fnmatch_lines(["*passed previously*"])
+
+    # A failing test is not recorded
+    change = """
+    def run():
+        return 0
+    """
+    run_after_change(change).assert_outcomes(failed=1)
+    run_after_change(change).assert_outcomes(failed=1)
+
 
 def test_no_git_repo(testdir):
     testdir.makepyfile("""
@@ -61,3 +384,638 @@ def test_no_git_repo(testdir):
             "--skippy",
             "--skippy-target-branch", "master")
     result.assert_outcomes(passed=1)
+
+
+def test_ignore_type_checking(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(models="""
+    class Run(object):
+        pass
+    """, test_typed="""
+    from typing import TYPE_CHECKING
+
+    if TYPE_CHECKING:
+        from models import Run
+
+    def test_typed():
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    repo.git.checkout('HEAD', b="modify")
+    f_models = testdir.makepyfile(models="""
+    class Run(object):
+        value = 1
+    """)
+    repo.index.add([str(f_models)])
+    repo.index.commit("Modify models.")
+
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1)
+
+    # Type checking imports are never executed
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master",
+            "--skippy-ignore-type-checking")
+    result.assert_outcomes(skipped=1)
+
+
+def test_extension_sources(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    extension = testdir.tmpdir.join('fast' + EXTENSION_SUFFIXES[0])
+    extension.write_binary(b'\0')
+    source = testdir.tmpdir.join('fast.pyx')
+    source.write('def run():\n    pass\n')
+    header = testdir.tmpdir.mkdir('include').join('fast.h')
+    header.write('')
+
+    f_test = testdir.makepyfile("""
+    def load():
+        import fast
+
+    def test_ext():
+        pass
+    """)
+
+    repo.index.add([str(extension), str(source), str(header), str(f_test)])
+    repo.index.commit("Initial commit.")
+    repo.git.checkout('HEAD', b="modify")
+
+    def run_after_change(changed):
+        changed.write('// changed\n', mode='a')
+        repo.index.add([str(changed)])
+        repo.index.commit("Modify %s." % changed.basename)
+        return testdir.runpytest(
+                "--skippy", "--skippy-target-branch", "master")
+
+    # Sources next to the extension module are found by convention
+    run_after_change(source).assert_outcomes(passed=1)
+
+    repo.git.checkout('master', b="modify-header")
+    run_after_change(header).assert_outcomes(skipped=1)
+
+    # Other sources are mapped to the extension module
+    testdir.makeini("""
+    [pytest]
+    skippy_extension_mapping =
+        include/*.h = fast
+    """)
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1)
+
+
+def test_recorded_import_graph(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(core="""
+    def run():
+        pass
+    """, helper="""
+    def unused():
+        import core
+    """, test_helper="""
+    import helper
+
+    def test_helper():
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    # Recording requires a full run
+    result = testdir.runpytest("--skippy", "--skippy-record")
+    result.stderr.fnmatch_lines(["*requires a full run*"])
+
+    result = testdir.runpytest("--skippy-record")
+    result.assert_outcomes(passed=1)
+
+    repo.git.checkout('HEAD', b="modify")
+    f_core = testdir.makepyfile(core="""
+    def run():
+        return 1
+    """)
+    repo.index.add([str(f_core)])
+    repo.index.commit("Modify core.")
+
+    # The import of core was never executed
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(skipped=1)
+
+    # Files changed since the recording are parsed
+    f_helper = testdir.makepyfile(helper="""
+    import core
+    """)
+    repo.index.add([str(f_helper)])
+    repo.index.commit("Modify helper.")
+
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1)
+
+
+def test_recorded_failed_import(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(helper="""
+    try:
+        import optional
+    except ImportError:
+        optional = None
+    """, test_helper="""
+    import helper
+
+    def test_helper():
+        assert helper.optional is None
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    result = testdir.runpytest("--skippy-record")
+    result.assert_outcomes(passed=1)
+
+    repo.git.checkout('HEAD', b="add-optional")
+    f_optional = testdir.makepyfile(optional="")
+    repo.index.add([str(f_optional)])
+    repo.index.commit("Add optional.")
+
+    # The failed import is part of the recorded graph
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(failed=1)
+
+
+def test_coverage_selection(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(core="""
+    def first():
+        return 1
+
+
+    def second():
+        return 2
+    """, test_first="""
+    import core
+
+    def test_first():
+        assert core.first()
+    """, test_second="""
+    import core
+
+    def test_second():
+        assert core.second()
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    result = testdir.runpytest("--skippy-coverage")
+    result.assert_outcomes(passed=2)
+
+    def run_after_change(source):
+        f_core = testdir.makepyfile(core=source)
+        repo.index.add([str(f_core)])
+        repo.index.commit("Modify core.")
+        return testdir.runpytest(
+                "-v", "--skippy", "--skippy-target-branch", "master",
+                "--skippy-coverage")
+
+    repo.git.checkout('master', b="modify-first")
+
+    # Only the test executing the changed function runs
+    result = run_after_change("""
+    def first():
+        return 3
+
+
+    def second():
+        return 2
+    """)
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*test_first PASSED*"])
+
+    repo.git.checkout('master', b="modify-module")
+
+    # Module level changes fall back to the import graph
+    result = run_after_change("""
+    def first():
+        return 1
+
+
+    def second():
+        return 2
+
+    CONSTANT = 3
+    """)
+    result.assert_outcomes(passed=2)
+
+
+def test_coverage_shared_fixture(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(core="""
+    def helper():
+        return 1
+    """, test_shared="""
+    import pytest
+    import core
+
+    @pytest.fixture(scope='module')
+    def shared():
+        return core.helper()
+
+    def test_one(shared):
+        assert shared
+
+    def test_two(shared):
+        assert shared
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    result = testdir.runpytest("--skippy-coverage")
+    result.assert_outcomes(passed=2)
+
+    repo.git.checkout('master', b="modify-helper")
+    f_core = testdir.makepyfile(core="""
+    def helper():
+        return 2
+    """)
+    repo.index.add([str(f_core)])
+    repo.index.commit("Modify core.")
+
+    # The fixture is only set up by the first test, but both use it
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master",
+            "--skippy-coverage")
+    result.assert_outcomes(passed=2)
+
+
+def test_doctests(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(documented='''
+    def double(x):
+        """
+        >>> double(2)
+        4
+        """
+        return 2 * x
+    ''', helper='''
+    def greet():
+        return 'hello'
+    ''')
+    testdir.maketxtfile(test_guide="""
+    >>> from helper import greet
+    >>> greet()
+    'hello'
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir()
+                    if _.isfile()])
+    repo.index.commit("Initial commit.")
+
+    def run_after_change(changed):
+        repo.git.checkout('master', b="modify-%s" % changed.purebasename)
+        changed.write(changed.read() + '\n\n# Changed\n')
+        repo.index.add([str(changed)])
+        repo.index.commit("Modify %s" % changed.basename)
+        return testdir.runpytest(
+                "-v", "--doctest-modules", "--skippy",
+                "--skippy-target-branch", "master")
+
+    # The doctest text file depends on the modules it imports
+    result = run_after_change(testdir.tmpdir.join('helper.py'))
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*test_guide.txt*PASSED*"])
+
+    # Doctests of a module depend on the module
+    result = run_after_change(testdir.tmpdir.join('documented.py'))
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*documented.double PASSED*"])
+
+    # The doctest text file itself changed
+    result = run_after_change(testdir.tmpdir.join('test_guide.txt'))
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*test_guide.txt*PASSED*"])
+
+
+def test_semantic_doctests(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    documented = testdir.makepyfile(documented='''
+    def double(x):
+        """
+        >>> double(2)
+        4
+        """
+        return 2 * x
+    ''')
+
+    repo.index.add([str(documented)])
+    repo.index.commit("Initial commit.")
+    repo.git.checkout('master', b="modify-doctest")
+
+    # Doctests are not cosmetic
+    documented.write(documented.read().replace('(2)', '(3)').replace(
+            '4', '6'))
+    repo.index.add([str(documented)])
+    repo.index.commit("Modify the doctest")
+
+    for option in ("--skippy-semantic", "--skippy-symbols"):
+        result = testdir.runpytest(
+                "-v", "--doctest-modules", "--skippy",
+                "--skippy-target-branch", "master", option)
+        result.assert_outcomes(passed=1)
+
+
+def test_affected_change_sets(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makeini("""
+    [pytest]
+    skippy_mapping =
+        *.json = test_b.py
+    """)
+    testdir.makepyfile(a="""
+    def run():
+        pass
+    """, b="""
+    def run():
+        pass
+    """, test_a="""
+    import a
+
+    def test_a():
+        a.run()
+    """, test_b="""
+    import b
+
+    def test_b():
+        b.run()
+    """)
+    conftest = testdir.makeconftest("")
+    data = testdir.tmpdir.join('data.json')
+    data.write('{}')
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir()
+                    if _.isfile()])
+    repo.index.commit("Initial commit.")
+
+    def make_branch(name, changed):
+        repo.git.checkout('master', b=name)
+        changed.write(changed.read() + '\n# Changed\n')
+        repo.index.add([str(changed)])
+        repo.index.commit("Modify %s" % changed.basename)
+
+    make_branch('change-a', testdir.tmpdir.join('a.py'))
+    make_branch('change-data', data)
+    make_branch('change-conftest', conftest)
+    repo.git.checkout('master')
+
+    change_list = testdir.tmpdir.join('changes.txt')
+    change_list.write('b.py\n')
+    report = testdir.tmpdir.join('affected.json')
+
+    result = testdir.runpytest(
+            "--collect-only",
+            "--skippy-change-set", "master..change-a",
+            "--skippy-change-set", "master..change-data",
+            "--skippy-change-set", "master..change-conftest",
+            "--skippy-change-set", "file:%s" % change_list,
+            "--skippy-affected-json", str(report))
+    assert result.ret == 0
+    result.stdout.fnmatch_lines([
+        "*skippy affected tests*",
+        "master..change-a: 1 test files",
+        "    test_a.py",
+    ])
+
+    assert json.loads(report.read()) == {
+        'master..change-a': ['test_a.py'],
+        'master..change-data': ['test_b.py'],
+        'master..change-conftest': ['test_a.py', 'test_b.py'],
+        'file:%s' % change_list: ['test_b.py'],
+        'union': ['test_a.py', 'test_b.py'],
+    }
+
+
+def test_dynamic_imports(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makeini("""
+    [pytest]
+    skippy_module_settings = INSTALLED_APPS
+    """)
+    testdir.makepyfile(helper="""
+    def run():
+        pass
+    """, test_import_module="""
+    import importlib
+
+    def test_import_module():
+        importlib.import_module('helper').run()
+    """, test_settings="""
+    INSTALLED_APPS = ['apps.AppConfig']
+
+    def test_settings():
+        pass
+    """, apps="""
+    class AppConfig(object):
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir()
+                    if _.isfile()])
+    repo.index.commit("Initial commit.")
+
+    def run_after_change(changed):
+        repo.git.checkout('master', b="modify-%s" % changed.purebasename)
+        changed.write(changed.read() + '\n# Changed\n')
+        repo.index.add([str(changed)])
+        repo.index.commit("Modify %s" % changed.basename)
+        return testdir.runpytest(
+                "-v", "--skippy", "--skippy-target-branch", "master")
+
+    result = run_after_change(testdir.tmpdir.join('helper.py'))
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*test_import_module PASSED*"])
+
+    result = run_after_change(testdir.tmpdir.join('apps.py'))
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["*test_settings PASSED*"])
+
+
+def test_hooks(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makeconftest("""
+    import os.path
+
+    def pytest_skippy_changed_files(config, target_branch, git_repo_dir):
+        return {'core.py'}
+
+    def pytest_skippy_resolve_module(config, module_name):
+        if module_name == 'virtual':
+            return os.path.realpath('core.py')
+
+    def pytest_skippy_parse_file(config, filename):
+        if filename.endswith('test_b.py'):
+            return ['virtual'], []
+
+    def pytest_skippy_decision(item, should_run, distance):
+        if item.name.endswith('forced'):
+            return True
+    """)
+    testdir.makepyfile(core="""
+    def run():
+        pass
+    """, test_a="""
+    import core
+
+    def test_a():
+        core.run()
+    """, test_b="""
+    def test_b():
+        pass
+    """, test_c="""
+    def test_c():
+        pass
+
+    def test_c_forced():
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir()
+                    if _.isfile()])
+    repo.index.commit("Initial commit.")
+
+    # Nothing changed in git, the changed files come from the conftest
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=3, skipped=1)
+    result.stdout.fnmatch_lines(["test_c.py s.*"])
+
+
+def test_ancestor_packages(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    package = testdir.mkpydir('pkg')
+    package.join('sub.py').write('def run():\n    pass\n')
+    testdir.makepyfile(test_sub="""
+    import pkg.sub
+
+    def test_sub():
+        pkg.sub.run()
+    """, test_other="""
+    def test_other():
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.visit('*.py')])
+    repo.index.commit("Initial commit.")
+    repo.git.checkout('master', b="modify-init")
+
+    # Importing pkg.sub runs pkg/__init__.py
+    init = package.join('__init__.py')
+    init.write(init.read() + '\n\n# Changed\n')
+    repo.index.add([str(init)])
+    repo.index.commit("Modify pkg/__init__.py")
+
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1, skipped=1)
+    result.stdout.fnmatch_lines(["test_sub.py .*"])
+
+
+def test_changed_files_hook_without_git(testdir):
+    testdir.makeconftest("""
+    def pytest_skippy_changed_files(config, target_branch, git_repo_dir):
+        return {'core.py'}
+    """)
+    testdir.makepyfile(core="""
+    def run():
+        pass
+    """, test_a="""
+    import core
+
+    def test_a():
+        core.run()
+    """, test_b="""
+    def test_b():
+        pass
+    """)
+
+    # Not a git repository, with the pytest cache enabled
+    result = testdir.runpytest("--skippy", "--skippy-target-branch", "master")
+    result.assert_outcomes(passed=1, skipped=1)
+    assert 'git failed' not in result.stdout.str()
+
+
+def test_budget(testdir):
+    repo = git.Repo.init(testdir.tmpdir)
+
+    testdir.makepyfile(core="""
+    def run():
+        pass
+    """, test_a="""
+    from core import run
+
+    def test_a():
+        run()
+    """, test_b="""
+    def test_b():
+        pass
+    """)
+
+    repo.index.add([str(_) for _ in testdir.tmpdir.listdir('*.py')])
+    repo.index.commit("Initial commit.")
+
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master",
+            "--skippy-max-files", "3")
+    result.assert_outcomes(skipped=2)
+
+    # Once the budget is exceeded, the remaining tests run
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master",
+            "--skippy-max-files", "2")
+    result.assert_outcomes(skipped=1, passed=1)
+    result.stdout.fnmatch_lines(["*exceeding its limit of 2 files parsed*"])
+
+
+def test_budget_covers_change_detection(testdir):
+    testdir.makeconftest("""
+    import time
+
+    def pytest_skippy_changed_files(config, target_branch, git_repo_dir):
+        time.sleep(30)
+        return set()
+    """)
+    testdir.makepyfile(test_a="""
+    def test_a():
+        pass
+    """)
+
+    # Every test runs if the changes aren't known within the time limit
+    start = time.time()
+    result = testdir.runpytest(
+            "--skippy", "--skippy-target-branch", "master",
+            "--skippy-time-limit", "0.1")
+    assert time.time() - start < 10
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*exceeding its time limit of 0.1s*"])
+
+
+def test_lazy_imports(testdir):
+    # Loading the plugin doesn't import the rest of skippy
+    result = testdir.runpython_c(
+            "import sys, pytest_skippy.plugin; "
+            "print(sorted(_ for _ in sys.modules "
+            "if _.startswith(('pytest_skippy.core', 'pytest_skippy.git', "
+            "'pytest_skippy.parse', 'stdlib_list'))))")
+    result.stdout.fnmatch_lines(["[[][]]"])
@@ -0,0 +1,67 @@
+import pytest
+
+from pytest_skippy.readahead import SourceReader
+
+
+@pytest.fixture
+def files(tmpdir):
+    filenames = []
+    for index in range(4):
+        f = tmpdir.join('file_%d.py' % index)
+        f.write_binary(b'x = %d\n' % index)
+        filenames.append(str(f))
+
+    return filenames
+
+
+@pytest.mark.parametrize('threads', [0, 2])
+def test_read(threads, files):
+    reader = SourceReader(threads)
+    try:
+        reader.prefetch(files[:2])
+        assert [reader.read(_) for _ in files] == [
+            b'x = 0\n', b'x = 1\n', b'x = 2\n', b'x = 3\n']
+        assert reader.pending == {}
+    finally:
+        reader.close()
+
+
+def test_pending_files_are_bounded(files):
+    reader = SourceReader(1, max_pending=2)
+    try:
+        reader.prefetch(files)
+        assert sorted(reader.pending) == files[:2]
+
+        # Consuming a file makes room for the next ones
+        reader.read(files[0])
+        reader.prefetch(files[2:])
+        assert sorted(reader.pending) == files[1:3]
+    finally:
+        reader.close()
+
+
+def test_read_errors(tmpdir):
+    missing = str(tmpdir.join('missing.py'))
+    reader = SourceReader(1)
+    try:
+        reader.prefetch([missing])
+        with pytest.raises(IOError):
+            reader.read(missing)
+
+        with pytest.raises(IOError):
+            reader.read(missing)
+    finally:
+        reader.close()
+
+
+def test_discard(files):
+    reader = SourceReader(1)
+    try:
+        reader.prefetch(files)
+        reader.discard()
+        assert reader.pending == {}
+
+        # Discarded files are read on demand
+        assert reader.read(files[0]) == b'x = 0\n'
+    finally:
+        reader.close()
@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+from pytest_skippy.results import ResultCache, ResultRecorder, hash_files
+
+Report = namedtuple('Report', 'nodeid when passed')
+
+
+def test_hash_files(tmpdir):
+    a = tmpdir.join('a.py')
+    b = tmpdir.join('b.py')
+    a.write('a')
+    b.write('b')
+
+    digest = hash_files({str(a), str(b)}, str(tmpdir))
+
+    # The location of the root directory does not matter
+    moved = tmpdir.mkdir('moved')
+    a.copy(moved)
+    b.copy(moved)
+    assert hash_files({str(moved.join('a.py')),
+                       str(moved.join('b.py'))}, str(moved)) == digest
+
+    # The paths of the files do
+    moved.join('a.py').write('b')
+    moved.join('b.py').write('a')
+    assert hash_files({str(moved.join('a.py')),
+                       str(moved.join('b.py'))}, str(moved)) != digest
+
+    # The contents do
+    b.write('c')
+    assert hash_files({str(a), str(b)}, str(tmpdir)) != digest
+
+    # Missing files are hashed as empty
+    assert hash_files({str(tmpdir.join('missing.py'))}, str(tmpdir))
+
+
+def test_hash_files_memo(tmpdir):
+    a = tmpdir.join('a.py')
+    a.write('a')
+
+    memo = {}
+    digest = hash_files({str(a)}, str(tmpdir), memo)
+    assert str(a) in memo
+
+    a.write('b')
+    assert hash_files({str(a)}, str(tmpdir), memo) == digest
+
+
+def test_result_cache(tmpdir):
+    result_cache = ResultCache(str(tmpdir))
+
+    key = result_cache.get_key('test_a.py::test_a', 'abc')
+    assert key != result_cache.get_key('test_a.py::test_b', 'abc')
+    assert key != result_cache.get_key('test_a.py::test_a', 'def')
+
+    assert result_cache.has_passed(key) is False
+    result_cache.record_pass(key)
+    assert result_cache.has_passed(key) is True
+
+
+def test_result_recorder(tmpdir):
+    result_cache = ResultCache(str(tmpdir))
+    recorder = ResultRecorder(result_cache, {
+        'passed': 'a' * 40,
+        'call_failed': 'b' * 40,
+        'teardown_failed': 'c' * 40,
+        'setup_failed': 'd' * 40,
+    })
+
+    for nodeid, outcomes in (
+            ('passed', (True, True, True)),
+            ('call_failed', (True, False, True)),
+            ('teardown_failed', (True, True, False)),
+            ('setup_failed', (False, False, True)),
+            ('not_recorded', (True, True, True))):
+        for when, passed in zip(('setup', 'call', 'teardown'), outcomes):
+            recorder.pytest_runtest_logreport(Report(nodeid, when, passed))
+
+    assert result_cache.has_passed('a' * 40) is True
+    assert result_cache.has_passed('b' * 40) is False
+    assert result_cache.has_passed('c' * 40) is False
+    assert result_cache.has_passed('d' * 40) is False
@@ -1,4 +1,8 @@
-from pytest_skippy.util import flatten_imports
+import threading
+
+import pytest
+from pytest_skippy.util import (
+    BackgroundTask, TaskTimeout, flatten_imports, get_import_distances)
 
 
 def test_module_reconvergence():
@@ -15,3 +19,31 @@ def test_module_reconvergence():
     }
 
     assert flatten_imports('D', import_tree) == {'A', 'B', 'C', 'D'}
+    assert get_import_distances('D', import_tree) == {
+        'A': 2, 'B': 1, 'C': 1, 'D': 0}
+
+
+def test_background_task():
+    # The function runs on another thread
+    task = BackgroundTask(threading.current_thread)
+    assert task.result() is not threading.current_thread()
+
+
+def test_background_task_error():
+    def fail():
+        raise ValueError('failed')
+
+    task = BackgroundTask(fail)
+    with pytest.raises(ValueError):
+        task.result()
+
+
+def test_background_task_timeout():
+    event = threading.Event()
+    task = BackgroundTask(event.wait)
+
+    with pytest.raises(TaskTimeout):
+        task.result(0.01)
+
+    event.set()
+    assert task.result(1) is True